@@ -7,13 +7,61 @@ Example usage:
 """
 
 import argparse
+import contextlib
+import copy
+import fnmatch
+import hashlib
+import io
+import json
+import multiprocessing
+import os
 import shutil
+import struct
 import subprocess
 import sys
 import tempfile
-import defusedxml.minidom
+import time
+import xml.sax
+import xml.sax.handler
 import zipfile
+import defusedxml.expatreader
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from typing import NamedTuple
+
+# Below this much XML, starting worker processes costs more than it saves
+PARALLEL_MIN_BYTES = 1 << 20
+# XML parts this large are condensed straight into their zip entry rather
+# than in a worker process, so their condensed bytes are never held in memory
+STREAM_MIN_BYTES = 16 << 20
+# Bytes read from the input, and characters buffered for the output, at a time
+CHUNK_SIZE = 1 << 16
+# Python versions (from, up to but excluding) whose zipfile internals
+# copy_zip_entry appends raw entries through
+RAW_COPY_VERSIONS = ((3, 8), (3, 14))
+# Written by unpack.py into the unpacked directory; never packed
+MANIFEST_NAME = ".unpack-manifest.json"
+# Entries a package starts with, so a consumer streaming it knows the content
+# types and the main part before any other part arrives
+LEADING_ENTRIES = ("[Content_Types].xml", "_rels/.rels")
+# How a part is written: (compress_type, compresslevel) of the first pattern
+# its name matches, case-insensitively. Compressed media are stored, since
+# deflating them again costs time and saves nothing; a compresslevel of None
+# is zlib's default.
+COMPRESSION_POLICY = {
+    "*.png": (zipfile.ZIP_STORED, None),
+    "*.jpg": (zipfile.ZIP_STORED, None),
+    "*.jpeg": (zipfile.ZIP_STORED, None),
+    "*.gif": (zipfile.ZIP_STORED, None),
+    "*.wdp": (zipfile.ZIP_STORED, None),
+    "*.emz": (zipfile.ZIP_STORED, None),
+    "*.wmz": (zipfile.ZIP_STORED, None),
+    "*.mp3": (zipfile.ZIP_STORED, None),
+    "*.m4a": (zipfile.ZIP_STORED, None),
+    "*.mp4": (zipfile.ZIP_STORED, None),
+    "*.wmv": (zipfile.ZIP_STORED, None),
+    "*": (zipfile.ZIP_DEFLATED, None),
+}
 
 
 def main():
@@ -21,11 +69,28 @@ def main():
     parser.add_argument("input_directory", help="Unpacked Office document directory")
     parser.add_argument("output_file", help="Output Office file (.docx/.pptx/.xlsx)")
     parser.add_argument("--force", action="store_true", help="Skip validation")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help="Processes condensing XML parts (default: automatic)",
+    )
+    parser.add_argument(
+        "--compression",
+        action="append",
+        default=[],
+        metavar="PATTERN=METHOD[:LEVEL]",
+        help="Compression of matching parts, e.g. '*.xml=deflated:9' or "
+        "'*.bin=stored' (repeatable; overrides the defaults)",
+    )
     args = parser.parse_args()
 
     try:
         success = pack_document(
-            args.input_directory, args.output_file, validate=not args.force
+            args.input_directory,
+            args.output_file,
+            validate=not args.force,
+            workers=args.workers,
+            compression=_parse_compression(args.compression),
         )
 
         # Show warning if validation was skipped
@@ -42,13 +107,49 @@ def main():
         sys.exit(f"Error: {e}")
 
 
-def pack_document(input_dir, output_file, validate=False):
+def _parse_compression(options):
+    """Turn --compression options into a compression dict for pack_document."""
+    methods = {"stored": zipfile.ZIP_STORED, "deflated": zipfile.ZIP_DEFLATED}
+    compression = {}
+    for option in options:
+        pattern, _, setting = option.partition("=")
+        method, _, level = setting.partition(":")
+        if not pattern or method not in methods:
+            raise ValueError(
+                f"--compression must be PATTERN=stored or PATTERN=deflated[:LEVEL], got {option}"
+            )
+        compression[pattern] = (methods[method], int(level) if level else None)
+    return compression
+
+
+def pack_document(
+    input_dir, output_file, validate=False, workers=None, compression=None
+):
     """Pack a directory into an Office file (.docx/.pptx/.xlsx).
 
+    The input directory is left untouched and nothing is copied: XML parts
+    are condensed as they are read and streamed into the zip in order, and
+    other files (media) are copied from disk in chunks. When there is enough
+    to pay for them, a pool of worker processes condenses the XML parts.
+    Parts of STREAM_MIN_BYTES or more are condensed straight into their zip
+    entry in this process. Each part is compressed according to
+    COMPRESSION_POLICY.
+
+    Entries start with LEADING_ENTRIES and otherwise follow their path. If
+    unpack.py left a manifest (MANIFEST_NAME) and the file it unpacked is
+    still there, they keep their original order instead (new files last),
+    and every file still exactly as unpacked is copied from that file as
+    stored, without being condensed or compressed again (see copy_zip_entry).
+
     Args:
         input_dir: Path to unpacked Office document directory
         output_file: Path to output Office file
         validate: If True, validates with soffice (default: False)
+        workers: Processes condensing XML parts. By default one
+            per CPU once the parts pass PARALLEL_MIN_BYTES, unless this already
+            runs in a worker process; 1 does everything in this process.
+        compression: {pattern: (compress_type, compresslevel)} checked before
+            COMPRESSION_POLICY, e.g. {"*.xml": (zipfile.ZIP_DEFLATED, 9)}
 
     Returns:
         bool: True if successful, False if validation failed
@@ -61,32 +162,259 @@ def pack_document(input_dir, output_file, validate=False):
     if output_file.suffix.lower() not in {".docx", ".pptx", ".xlsx"}:
         raise ValueError(f"{output_file} must be a .docx, .pptx, or .xlsx file")
 
-    # Work in temporary directory to avoid modifying original
-    with tempfile.TemporaryDirectory() as temp_dir:
-        temp_content_dir = Path(temp_dir) / "content"
-        shutil.copytree(input_dir, temp_content_dir)
-
-        # Process XML files to remove pretty-printing whitespace
-        for pattern in ["*.xml", "*.rels"]:
-            for xml_file in temp_content_dir.rglob(pattern):
-                condense_xml(xml_file)
-
-        # Create final Office file as zip archive
-        output_file.parent.mkdir(parents=True, exist_ok=True)
-        with zipfile.ZipFile(output_file, "w", zipfile.ZIP_DEFLATED) as zf:
-            for f in temp_content_dir.rglob("*"):
-                if f.is_file():
-                    zf.write(f, f.relative_to(temp_content_dir))
-
-        # Validate if requested
-        if validate:
-            if not validate_document(output_file):
-                output_file.unlink()  # Delete the corrupt file
-                return False
+    manifest_file = input_dir / MANIFEST_NAME
+    files = [f for f in input_dir.rglob("*") if f.is_file() and f != manifest_file]
+    names = {f: f.relative_to(input_dir).as_posix() for f in files}
+
+    output_file.parent.mkdir(parents=True, exist_ok=True)
+    # Written next to the output and renamed over it once complete, so a
+    # failure never leaves a broken file or destroys an existing one
+    temp_file = output_file.with_name(f".{output_file.name}.tmp")
+    try:
+        with contextlib.ExitStack() as stack:
+            source, entries = _open_manifest_source(manifest_file, stack)
+            if entries:
+                order = {name: index for index, name in enumerate(entries)}
+                files.sort(key=lambda f: order.get(names[f], len(order)))
+            else:
+                files.sort(key=names.get)
+            leading = {name: index for index, name in enumerate(LEADING_ENTRIES)}
+            files.sort(key=lambda f: leading.get(names[f], len(leading)))
+
+            reused = {
+                f: source.getinfo(names[f])
+                for f in files
+                if names[f] in entries and _is_unpacked(f, entries[names[f]], source)
+            }
+
+            parts = [
+                _Part(
+                    f,
+                    # XML files lose their pretty-printing whitespace
+                    f.name.endswith((".xml", ".rels")),
+                    *compression_for(names[f], compression),
+                )
+                for f in files
+                if f not in reused
+            ]
+
+            with zipfile.ZipFile(temp_file, "w") as zf, _prepared_parts(
+                parts, workers
+            ) as prepared:
+                prepared = zip(parts, prepared)
+                for f in files:
+                    if f in reused:
+                        copy_zip_entry(source, reused[f], zf)
+                    else:
+                        _write_part(zf, *next(prepared), names[f])
+            # The source stays open until here, so packing over the file that
+            # was unpacked reads it intact and only then replaces it
+            os.replace(temp_file, output_file)
+    except BaseException:
+        temp_file.unlink(missing_ok=True)
+        raise
+
+    # Validate if requested
+    if validate:
+        if not validate_document(output_file):
+            output_file.unlink()  # Delete the corrupt file
+            return False
 
     return True
 
 
+def write_manifest(office_file, unpacked_dir):
+    """Record how an Office file was unpacked, for pack_document to reuse.
+
+    The manifest (MANIFEST_NAME in unpacked_dir) lists the file entries in
+    their original order with their compression method and CRC, and the size
+    and SHA-256 of each file as unpacked (after pretty-printing), so that
+    parts nobody changed can be copied back as stored.
+
+    Args:
+        office_file: Path to the Office file that was unpacked
+        unpacked_dir: Directory it was unpacked (and pretty-printed) into
+    """
+    office_file = Path(office_file)
+    unpacked_dir = Path(unpacked_dir)
+    entries = []
+    with zipfile.ZipFile(office_file) as zf:
+        for info in zf.infolist():
+            path = unpacked_dir / info.filename
+            if info.is_dir() or not path.is_file():
+                continue
+            digest = _sha256(path)
+            entries.append(
+                {
+                    "name": info.filename,
+                    "compress_type": info.compress_type,
+                    "crc": info.CRC,
+                    "size": path.stat().st_size,
+                    "sha256": digest,
+                }
+            )
+
+    manifest = {"source": str(office_file.resolve()), "entries": entries}
+    (unpacked_dir / MANIFEST_NAME).write_text(
+        json.dumps(manifest, indent=2), encoding="utf-8"
+    )
+
+
+def _open_manifest_source(manifest_file, stack):
+    """Open the file an unpack manifest describes, if it is still there.
+
+    Returns:
+        tuple: (zipfile.ZipFile or None, {entry name: manifest entry}), the
+            entries in their original order; (None, {}) without a manifest
+    """
+    try:
+        manifest = json.loads(manifest_file.read_text(encoding="utf-8"))
+        source = stack.enter_context(zipfile.ZipFile(manifest["source"]))
+    except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+        # No manifest, or nothing left to reuse: everything is packed afresh
+        return None, {}
+    return source, {entry["name"]: entry for entry in manifest["entries"]}
+
+
+def _is_unpacked(path, entry, source):
+    """Check that a file and its source entry are still as the manifest says."""
+    info = source.NameToInfo.get(entry["name"])
+    if (
+        info is None
+        or info.CRC != entry["crc"]
+        or info.compress_type != entry["compress_type"]
+        or path.stat().st_size != entry["size"]
+    ):
+        return False
+    return _sha256(path) == entry["sha256"]
+
+
+def _sha256(path):
+    """Return the hex SHA-256 digest of a file, read in chunks."""
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(CHUNK_SIZE):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def compression_for(name, compression=None):
+    """Return how a part is compressed, by its entry name.
+
+    Args:
+        name: Entry name, e.g. "word/media/image1.png"
+        compression: {pattern: (compress_type, compresslevel)} checked before
+            COMPRESSION_POLICY
+
+    Returns:
+        tuple: (compress_type, compresslevel), ZIP_STORED or ZIP_DEFLATED
+
+    Raises:
+        ValueError: If the matching pattern names another compression method
+    """
+    name = name.lower()
+    for pattern, setting in [*(compression or {}).items(), *COMPRESSION_POLICY.items()]:
+        if fnmatch.fnmatchcase(name, pattern.lower()):
+            if setting[0] not in (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED):
+                raise ValueError(f"Unsupported compression for {pattern}: {setting}")
+            return setting
+    return zipfile.ZIP_DEFLATED, None
+
+
+class _Part(NamedTuple):
+    """A file to pack and how to write it."""
+
+    path: Path
+    condense: bool
+    compress_type: int
+    compresslevel: int | None
+
+
+@contextlib.contextmanager
+def _prepared_parts(parts, workers):
+    """Yield an iterator over the prepared contents of parts, in order.
+
+    XML parts are condensed by _prepare_part, on a pool of worker processes
+    if there is enough to condense. The iterator yields None for parts the
+    caller writes from disk itself: parts of STREAM_MIN_BYTES or more, and
+    all but the XML parts (which zipfile then compresses in chunks).
+    """
+    small = [part.path.stat().st_size < STREAM_MIN_BYTES for part in parts]
+    pooled = [part for part, is_small in zip(parts, small) if is_small and part.condense]
+    if workers is None:
+        size = sum(part.path.stat().st_size for part in pooled)
+        in_worker = multiprocessing.parent_process() is not None
+        workers = 1 if in_worker or size < PARALLEL_MIN_BYTES else os.cpu_count()
+    workers = min(workers or 1, len(pooled))
+    if workers <= 1:
+        yield (
+            _prepare_part(part) if is_small and part.condense else None
+            for part, is_small in zip(parts, small)
+        )
+        return
+
+    # Workers read the files themselves; only the condensed bytes come back
+    pool = ProcessPoolExecutor(workers)
+    try:
+        results = pool.map(_prepare_part, pooled)
+        pooled = set(pooled)
+        yield (next(results) if part in pooled else None for part in parts)
+    finally:
+        pool.shutdown(cancel_futures=True)
+
+
+def _prepare_part(part):
+    """Read and condense an XML part, possibly in a worker.
+
+    Returns:
+        bytes: The condensed XML
+    """
+    return condense_xml_content(part.path.read_bytes())
+
+
+def _write_part(zf, part, prepared, arcname):
+    """Write a part to an open zip file, from its prepared contents if any."""
+    info = zipfile.ZipInfo.from_file(part.path, arcname)
+    if part.condense:
+        # Stamped when condensed, like a rewritten file
+        info.date_time = time.localtime()[:6]
+    info.compress_type = part.compress_type
+    if prepared is not None:
+        zf.writestr(info, prepared, compresslevel=part.compresslevel)
+    elif part.condense:
+        write_condensed_entry(zf, info, part.path, part.compresslevel)
+    else:
+        zf.write(part.path, arcname, part.compress_type, part.compresslevel)
+
+
+def write_condensed_entry(zf, info, xml_file, compresslevel=None):
+    """Condense an XML file into a new entry of an open zip file.
+
+    The condensed XML is streamed into the entry. zipfile only takes a
+    compression level for an entry opened for writing from Python 3.13 on,
+    so on older versions an entry with a compresslevel is condensed in
+    memory and written whole.
+
+    Args:
+        zf: zipfile.ZipFile opened for writing
+        info: zipfile.ZipInfo of the new entry, with its compress_type set
+        xml_file: Path of the XML file
+        compresslevel: Compression level, or None for zlib's default
+    """
+    if compresslevel is not None:
+        if sys.version_info < (3, 13):
+            content = condense_xml_content(Path(xml_file).read_bytes())
+            zf.writestr(info, content, compresslevel=compresslevel)
+            return
+        info.compress_level = compresslevel
+    # Condensing rarely grows a part, but escaping can; leave room for that
+    force_zip64 = info.file_size >= zipfile.ZIP64_LIMIT // 2
+    with open(xml_file, "rb") as source, zf.open(
+        info, "w", force_zip64=force_zip64
+    ) as entry:
+        condense_xml_stream(source, entry)
+
+
 def validate_document(doc_path):
     """Validate document by converting to HTML with soffice."""
     # Determine the correct filter based on file extension
@@ -130,29 +458,260 @@ def validate_document(doc_path):
             return False
 
 
+def copy_zip_entry(source, info, target):
+    """Copy an entry between open zip files, without recompressing it if possible.
+
+    On the Python versions in RAW_COPY_VERSIONS the compressed bytes are
+    copied as stored, in chunks. That appends the entry through zipfile
+    internals, so on other versions the entry is decompressed and compressed
+    again instead.
+
+    Args:
+        source: zipfile.ZipFile opened for reading
+        info: zipfile.ZipInfo of the entry in source
+        target: zipfile.ZipFile opened for writing
+    """
+    if RAW_COPY_VERSIONS[0] <= sys.version_info[:2] < RAW_COPY_VERSIONS[1]:
+        _copy_raw_entry(source, info, target)
+        return
+    copied = zipfile.ZipInfo(info.filename, info.date_time)
+    copied.compress_type = info.compress_type
+    copied.external_attr = info.external_attr
+    with source.open(info) as entry, target.open(
+        copied, "w", force_zip64=info.file_size >= zipfile.ZIP64_LIMIT
+    ) as copy_entry:
+        shutil.copyfileobj(entry, copy_entry, CHUNK_SIZE)
+
+
+def _copy_raw_entry(source, info, target):
+    """Append an entry's compressed bytes as stored (see copy_zip_entry)."""
+    # The data follows the local header, whose name and extra field lengths
+    # may differ from the central directory's
+    source.fp.seek(info.header_offset)
+    header = source.fp.read(zipfile.sizeFileHeader)
+    name_length, extra_length = struct.unpack("<HH", header[26:30])
+    source.fp.seek(info.header_offset + len(header) + name_length + extra_length)
+
+    info = copy.copy(info)
+    info.flag_bits &= ~0x08  # Sizes go in the local header, no data descriptor
+    info.header_offset = target.fp.tell()
+    target.fp.write(info.FileHeader())
+    remaining = info.compress_size
+    while remaining:
+        chunk = source.fp.read(min(CHUNK_SIZE, remaining))
+        if not chunk:
+            raise zipfile.BadZipFile(f"Truncated entry {info.filename!r}")
+        target.fp.write(chunk)
+        remaining -= len(chunk)
+    target.filelist.append(info)
+    target.NameToInfo[info.filename] = info
+    target.start_dir = target.fp.tell()
+    target._didModify = True
+
+
 def condense_xml(xml_file):
     """Strip unnecessary whitespace and remove comments."""
-    with open(xml_file, "r", encoding="utf-8") as f:
-        dom = defusedxml.minidom.parse(f)
-
-    # Process each element to remove whitespace and comments
-    for element in dom.getElementsByTagName("*"):
-        # Skip w:t elements and their processing
-        if element.tagName.endswith(":t"):
-            continue
-
-        # Remove whitespace-only text nodes and comment nodes
-        for child in list(element.childNodes):
-            if (
-                child.nodeType == child.TEXT_NODE
-                and child.nodeValue
-                and child.nodeValue.strip() == ""
-            ) or child.nodeType == child.COMMENT_NODE:
-                element.removeChild(child)
-
-    # Write back the condensed XML
-    with open(xml_file, "wb") as f:
-        f.write(dom.toxml(encoding="UTF-8"))
+    xml_file = Path(xml_file)
+    # Written next to the file and renamed over it, so it is never truncated
+    with tempfile.NamedTemporaryFile(
+        dir=xml_file.parent, prefix=f".{xml_file.name}.", delete=False
+    ) as target:
+        try:
+            with open(xml_file, "rb") as source:
+                condense_xml_stream(source, target)
+        except BaseException:
+            target.close()
+            os.unlink(target.name)
+            raise
+    shutil.copymode(xml_file, target.name)
+    os.replace(target.name, xml_file)
+
+
+def condense_xml_content(content):
+    """Strip unnecessary whitespace and remove comments from XML bytes.
+
+    Returns:
+        bytes: The condensed XML, UTF-8 encoded
+    """
+    target = io.BytesIO()
+    condense_xml_stream(io.BytesIO(content), target)
+    return target.getvalue()
+
+
+def condense_xml_stream(source, target):
+    """Strip unnecessary whitespace and remove comments, streaming.
+
+    The XML is parsed with SAX in chunks and written out as it goes, so memory
+    stays constant however large the part: only the open elements and the
+    current run of whitespace are held. The output is the same as parsing
+    into a DOM, removing whitespace-only text (except directly inside *:t
+    elements, e.g. w:t) and comments, and serializing it again.
+
+    Args:
+        source: Binary file object to read the XML from
+        target: Binary file object the condensed XML is written to, UTF-8
+            encoded
+    """
+    condenser = _Condenser(target)
+    # Like minidom, neither load nor refuse an external DTD
+    parser = defusedxml.expatreader.DefusedExpatParser(forbid_external=False)
+    parser.setFeature(xml.sax.handler.feature_external_ges, False)
+    parser.setContentHandler(condenser)
+    condenser.setDocumentLocator(parser)
+    parser.setProperty(xml.sax.handler.property_lexical_handler, condenser)
+    while chunk := source.read(CHUNK_SIZE):
+        parser.feed(chunk)
+    parser.close()
+    condenser.flush()
+
+
+class _Condenser(xml.sax.handler.ContentHandler, xml.sax.handler.LexicalHandler):
+    """SAX handler writing condensed XML as minidom's toxml() would."""
+
+    def __init__(self, target):
+        super().__init__()
+        self._target = target
+        self._out = []
+        self._buffered = 0
+        # (tag name, whether whitespace-only text is kept, prefixes declared)
+        # of the open elements, and how often each prefix is bound
+        self._open = []
+        self._prefixes = {"xml": 1}
+        # The last start tag still lacks its ">" (it becomes "/>" if empty)
+        self._tag_pending = False
+        # Text seen since the last markup, held while it is whitespace only
+        self._text = []
+        self._text_kept = False
+        self._cdata = None
+        self._in_dtd = False
+
+    def _write(self, data):
+        self._out.append(data)
+        self._buffered += len(data)
+        if self._buffered >= CHUNK_SIZE:
+            self.flush()
+
+    def flush(self):
+        self._target.write("".join(self._out).encode("utf-8"))
+        self._out.clear()
+        self._buffered = 0
+
+    def _write_child(self, data):
+        if self._tag_pending:
+            self._write(">")
+            self._tag_pending = False
+        self._write(data)
+
+    def _end_text(self):
+        # Text ends at any markup; a run still held is whitespace only
+        self._text.clear()
+        self._text_kept = False
+
+    def startDocument(self):
+        self._write('<?xml version="1.0" encoding="UTF-8"?>')
+
+    def startElement(self, name, attrs):
+        self._end_text()
+        names = attrs.getNames()
+        declared = ()
+        if any(attr.startswith("xmlns") for attr in names):
+            # The DOM holds namespace declarations before the other attributes
+            names = sorted(names, key=lambda attr: not _is_xmlns(attr))
+            declared = [attr[6:] for attr in names if attr.startswith("xmlns:")]
+            for prefix in declared:
+                self._prefixes[prefix] = self._prefixes.get(prefix, 0) + 1
+
+        # Namespaces are not processed, but an unbound prefix is still an error
+        for qname in (name, *names):
+            prefix, colon, _ = qname.partition(":")
+            if colon and prefix != "xmlns" and not self._prefixes.get(prefix):
+                raise xml.sax.SAXParseException(
+                    f"unbound prefix {prefix!r}", None, self._locator
+                )
+
+        tag = "".join(
+            [f"<{name}"]
+            + [f' {attr}="{_escape(attrs.getValue(attr))}"' for attr in names]
+        )
+        self._write_child(tag)
+        self._tag_pending = True
+        self._open.append((name, name.endswith(":t"), declared))
+
+    def endElement(self, name):
+        self._end_text()
+        for prefix in self._open.pop()[2]:
+            self._prefixes[prefix] -= 1
+        if self._tag_pending:
+            self._write("/>")
+            self._tag_pending = False
+        else:
+            self._write(f"</{name}>")
+
+    def characters(self, content):
+        if self._cdata is not None:
+            self._cdata.append(content)
+        elif self._text_kept or (self._open and self._open[-1][1]):
+            self._write_child(_escape(content))
+            self._text_kept = True
+        elif content.isspace():
+            self._text.append(content)
+        else:
+            # No longer whitespace only, so the run is written as it comes
+            self._write_child(_escape("".join(self._text) + content))
+            self._text.clear()
+            self._text_kept = True
+
+    def processingInstruction(self, target, data):
+        self._end_text()
+        self._write_child(f"<?{target} {data}?>")
+
+    def comment(self, content):
+        if self._in_dtd:
+            return
+        self._end_text()
+        if self._open and not self._open[-1][1]:
+            return
+        self._write_child(f"<!--{content}-->")
+
+    def startCDATA(self):
+        self._cdata = []
+
+    def endCDATA(self):
+        data = "".join(self._cdata)
+        self._cdata = None
+        # An empty section leaves no node, so the text around it is one run
+        if data:
+            self._end_text()
+            self._write_child(f"<![CDATA[{data}]]>")
+
+    def startDTD(self, name, public_id, system_id):
+        self._in_dtd = True
+        self._write(f"<!DOCTYPE {name}")
+        if public_id:
+            self._write(f"  PUBLIC '{public_id}'  '{system_id}'")
+        elif system_id:
+            self._write(f"  SYSTEM '{system_id}'")
+        self._write(">")
+
+    def endDTD(self):
+        self._in_dtd = False
+
+
+def _is_xmlns(name):
+    return name == "xmlns" or name.startswith("xmlns:")
+
+
+def _escape(data):
+    """Escape text or an attribute value as minidom writes them."""
+    if "&" in data:
+        data = data.replace("&", "&amp;")
+    if "<" in data:
+        data = data.replace("<", "&lt;")
+    if '"' in data:
+        data = data.replace('"', "&quot;")
+    if ">" in data:
+        data = data.replace(">", "&gt;")
+    return data
 
 
 if __name__ == "__main__":
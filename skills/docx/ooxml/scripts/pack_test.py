@@ -0,0 +1,467 @@
+import os
+import random
+import struct
+import tempfile
+import unittest
+import zipfile
+import zlib
+from pathlib import Path
+from unittest import mock
+
+import defusedxml.minidom
+
+import pack
+from pack import LEADING_ENTRIES, MANIFEST_NAME, compression_for, pack_document
+from unpack import unpack_document
+
+W_NAMESPACE = 'xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"'
+
+PACKAGE_FILES = {
+    "[Content_Types].xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">\n'
+        '  <Default Extension="png" ContentType="image/png"/>\n'
+        '  <Default Extension="rels" '
+        'ContentType="application/vnd.openxmlformats-package.relationships+xml"/>\n'
+        "</Types>\n"
+    ),
+    "_rels/.rels": (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">\n'
+        '  <Relationship Id="rId1" Target="word/document.xml"/>\n'
+        "</Relationships>\n"
+    ),
+    "docProps/app.xml": (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        "<Properties>\n  <!-- generated -->\n  <Pages>1</Pages>\n</Properties>\n"
+    ),
+    "word/document.xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        f"<w:document {W_NAMESPACE}>\n"
+        "  <w:body>\n"
+        "    <!-- kept out of the package -->\n"
+        "    <w:p>\n"
+        "      <w:r>\n"
+        "        <w:t xml:space=\"preserve\">  spaced  &amp; &lt;escaped&gt; </w:t>\n"
+        "      </w:r>\n"
+        "      <w:r>\n"
+        "        <w:t>   </w:t>\n"
+        "      </w:r>\n"
+        "    </w:p>\n"
+        "    <w:p>\n"
+        "      <w:r>\n"
+        "        <w:t>café — \"quoted\"</w:t>\n"
+        "      </w:r>\n"
+        "    </w:p>\n"
+        "  </w:body>\n"
+        "</w:document>\n"
+    ),
+}
+
+
+def make_unpacked(directory, media_size=50_000):
+    """Write an unpacked package with pretty-printed XML and a media file, and return its path"""
+    root = Path(directory) / "unpacked"
+    for name, content in PACKAGE_FILES.items():
+        path = root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content, encoding="utf-8")
+    media = root / "word" / "media" / "image1.png"
+    media.parent.mkdir(parents=True)
+    media.write_bytes(random.Random(1).randbytes(media_size))
+    return root
+
+
+def baseline_condense(content):
+    """Condense XML bytes the way condense_xml did before it streamed"""
+    dom = defusedxml.minidom.parseString(content)
+    for element in dom.getElementsByTagName("*"):
+        if element.tagName.endswith(":t"):
+            continue
+        for child in list(element.childNodes):
+            if (
+                child.nodeType == child.TEXT_NODE
+                and child.nodeValue
+                and child.nodeValue.strip() == ""
+            ) or child.nodeType == child.COMMENT_NODE:
+                element.removeChild(child)
+    return dom.toxml(encoding="UTF-8")
+
+
+def baseline_contents(input_dir):
+    """Return {entry name: bytes} as pack_document packed a directory before"""
+    contents = {}
+    for path in Path(input_dir).rglob("*"):
+        if path.is_file():
+            name = path.relative_to(input_dir).as_posix()
+            content = path.read_bytes()
+            if path.name.endswith((".xml", ".rels")):
+                content = baseline_condense(content)
+            contents[name] = content
+    return contents
+
+
+def read_package(path):
+    with zipfile.ZipFile(path) as zf:
+        return {info.filename: zf.read(info) for info in zf.infolist()}
+
+
+def raw_entry(path, name):
+    """Return an entry's compressed bytes as stored in a zip file"""
+    with zipfile.ZipFile(path) as zf:
+        info = zf.getinfo(name)
+        zf.fp.seek(info.header_offset + 26)
+        name_length, extra_length = struct.unpack("<HH", zf.fp.read(4))
+        zf.fp.seek(name_length + extra_length, os.SEEK_CUR)
+        return zf.fp.read(info.compress_size)
+
+
+def tree_state(directory):
+    return {
+        path.relative_to(directory).as_posix(): path.read_bytes()
+        for path in Path(directory).rglob("*")
+        if path.is_file()
+    }
+
+
+class PackTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.input_dir = make_unpacked(self.tmp.name)
+        self.output = Path(self.tmp.name) / "out" / "packed.docx"
+
+
+CONDENSE_SAMPLES = {
+    "document": PACKAGE_FILES["word/document.xml"],
+    "no declaration": "<root>\n  <a x='1' y=\"&quot;2&quot;\"/>\n</root>",
+    "mixed text": "<root>  <a>x</a>  tail <b> </b>\n</root>",
+    "comments": "<!-- head --><root><!-- a --><w:t xmlns:w='u'> <!-- kept --> </w:t></root>",
+    "cdata": "<root>  <![CDATA[ <raw> ]]>  <a><![CDATA[]]></a>  </root>",
+    "processing instruction": "<?xml-stylesheet href='s.xsl'?><root>  <?pi data?>  </root>",
+    "doctype": "<!DOCTYPE root SYSTEM 'root.dtd'><root>\n  <a/>\n</root>",
+    "namespaces": (
+        "<a:root xmlns:a='urn:a' b:x='1' xmlns:b='urn:b'>\n"
+        "  <b:child xmlns:c='urn:c' c:y='&lt;&amp;&gt;'>\n    <c:t>  </c:t>\n"
+        "  </b:child>\n</a:root>"
+    ),
+    "attribute whitespace": "<root a='line&#10;break&#9;tab' b=' spaced '>\n</root>",
+    "character references": "<root>\n  <a>&#xE9;&#8212;&#10;</a>&#32;\n</root>",
+    "unicode": "<root>\n  <a>caf\u00e9 \U0001F600</a>\n</root>",
+}
+
+
+class TestCondense(unittest.TestCase):
+
+    def test_matches_baseline(self):
+        """Test the streaming condenser against the minidom one"""
+        for label, sample in CONDENSE_SAMPLES.items():
+            content = sample.encode("utf-8")
+            with self.subTest(label):
+                self.assertEqual(
+                    pack.condense_xml_content(content), baseline_condense(content)
+                )
+
+    def test_chunk_boundaries(self):
+        """Test that where chunks split the input changes nothing"""
+        for chunk_size in (1, 2, 7, 64):
+            with self.subTest(chunk_size=chunk_size), mock.patch.object(
+                pack, "CHUNK_SIZE", chunk_size
+            ):
+                for sample in CONDENSE_SAMPLES.values():
+                    content = sample.encode("utf-8")
+                    self.assertEqual(
+                        pack.condense_xml_content(content), baseline_condense(content)
+                    )
+
+    def test_large_part(self):
+        """Test a part spanning many chunks against the minidom condenser"""
+        rows = "".join(
+            f'\n  <row r="{i}">\n    <c><v>{i}</v></c>\n'
+            f'    <c t="s"><is><t> {i} </t></is></c>\n  </row>'
+            for i in range(3000)
+        )
+        self.assertGreater(len(rows), 3 * pack.CHUNK_SIZE)
+        content = f"<sheetData>{rows}\n</sheetData>".encode("utf-8")
+        self.assertEqual(pack.condense_xml_content(content), baseline_condense(content))
+
+    def test_condense_xml_file(self):
+        """Test condensing a file in place against the minidom condenser"""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "document.xml"
+            path.write_text(PACKAGE_FILES["word/document.xml"], encoding="utf-8")
+            os.chmod(path, 0o640)
+            expected = baseline_condense(path.read_bytes())
+            pack.condense_xml(path)
+            self.assertEqual(path.read_bytes(), expected)
+            self.assertEqual(os.stat(path).st_mode & 0o777, 0o640)
+            self.assertEqual(os.listdir(tmp), ["document.xml"])
+
+    def test_errors_match_baseline(self):
+        """Test that XML minidom refuses is refused, leaving the file as it was"""
+        for sample in ("<root>", "<w:p/>", "<root><a></b></root>", "text"):
+            with self.subTest(sample=sample):
+                with self.assertRaises(Exception):
+                    baseline_condense(sample.encode("utf-8"))
+                with self.assertRaises(Exception):
+                    pack.condense_xml_content(sample.encode("utf-8"))
+                with tempfile.TemporaryDirectory() as tmp:
+                    path = Path(tmp) / "broken.xml"
+                    path.write_text(sample, encoding="utf-8")
+                    with self.assertRaises(Exception):
+                        pack.condense_xml(path)
+                    self.assertEqual(path.read_text(encoding="utf-8"), sample)
+                    self.assertEqual(os.listdir(tmp), ["broken.xml"])
+
+
+class TestPackDocument(PackTestCase):
+
+    def test_matches_baseline(self):
+        """Test each way of preparing parts against the old copy-and-condense pack"""
+        expected = baseline_contents(self.input_dir)
+        untouched = tree_state(self.input_dir)
+        for label, workers, stream_min in [
+            ("in process", 1, pack.STREAM_MIN_BYTES),
+            ("worker pool", 2, pack.STREAM_MIN_BYTES),
+            ("streamed", 1, 0),
+        ]:
+            with self.subTest(label), mock.patch.object(
+                pack, "STREAM_MIN_BYTES", stream_min
+            ):
+                packed = pack_document(self.input_dir, self.output, workers=workers)
+                self.assertTrue(packed)
+                self.assertEqual(read_package(self.output), expected)
+                with zipfile.ZipFile(self.output) as zf:
+                    self.assertIsNone(zf.testzip())
+                self.assertEqual(tree_state(self.input_dir), untouched)
+
+    def test_no_temporary_files_left(self):
+        """Test that packing leaves only the output next to it"""
+        pack_document(self.input_dir, self.output, workers=1)
+        self.assertEqual(os.listdir(self.output.parent), [self.output.name])
+
+    def test_failed_pack_keeps_the_output(self):
+        """Test that a part that fails to condense leaves an existing output alone"""
+        pack_document(self.input_dir, self.output, workers=1)
+        before = self.output.read_bytes()
+        (self.input_dir / "word" / "broken.xml").write_text("<w:p>", encoding="utf-8")
+        with self.assertRaises(Exception):
+            pack_document(self.input_dir, self.output, workers=1)
+        self.assertEqual(self.output.read_bytes(), before)
+        self.assertEqual(os.listdir(self.output.parent), [self.output.name])
+
+    def test_compression_level(self):
+        """Test that a compression level is applied as zlib applies it"""
+        document = self.input_dir / "word" / "document.xml"
+        # Large and repetitive enough for the levels to differ
+        document.write_text(
+            PACKAGE_FILES["word/document.xml"].replace(
+                "  </w:body>",
+                "".join(
+                    f"    <w:p><w:r><w:t>row {i} {i * 7919 % 1000}</w:t></w:r></w:p>\n"
+                    for i in range(3000)
+                )
+                + "  </w:body>",
+            ),
+            encoding="utf-8",
+        )
+        condensed = baseline_condense(document.read_bytes())
+        for level in (1, 9):
+            with self.subTest(level=level):
+                pack_document(
+                    self.input_dir,
+                    self.output,
+                    workers=1,
+                    compression={"*.xml": (zipfile.ZIP_DEFLATED, level)},
+                )
+                compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+                expected = compressor.compress(condensed) + compressor.flush()
+                with zipfile.ZipFile(self.output) as zf:
+                    info = zf.getinfo("word/document.xml")
+                    self.assertEqual(zf.read(info), condensed)
+                self.assertEqual(info.compress_size, len(expected))
+
+    def test_rejects_bad_arguments(self):
+        with self.assertRaises(ValueError):
+            pack_document(self.input_dir / "missing", self.output)
+        with self.assertRaises(ValueError):
+            pack_document(self.input_dir, self.output.with_suffix(".zip"))
+
+
+class TestCompressionPolicy(PackTestCase):
+
+    def test_compression_for(self):
+        cases = [
+            ("word/media/image1.png", None, (zipfile.ZIP_STORED, None)),
+            ("word/media/IMAGE1.JPEG", None, (zipfile.ZIP_STORED, None)),
+            ("word/document.xml", None, (zipfile.ZIP_DEFLATED, None)),
+            ("word/media/image1.emf", None, (zipfile.ZIP_DEFLATED, None)),
+            ("word/document.xml", {"*.XML": (zipfile.ZIP_DEFLATED, 9)}, (8, 9)),
+            ("word/media/image1.png", {"word/*": (zipfile.ZIP_DEFLATED, 1)}, (8, 1)),
+            ("word/document.xml", {"*.png": (zipfile.ZIP_DEFLATED, 1)}, (8, None)),
+        ]
+        for name, compression, expected in cases:
+            with self.subTest(name=name, compression=compression):
+                self.assertEqual(compression_for(name, compression), expected)
+        with self.assertRaises(ValueError):
+            compression_for("word/document.xml", {"*": (zipfile.ZIP_BZIP2, None)})
+
+    def test_parse_compression(self):
+        self.assertEqual(
+            pack._parse_compression(["*.xml=deflated:9", "*.bin=stored"]),
+            {"*.xml": (zipfile.ZIP_DEFLATED, 9), "*.bin": (zipfile.ZIP_STORED, None)},
+        )
+        for option in ("*.xml", "*.xml=bzip2", "=stored"):
+            with self.subTest(option=option), self.assertRaises(ValueError):
+                pack._parse_compression([option])
+
+    def test_entries_follow_the_policy(self):
+        """Test that media are stored as they are and everything else deflated"""
+        pack_document(self.input_dir, self.output, workers=1)
+        self.assertEqual(read_package(self.output), baseline_contents(self.input_dir))
+        with zipfile.ZipFile(self.output) as zf:
+            for info in zf.infolist():
+                with self.subTest(info.filename):
+                    expected = compression_for(info.filename)[0]
+                    self.assertEqual(info.compress_type, expected)
+        media = (self.input_dir / "word" / "media" / "image1.png").read_bytes()
+        self.assertEqual(raw_entry(self.output, "word/media/image1.png"), media)
+
+    def test_entry_order(self):
+        """Test that LEADING_ENTRIES come first and the rest follow their path"""
+        for name in ("AAA/first.xml", "customXml/item1.xml", "Z.bin"):
+            path = self.input_dir / name
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text("<item/>", encoding="utf-8")
+        pack_document(self.input_dir, self.output, workers=1)
+        names = list(read_package(self.output))
+        rest = sorted(set(baseline_contents(self.input_dir)) - set(LEADING_ENTRIES))
+        self.assertEqual(names, [*LEADING_ENTRIES, *rest])
+
+    def test_unsupported_compression(self):
+        with self.assertRaises(ValueError):
+            pack_document(
+                self.input_dir,
+                self.output,
+                compression={"*.xml": (zipfile.ZIP_LZMA, None)},
+            )
+        self.assertFalse(self.output.parent.exists() and any(self.output.parent.iterdir()))
+
+
+class TestManifest(unittest.TestCase):
+
+    # Not the order pack_document would pick, to tell a kept order apart
+    ORDER = (
+        "[Content_Types].xml",
+        "_rels/.rels",
+        "word/media/image1.png",
+        "word/document.xml",
+        "docProps/app.xml",
+    )
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        source = make_unpacked(self.tmp.name)
+        # Compressed harder than pack_document would, so a recompressed entry shows
+        self.original = Path(self.tmp.name) / "original.docx"
+        with zipfile.ZipFile(self.original, "w") as zf:
+            for name in self.ORDER:
+                content = (source / name).read_bytes()
+                if name.endswith((".xml", ".rels")):
+                    content = baseline_condense(content)
+                stored = name.endswith(".png")
+                zf.writestr(
+                    name,
+                    content,
+                    zipfile.ZIP_STORED if stored else zipfile.ZIP_DEFLATED,
+                    compresslevel=9,
+                )
+        self.unpacked = Path(self.tmp.name) / "unpacked-again"
+        unpack_document(self.original, self.unpacked)
+        self.output = Path(self.tmp.name) / "repacked.docx"
+
+    def baseline_contents(self):
+        contents = baseline_contents(self.unpacked)
+        del contents[MANIFEST_NAME]
+        return contents
+
+    def infos(self, path):
+        with zipfile.ZipFile(path) as zf:
+            self.assertIsNone(zf.testzip())
+            return {info.filename: info for info in zf.infolist()}
+
+    def assertCopied(self, name):
+        original = self.infos(self.original)[name]
+        copied = self.infos(self.output)[name]
+        self.assertEqual(
+            (copied.CRC, copied.compress_type, copied.compress_size, copied.file_size),
+            (original.CRC, original.compress_type, original.compress_size, original.file_size),
+        )
+        self.assertEqual(raw_entry(self.output, name), raw_entry(self.original, name))
+
+    def test_untouched_entries_are_copied(self):
+        """Test that a round trip keeps every entry's stored bytes and order"""
+        pack_document(self.unpacked, self.output)
+        self.assertEqual(list(self.infos(self.output)), list(self.ORDER))
+        for name in self.ORDER:
+            with self.subTest(name):
+                self.assertCopied(name)
+
+    def test_edited_entries_are_packed_afresh(self):
+        """Test that edited and new files are condensed again, the rest copied"""
+        document = self.unpacked / "word" / "document.xml"
+        document.write_text(
+            document.read_text(encoding="utf-8").replace("spaced", "edited"),
+            encoding="utf-8",
+        )
+        (self.unpacked / "word" / "new.xml").write_text("<new>\n  <a/>\n</new>")
+        pack_document(self.unpacked, self.output)
+
+        self.assertEqual(
+            list(self.infos(self.output)), [*self.ORDER, "word/new.xml"]
+        )
+        self.assertEqual(read_package(self.output), self.baseline_contents())
+        self.assertIn(b"edited", read_package(self.output)["word/document.xml"])
+        for name in self.ORDER:
+            if name != "word/document.xml":
+                with self.subTest(name):
+                    self.assertCopied(name)
+
+    def test_copy_without_zipfile_internals(self):
+        """Test the fallback copy on Python versions outside RAW_COPY_VERSIONS"""
+        with mock.patch.object(pack, "RAW_COPY_VERSIONS", ((0, 0), (0, 0))):
+            pack_document(self.unpacked, self.output)
+        self.assertEqual(read_package(self.output), read_package(self.original))
+        original = self.infos(self.original)
+        for name, info in self.infos(self.output).items():
+            with self.subTest(name):
+                self.assertEqual(
+                    (info.CRC, info.compress_type),
+                    (original[name].CRC, original[name].compress_type),
+                )
+
+    def test_missing_source_packs_afresh(self):
+        """Test that without the unpacked file everything is packed as before"""
+        self.original.unlink()
+        pack_document(self.unpacked, self.output)
+        self.assertEqual(read_package(self.output), self.baseline_contents())
+
+    def test_pack_over_the_source(self):
+        """Test packing over the file that was unpacked"""
+        expected = read_package(self.original)
+        raw = {name: raw_entry(self.original, name) for name in self.ORDER}
+        pack_document(self.unpacked, self.original)
+        self.assertEqual(read_package(self.original), expected)
+        for name in self.ORDER:
+            self.assertEqual(raw_entry(self.original, name), raw[name])
+
+    def test_manifest_is_not_packed(self):
+        self.assertTrue((self.unpacked / MANIFEST_NAME).is_file())
+        pack_document(self.unpacked, self.output)
+        self.assertNotIn(MANIFEST_NAME, read_package(self.output))
+
+
+if __name__ == "__main__":
+    unittest.main()
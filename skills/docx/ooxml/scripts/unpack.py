@@ -1,29 +1,151 @@
 #!/usr/bin/env python3
-"""Unpack and format XML contents of Office files (.docx, .pptx, .xlsx)"""
+"""
+Unpack and format XML contents of Office files (.docx, .pptx, .xlsx)
 
+Example usage:
+    python unpack.py <office_file> <output_dir>
+    python unpack.py <office_file> <output_dir> --pretty-print 'word/*' --max-pretty-size 5000000
+    python unpack.py <office_file> <output_dir> --extract-only
+
+Example usage (as a library):
+    from ooxml.scripts.unpack import unpack_document
+
+    unpack_document("input.xlsx", "unpacked", pretty_print=["xl/workbook.xml"])
+"""
+
+import argparse
+import fnmatch
+import multiprocessing
+import os
 import random
-import sys
-import defusedxml.minidom
 import zipfile
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
-# Get command line arguments
-assert len(sys.argv) == 3, "Usage: python unpack.py <office_file> <output_dir>"
-input_file, output_dir = sys.argv[1], sys.argv[2]
+import defusedxml.minidom
+
+try:
+    from .pack import PARALLEL_MIN_BYTES, write_manifest
+except ImportError:  # Run as a script
+    from pack import PARALLEL_MIN_BYTES, write_manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Unpack an Office file and pretty-print its XML"
+    )
+    parser.add_argument("office_file", help="Office file (.docx/.pptx/.xlsx)")
+    parser.add_argument("output_dir", help="Directory to unpack into")
+    parser.add_argument(
+        "--pretty-print",
+        action="append",
+        metavar="PATTERN",
+        help="Only pretty-print XML parts matching PATTERN (repeatable)",
+    )
+    parser.add_argument(
+        "--max-pretty-size",
+        type=int,
+        metavar="BYTES",
+        help="Leave XML parts larger than this as stored",
+    )
+    parser.add_argument(
+        "--workers", type=int, help="Processes pretty-printing XML (default: automatic)"
+    )
+    parser.add_argument(
+        "--extract-only", action="store_true", help="Extract without pretty-printing"
+    )
+    args = parser.parse_args()
+
+    unpack_document(
+        args.office_file,
+        args.output_dir,
+        pretty_print=args.pretty_print,
+        max_pretty_size=args.max_pretty_size,
+        workers=args.workers,
+        extract_only=args.extract_only,
+    )
+
+    # For .docx files, suggest an RSID for tracked changes
+    if args.office_file.endswith(".docx"):
+        suggested_rsid = "".join(random.choices("0123456789ABCDEF", k=8))
+        print(f"Suggested RSID for edit session: {suggested_rsid}")
 
-# Extract and format
-output_path = Path(output_dir)
-output_path.mkdir(parents=True, exist_ok=True)
-zipfile.ZipFile(input_file).extractall(output_path)
 
-# Pretty print all XML files
-xml_files = list(output_path.rglob("*.xml")) + list(output_path.rglob("*.rels"))
-for xml_file in xml_files:
-    content = xml_file.read_text(encoding="utf-8")
+def unpack_document(
+    office_file,
+    output_dir,
+    pretty_print=None,
+    max_pretty_size=None,
+    workers=1,
+    extract_only=False,
+):
+    """Unpack an Office file, pretty-printing its XML parts for reading and editing.
+
+    Every entry is extracted, and a manifest is written for pack.py to reuse
+    the entries left untouched. XML parts that are not pretty-printed stay
+    exactly as stored; pack.py handles both.
+
+    Args:
+        office_file: Path to the Office file (.docx/.pptx/.xlsx)
+        output_dir: Directory to unpack into (created if missing)
+        pretty_print: Glob patterns of the XML parts to pretty-print, matched
+            case-insensitively against entry names, e.g. ["word/*"]
+            (default: all XML parts)
+        max_pretty_size: Leave XML parts larger than this many bytes as
+            stored, e.g. huge sheets nobody will read (default: no limit)
+        workers: Processes pretty-printing parts (default: 1, everything in
+            this process). None picks one per CPU once the parts pass
+            PARALLEL_MIN_BYTES, unless this already runs in a worker process;
+            the worker processes re-import the caller's main module where
+            processes are spawned, so it needs an if __name__ == "__main__"
+            guard.
+        extract_only: Only extract the files, pretty-printing nothing
+
+    Returns:
+        list: Names of the pretty-printed parts
+    """
+    output_path = Path(output_dir)
+    output_path.mkdir(parents=True, exist_ok=True)
+    with zipfile.ZipFile(office_file) as zf:
+        zf.extractall(output_path)
+        infos = {info.filename: info for info in zf.infolist() if not info.is_dir()}
+
+    patterns = [pattern.lower() for pattern in pretty_print or ["*"]]
+    parts = [
+        info
+        for name, info in infos.items()
+        if not extract_only
+        and name.endswith((".xml", ".rels"))
+        and any(fnmatch.fnmatchcase(name.lower(), pattern) for pattern in patterns)
+        and (max_pretty_size is None or info.file_size <= max_pretty_size)
+        and (output_path / name).is_file()
+    ]
+
+    if workers is None:
+        size = sum(info.file_size for info in parts)
+        in_worker = multiprocessing.parent_process() is not None
+        workers = 1 if in_worker or size < PARALLEL_MIN_BYTES else os.cpu_count()
+    paths = [output_path / info.filename for info in parts]
+    if min(workers or 1, len(paths)) <= 1:
+        for path in paths:
+            _pretty_print_file(path)
+    else:
+        with ProcessPoolExecutor(min(workers, len(paths))) as pool:
+            # Largest first, so one huge part does not finish last on its own
+            order = sorted(paths, key=lambda path: -path.stat().st_size)
+            list(pool.map(_pretty_print_file, order))
+
+    # Lets pack.py copy the parts that are left untouched as they are stored
+    write_manifest(office_file, output_path)
+    return [info.filename for info in parts]
+
+
+def _pretty_print_file(xml_file):
+    """Re-indent an XML file in place (possibly in a worker)."""
+    content = Path(xml_file).read_text(encoding="utf-8")
     dom = defusedxml.minidom.parseString(content)
-    xml_file.write_bytes(dom.toprettyxml(indent="  ", encoding="ascii"))
+    Path(xml_file).write_bytes(dom.toprettyxml(indent="  ", encoding="ascii"))
+
 
-# For .docx files, suggest an RSID for tracked changes
-if input_file.endswith(".docx"):
-    suggested_rsid = "".join(random.choices("0123456789ABCDEF", k=8))
-    print(f"Suggested RSID for edit session: {suggested_rsid}")
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+import tempfile
+import unittest
+import zipfile
+from pathlib import Path
+from unittest import mock
+
+import defusedxml.minidom
+
+import unpack
+from pack import MANIFEST_NAME, pack_document
+from pack_test import make_unpacked, read_package, tree_state
+from unpack import unpack_document
+
+XML_PARTS = [
+    "[Content_Types].xml",
+    "_rels/.rels",
+    "docProps/app.xml",
+    "word/document.xml",
+]
+
+
+def baseline_unpack(office_file, output_dir):
+    """Unpack a file the way unpack.py did before it took options"""
+    output_path = Path(output_dir)
+    output_path.mkdir(parents=True, exist_ok=True)
+    zipfile.ZipFile(office_file).extractall(output_path)
+    xml_files = list(output_path.rglob("*.xml")) + list(output_path.rglob("*.rels"))
+    for xml_file in xml_files:
+        content = xml_file.read_text(encoding="utf-8")
+        dom = defusedxml.minidom.parseString(content)
+        xml_file.write_bytes(dom.toprettyxml(indent="  ", encoding="ascii"))
+
+
+class TestUnpackDocument(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.office_file = Path(self.tmp.name) / "original.docx"
+        pack_document(make_unpacked(self.tmp.name), self.office_file, workers=1)
+        self.stored = read_package(self.office_file)
+        baseline_dir = Path(self.tmp.name) / "baseline"
+        baseline_unpack(self.office_file, baseline_dir)
+        self.pretty = tree_state(baseline_dir)
+        self.output = Path(self.tmp.name) / "output"
+
+    def unpacked(self, output):
+        state = tree_state(output)
+        self.assertIn(MANIFEST_NAME, state)
+        del state[MANIFEST_NAME]
+        return state
+
+    def test_matches_baseline(self):
+        """Test unpacking everything against the old script, in process and in a pool"""
+        for workers in (1, 2):
+            with self.subTest(workers=workers):
+                output = Path(self.tmp.name) / f"workers-{workers}"
+                pretty = unpack_document(self.office_file, output, workers=workers)
+                self.assertEqual(sorted(pretty), sorted(XML_PARTS))
+                self.assertEqual(self.unpacked(output), self.pretty)
+
+    def test_in_process_by_default(self):
+        with mock.patch.object(unpack, "ProcessPoolExecutor") as pool:
+            unpack_document(self.office_file, self.output)
+        pool.assert_not_called()
+        self.assertEqual(self.unpacked(self.output), self.pretty)
+
+    def test_selected_parts(self):
+        """Test that parts left out of pretty-printing stay as stored"""
+        document = "word/document.xml"
+        size = len(self.stored[document])
+        cases = [
+            ({"pretty_print": ["word/*"]}, [document]),
+            ({"pretty_print": ["WORD/*.XML", "_rels/*"]}, ["_rels/.rels", document]),
+            ({"max_pretty_size": size - 1}, sorted(set(XML_PARTS) - {document})),
+            ({"max_pretty_size": size}, XML_PARTS),
+            ({"extract_only": True}, []),
+            ({"extract_only": True, "pretty_print": ["*"]}, []),
+        ]
+        for index, (options, expected) in enumerate(cases):
+            with self.subTest(**options):
+                output = Path(self.tmp.name) / f"selected-{index}"
+                pretty = unpack_document(self.office_file, output, **options)
+                self.assertEqual(sorted(pretty), sorted(expected))
+                self.assertEqual(
+                    self.unpacked(output),
+                    {
+                        name: self.pretty[name] if name in expected else content
+                        for name, content in self.stored.items()
+                    },
+                )
+
+    def test_round_trip(self):
+        """Test that packing what was unpacked gives back the same entries"""
+        cases = [{}, {"pretty_print": ["word/*"]}, {"extract_only": True}]
+        for index, options in enumerate(cases):
+            with self.subTest(**options):
+                output = Path(self.tmp.name) / f"round-trip-{index}"
+                unpack_document(self.office_file, output, **options)
+                repacked = output.with_suffix(".docx")
+                pack_document(output, repacked)
+                self.assertEqual(read_package(repacked), self.stored)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -3,10 +3,23 @@ Base validator with common validation logic for document files.
 """
 
 import re
+from functools import lru_cache
 from pathlib import Path
 
 import lxml.etree
 
+# Written by unpack.py for pack.py; not part of the document
+UNPACK_MANIFEST = ".unpack-manifest.json"
+
+
+@lru_cache(maxsize=None)
+def _load_schema(schema_path):
+    """Compile an XSD schema once per process; every later validation reuses it."""
+    with open(schema_path, "rb") as xsd_file:
+        parser = lxml.etree.XMLParser()
+        xsd_doc = lxml.etree.parse(xsd_file, parser=parser, base_url=str(schema_path))
+    return lxml.etree.XMLSchema(xsd_doc)
+
 
 class BaseSchemaValidator:
     """Base validator with common validation logic for document files."""
@@ -295,6 +308,7 @@ class BaseSchemaValidator:
                 file_path.is_file()
                 and file_path.name != "[Content_Types].xml"
                 and not file_path.name.endswith(".rels")
+                and file_path.name != UNPACK_MANIFEST
             ):  # This file is not referenced by .rels
                 all_files.append(file_path.resolve())
 
@@ -830,13 +844,7 @@ class BaseSchemaValidator:
             return None, None  # Skip file
 
         try:
-            # Load schema
-            with open(schema_path, "rb") as xsd_file:
-                parser = lxml.etree.XMLParser()
-                xsd_doc = lxml.etree.parse(
-                    xsd_file, parser=parser, base_url=str(schema_path)
-                )
-                schema = lxml.etree.XMLSchema(xsd_doc)
+            schema = _load_schema(schema_path)
 
             # Load and preprocess XML
             with open(xml_file, "r") as f:
@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+Apply one edit recipe to many Word documents on a pool of worker processes.
+
+A recipe is a picklable (module-level) function that takes an open Document
+and edits it; whatever it returns is recorded in the report. Each worker
+imports the library once and keeps its compiled XSD schemas between
+documents, and is replaced after a fixed number of documents so memory
+cannot creep up over a long run. Results and failures are written to a JSONL
+report as soon as each document finishes. Workers are only replaced on
+Python 3.11 and later (on older versions they run until the batch ends),
+and the memory limit needs the Unix resource module.
+
+Usage:
+    from skills.docx.scripts.batch import run_batch
+
+    def recipe(doc):  # Must be importable by the workers
+        return doc["word/document.xml"].suggest_replacements({"Contractor": "Supplier"})
+
+    summary = run_batch(Path("in").glob("*.docx"), recipe, "report.jsonl", output_dir="out")
+
+Example usage (command line, recipe given as module:function):
+    python -m scripts.batch recipes:rename_parties in/*.docx --output-dir out --report report.jsonl
+    python -m scripts.batch recipes:audit in/*.docx --report audit.jsonl --workers 8
+"""
+
+import argparse
+import importlib
+import importlib.util
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+from .document import Document
+
+
+def run_batch(
+    inputs,
+    recipe,
+    report,
+    output_dir=None,
+    workers=None,
+    tasks_per_worker=50,
+    memory_limit_mb=None,
+    validate=True,
+    **document_options,
+):
+    """
+    Run a recipe on every input document in parallel.
+
+    Each input (a .docx file or an unpacked directory) is opened as a Document
+    in a worker process, passed to recipe, and saved as
+    output_dir/<name>.docx if output_dir is given (otherwise nothing is saved,
+    e.g. for recipes that only collect information). A failing document is
+    recorded and does not stop the batch.
+
+    Args:
+        inputs: Iterable of .docx paths or unpacked directories
+        recipe: Picklable callable taking a Document; its return value is
+            stored in the report (as JSON, falling back to str())
+        report: Path of the JSONL report, one line per document in completion
+            order with "index", "input", "output", "ok", "result" or "error"
+            and "traceback", and "seconds"
+        output_dir: Directory for the edited documents (created if missing)
+        workers: Number of worker processes (default: CPU count)
+        tasks_per_worker: Documents a worker handles before it is replaced
+            (Python 3.11+; ignored on older versions)
+        memory_limit_mb: Address space limit per worker; a document that
+            exceeds it fails with MemoryError (Unix only)
+        validate: Validate documents when saving them (default: True)
+        **document_options: Passed to Document (e.g. engine="lxml", author)
+
+    Returns:
+        dict: {"ok": count, "failed": count}
+
+    Raises:
+        ValueError: If memory_limit_mb is given on a platform without the
+            resource module (e.g. Windows)
+    """
+    if memory_limit_mb and importlib.util.find_spec("resource") is None:
+        raise ValueError(
+            "memory_limit_mb needs the resource module, which this platform "
+            "lacks (e.g. Windows); run without a memory limit"
+        )
+    workers = workers or os.cpu_count() or 1
+    pool_options = {}
+    if sys.version_info >= (3, 11):
+        pool_options["max_tasks_per_child"] = tasks_per_worker
+    if output_dir is not None:
+        output_dir = Path(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+        output_dir = str(output_dir)
+
+    # Only a few documents per worker are queued, so inputs are read lazily
+    window = 2 * workers
+    items = enumerate(inputs)
+    summary = {"ok": 0, "failed": 0}
+    context = multiprocessing.get_context("spawn")
+
+    # A worker that dies outright (e.g. killed) breaks the whole pool. The
+    # documents in flight then run again one at a time in a new pool, and a
+    # document that breaks a pool twice is reported as failed.
+    crashed = set()
+    retries = []
+
+    with open(report, "w", encoding="utf-8") as report_file:
+        exhausted = False
+        while not exhausted or retries:
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=context,
+                initializer=_init_worker,
+                initargs=(memory_limit_mb,),
+                **pool_options,
+            ) as pool:
+                in_flight = {}
+                broken = False
+                while True:
+                    while not broken:
+                        isolated = retries or any(
+                            index in crashed for index, _ in in_flight.values()
+                        )
+                        if len(in_flight) >= (1 if isolated else window):
+                            break
+                        item = retries.pop() if retries else next(items, None)
+                        if item is None:
+                            exhausted = True
+                            break
+                        try:
+                            future = pool.submit(
+                                _run_recipe,
+                                str(item[1]),
+                                recipe,
+                                output_dir,
+                                validate,
+                                document_options,
+                            )
+                        except BrokenProcessPool:
+                            retries.append(item)
+                            broken = True
+                            break
+                        in_flight[future] = item
+                    if not in_flight:
+                        break
+
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        index, source = in_flight.pop(future)
+                        try:
+                            entry = future.result()
+                        except BrokenProcessPool as exc:
+                            broken = True
+                            if index not in crashed:
+                                crashed.add(index)
+                                retries.append((index, source))
+                                continue
+                            entry = _failure(str(source), exc, "Worker process died")
+                        except Exception as exc:
+                            # E.g. a recipe or result that cannot be pickled
+                            entry = _failure(str(source), exc)
+                        summary["ok" if entry["ok"] else "failed"] += 1
+                        report_file.write(
+                            json.dumps({"index": index, **entry}, default=str) + "\n"
+                        )
+                        report_file.flush()
+
+    return summary
+
+
+def _init_worker(memory_limit_mb):
+    """Cap the address space of a worker process."""
+    if memory_limit_mb:
+        # Unix only; run_batch checked that it exists
+        import resource
+
+        limit = memory_limit_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+def _run_recipe(source, recipe, output_dir, validate, document_options):
+    """Open one document, apply the recipe and save it (runs in a worker)."""
+    start = time.perf_counter()
+    doc = None
+    try:
+        doc = Document(source, **document_options)
+        result = recipe(doc)
+        output = None
+        if output_dir is not None:
+            output = Path(output_dir) / f"{Path(source).stem}.docx"
+            doc.save_as(output, validate=validate)
+        entry = {"input": source, "output": output, "ok": True, "result": result}
+    except Exception as exc:
+        entry = _failure(source, exc)
+    finally:
+        if doc is not None:
+            # Remove the working copy now rather than whenever doc is collected
+            shutil.rmtree(doc.temp_dir, ignore_errors=True)
+    entry["seconds"] = round(time.perf_counter() - start, 3)
+    return entry
+
+
+def _failure(source, exc, message=None):
+    """Build the report entry of a document that failed."""
+    error = f"{type(exc).__name__}: {exc}"
+    return {
+        "input": source,
+        "output": None,
+        "ok": False,
+        "error": f"{message} ({error})" if message else error,
+        "traceback": "".join(
+            traceback.format_exception(type(exc), exc, exc.__traceback__)
+        ),
+    }
+
+
+def _load_recipe(spec):
+    """Import a recipe given as "module:function"."""
+    module_name, _, function_name = spec.partition(":")
+    if not function_name:
+        raise SystemExit(f"Error: recipe must be given as module:function, got {spec}")
+    return getattr(importlib.import_module(module_name), function_name)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Apply an edit recipe to many Word documents in parallel"
+    )
+    parser.add_argument("recipe", help="Recipe function as module:function")
+    parser.add_argument("inputs", nargs="+", help=".docx files or unpacked directories")
+    parser.add_argument("--report", required=True, help="JSONL report to write")
+    parser.add_argument("--output-dir", help="Directory for the edited documents")
+    parser.add_argument("--workers", type=int, help="Worker processes (default: CPUs)")
+    parser.add_argument(
+        "--tasks-per-worker",
+        type=int,
+        default=50,
+        help="Documents per worker before it is replaced (default: 50)",
+    )
+    parser.add_argument("--memory-limit-mb", type=int, help="Memory cap per worker")
+    parser.add_argument("--engine", default="minidom", help="minidom or lxml")
+    parser.add_argument("--author", default="Claude", help="Author of tracked changes")
+    parser.add_argument(
+        "--no-validate", action="store_true", help="Skip validation when saving"
+    )
+    args = parser.parse_args()
+
+    summary = run_batch(
+        args.inputs,
+        _load_recipe(args.recipe),
+        args.report,
+        output_dir=args.output_dir,
+        workers=args.workers,
+        tasks_per_worker=args.tasks_per_worker,
+        memory_limit_mb=args.memory_limit_mb,
+        validate=not args.no_validate,
+        engine=args.engine,
+        author=args.author,
+    )
+    print(f"{summary['ok']} succeeded, {summary['failed']} failed; see {args.report}")
+    if summary["failed"]:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+import json
+import tempfile
+import unittest
+import zipfile
+from pathlib import Path
+
+from ooxml.scripts.pack import pack_document
+
+from .batch import run_batch
+from .document import Document
+from .document_test import canonical_xml, make_document
+
+
+def replace_greeting(doc):
+    """Recipe used by the tests (workers import it from this module)"""
+    return doc["word/document.xml"].suggest_replacements({"hello": "goodbye"})
+
+
+def count_paragraphs(doc):
+    """Recipe that only reads"""
+    return len(doc["word/document.xml"].get_nodes("w:p"))
+
+
+class TestRunBatch(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.tmp = Path(directory.name)
+        self.inputs = []
+        for i in range(3):
+            source = make_document(self.tmp / f"source{i}", paragraphs=4 + i)
+            self.inputs.append(self.tmp / f"doc{i}.docx")
+            pack_document(source, self.inputs[-1], workers=1)
+
+    def read_report(self, path):
+        with open(path, encoding="utf-8") as report:
+            return sorted((json.loads(line) for line in report), key=lambda e: e["index"])
+
+    def package_parts(self, path):
+        with zipfile.ZipFile(path) as package:
+            return {
+                name: canonical_xml(package.read(name))
+                for name in package.namelist()
+                if name.endswith((".xml", ".rels"))
+            }
+
+    def test_batch_matches_sequential_edits(self):
+        """Test that each output equals running the recipe on the document in this process"""
+        summary = run_batch(
+            self.inputs,
+            replace_greeting,
+            self.tmp / "report.jsonl",
+            output_dir=self.tmp / "out",
+            workers=2,
+            validate=False,
+            rsid="00AB12CD",
+        )
+        self.assertEqual(summary, {"ok": 3, "failed": 0})
+        entries = self.read_report(self.tmp / "report.jsonl")
+        self.assertEqual([entry["result"] for entry in entries], [4, 5, 6])
+
+        for source in self.inputs:
+            with self.subTest(source=source.name):
+                document = Document(source, rsid="00AB12CD")
+                self.addCleanup(document.__del__)
+                replace_greeting(document)
+                expected = self.tmp / f"expected-{source.name}"
+                document.save_as(expected, validate=False)
+                self.assertEqual(
+                    self.package_parts(self.tmp / "out" / source.name),
+                    self.package_parts(expected),
+                )
+
+    def test_failures_are_reported(self):
+        """Test that a broken input is reported without stopping the others"""
+        broken = self.tmp / "broken.docx"
+        broken.write_text("not a zip")
+        summary = run_batch(
+            [self.inputs[0], broken, self.inputs[1]],
+            count_paragraphs,
+            self.tmp / "report.jsonl",
+            workers=1,
+            tasks_per_worker=1,
+        )
+        self.assertEqual(summary, {"ok": 2, "failed": 1})
+        entries = self.read_report(self.tmp / "report.jsonl")
+        self.assertEqual([entry["ok"] for entry in entries], [True, False, True])
+        self.assertEqual(entries[0]["result"], 6)
+        self.assertIn("ValueError", entries[1]["error"])
+        self.assertIsNone(entries[1]["output"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Compare the minidom and lxml editor engines on an XML part.
+
+Each engine runs in a fresh process against a temporary copy of the part, so
+timings and peak memory are measured independently. Run from the docx skill
+root on a large part to see the difference:
+
+Example usage:
+    python -m scripts.benchmark_engines unpacked/word/document.xml
+    python -m scripts.benchmark_engines unpacked/word/document.xml --lookups 500
+"""
+
+import argparse
+import multiprocessing
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from .utilities import LxmlXMLEditor, XMLEditor
+
+ENGINES = {"minidom": XMLEditor, "lxml": LxmlXMLEditor}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark XML editor engines")
+    parser.add_argument(
+        "xml_file", help="XML part to benchmark (e.g. word/document.xml)"
+    )
+    parser.add_argument(
+        "--lookups",
+        type=int,
+        default=200,
+        help="Number of get_node lookups and inserts",
+    )
+    args = parser.parse_args()
+
+    xml_path = Path(args.xml_file)
+    if not xml_path.is_file():
+        raise SystemExit(f"Error: {xml_path} is not a file")
+
+    size_mb = xml_path.stat().st_size / 1024 / 1024
+    print(f"{xml_path} ({size_mb:.1f} MB), {args.lookups} lookups/inserts")
+    print(
+        f"{'engine':<10}{'parse':>10}{'lookups':>10}{'inserts':>10}{'save':>10}{'peak RSS':>12}"
+    )
+
+    context = multiprocessing.get_context("spawn")
+    for engine in ENGINES:
+        with context.Pool(1) as pool:
+            result = pool.apply(benchmark_engine, (engine, str(xml_path), args.lookups))
+        peak_rss = result["peak_rss_mb"]
+        print(
+            f"{engine:<10}"
+            f"{result['parse']:>9.2f}s{result['lookups']:>9.2f}s"
+            f"{result['inserts']:>9.2f}s{result['save']:>9.2f}s"
+            + (f"{peak_rss:>9.0f} MB" if peak_rss is not None else f"{'n/a':>12}")
+        )
+
+
+def benchmark_engine(engine, xml_file, lookups):
+    """Time parse, lookup, insert, and save for one engine (run in a worker process).
+
+    Returns:
+        dict: Seconds per phase and the process's peak RSS in MB (None where
+        the resource module is missing, e.g. on Windows)
+    """
+    with tempfile.TemporaryDirectory() as temp_dir:
+        work_path = Path(temp_dir) / Path(xml_file).name
+        shutil.copy(xml_file, work_path)
+
+        start = time.perf_counter()
+        editor = ENGINES[engine](work_path)
+        parse = time.perf_counter() - start
+
+        # Look up evenly spaced paragraphs by their w14:paraId
+        paragraphs = editor.get_nodes("w:p")
+        step = max(1, len(paragraphs) // max(1, lookups))
+        para_ids = [
+            para_id
+            for para_id in (
+                editor.get_attribute(p, "w14:paraId") for p in paragraphs[::step]
+            )
+            if para_id
+        ][:lookups]
+        del paragraphs
+
+        start = time.perf_counter()
+        found = [
+            editor.get_node(tag="w:p", attrs={"w14:paraId": para_id})
+            for para_id in para_ids
+        ]
+        lookup_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for para in found:
+            editor.insert_after(para, "<w:p><w:r><w:t>benchmark</w:t></w:r></w:p>")
+        insert_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        editor.save()
+        save_time = time.perf_counter() - start
+
+    try:
+        import resource
+    except ImportError:  # Windows
+        peak_rss = None
+    else:
+        # ru_maxrss is reported in KB on Linux and in bytes on macOS
+        peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        if sys.platform == "darwin":
+            peak_rss /= 1024
+    return {
+        "parse": parse,
+        "lookups": lookup_time,
+        "inserts": insert_time,
+        "save": save_time,
+        "peak_rss_mb": peak_rss,
+    }
+
+
+if __name__ == "__main__":
+    main()
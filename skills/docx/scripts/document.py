@@ -8,6 +8,8 @@ Usage:
     # Initialize
     doc = Document('workspace/unpacked')
     doc = Document('workspace/unpacked', author="John Doe", initials="JD")
+    doc = Document('workspace/unpacked', engine="lxml")  # Faster on large documents
+    doc = Document.open('workspace/input.docx')  # No unpack.py round trip
 
     # Find nodes
     node = doc["word/document.xml"].get_node(tag="w:del", attrs={"w:id": "1"})
@@ -24,25 +26,48 @@ Usage:
 
     # Save
     doc.save()
+    doc.save_as('workspace/output.docx')
 """
 
+import copy
+import difflib
 import html
+import os
 import random
+import re
 import shutil
 import tempfile
+import zipfile
+from bisect import bisect_left, bisect_right
+from collections import Counter
 from datetime import datetime, timezone
+from itertools import groupby
 from pathlib import Path
+from typing import NamedTuple
 
+import lxml.etree
 from defusedxml import minidom
-from ooxml.scripts.pack import pack_document
+from ooxml.scripts.pack import (
+    compression_for,
+    copy_zip_entry,
+    pack_document,
+    write_condensed_entry,
+)
 from ooxml.scripts.validation.docx import DOCXSchemaValidator
 from ooxml.scripts.validation.redlining import RedliningValidator
 
-from .utilities import XMLEditor
+from .utilities import IdAllocator, LxmlXMLEditor, XMLEditor, _remove_keeping_tail
 
 # Path to template files
 TEMPLATE_DIR = Path(__file__).parent / "templates"
 
+# Namespaces of the attributes injected into new content
+W_NAMESPACE = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+W14_NAMESPACE = "http://schemas.microsoft.com/office/word/2010/wordml"
+W16DU_NAMESPACE = "http://schemas.microsoft.com/office/word/2023/wordml/word16du"
+W16CEX_NAMESPACE = "http://schemas.microsoft.com/office/word/2018/wordml/cex"
+XML_NAMESPACE = "http://www.w3.org/XML/1998/namespace"
+
 
 class DocxXMLEditor(XMLEditor):
     """XMLEditor that automatically applies RSID, author, and date to new elements.
@@ -71,47 +96,54 @@ class DocxXMLEditor(XMLEditor):
         self.rsid = rsid
         self.author = author
         self.initials = initials
+        self._change_ids = IdAllocator(
+            lambda: (
+                elem.getAttribute("w:id")
+                for tag in ("w:ins", "w:del")
+                for elem in self._dom.getElementsByTagName(tag)
+            )
+        )
 
     def _get_next_change_id(self):
-        """Get the next available change ID by checking all tracked change elements."""
-        max_id = -1
-        for tag in ("w:ins", "w:del"):
-            elements = self.dom.getElementsByTagName(tag)
-            for elem in elements:
-                change_id = elem.getAttribute("w:id")
-                if change_id:
-                    try:
-                        max_id = max(max_id, int(change_id))
-                    except ValueError:
-                        pass
-        return max_id + 1
+        """Allocate the next change ID (seeded once from all tracked change elements)."""
+        return self._change_ids.allocate()
+
+    def _checkpoint_state(self):
+        """Return copies of the attributes rollback() restores, including change IDs."""
+        return {
+            **super()._checkpoint_state(),
+            "_change_ids": copy.copy(self._change_ids),
+        }
 
     def _ensure_w16du_namespace(self):
         """Ensure w16du namespace is declared on the root element."""
-        root = self.dom.documentElement
+        root = self._root
         if not root.hasAttribute("xmlns:w16du"):  # type: ignore
             root.setAttribute(  # type: ignore
                 "xmlns:w16du",
                 "http://schemas.microsoft.com/office/word/2023/wordml/word16du",
             )
+            self._ns_decl = None
 
     def _ensure_w16cex_namespace(self):
         """Ensure w16cex namespace is declared on the root element."""
-        root = self.dom.documentElement
+        root = self._root
         if not root.hasAttribute("xmlns:w16cex"):  # type: ignore
             root.setAttribute(  # type: ignore
                 "xmlns:w16cex",
                 "http://schemas.microsoft.com/office/word/2018/wordml/cex",
             )
+            self._ns_decl = None
 
     def _ensure_w14_namespace(self):
         """Ensure w14 namespace is declared on the root element."""
-        root = self.dom.documentElement
+        root = self._root
         if not root.hasAttribute("xmlns:w14"):  # type: ignore
             root.setAttribute(  # type: ignore
                 "xmlns:w14",
                 "http://schemas.microsoft.com/office/word/2010/wordml",
             )
+            self._ns_decl = None
 
     def _inject_attributes_to_nodes(self, nodes):
         """Inject RSID, author, and date attributes into DOM nodes where applicable.
@@ -155,9 +187,9 @@ class DocxXMLEditor(XMLEditor):
                 self._ensure_w14_namespace()
                 elem.setAttribute("w14:textId", _generate_hex_id())
 
-        def add_rsid_to_r(elem):
+        def add_rsid_to_r(elem, inside_deletion):
             # Use w:rsidDel for <w:r> inside <w:del>, otherwise w:rsidR
-            if is_inside_deletion(elem):
+            if inside_deletion:
                 if not elem.hasAttribute("w:rsidDel"):
                     elem.setAttribute("w:rsidDel", self.rsid)
             else:
@@ -168,6 +200,8 @@ class DocxXMLEditor(XMLEditor):
             # Auto-assign w:id if not present
             if not elem.hasAttribute("w:id"):
                 elem.setAttribute("w:id", str(self._get_next_change_id()))
+            else:
+                self._change_ids.observe(elem.getAttribute("w:id"))
             if not elem.hasAttribute("w:author"):
                 elem.setAttribute("w:author", self.author)
             if not elem.hasAttribute("w:date"):
@@ -204,60 +238,79 @@ class DocxXMLEditor(XMLEditor):
                     if not elem.hasAttribute("xml:space"):
                         elem.setAttribute("xml:space", "preserve")
 
+        # Handlers by tag, in the order descendants are processed. Processing
+        # tag by tag keeps the order of w:id allocation and of namespace
+        # declarations added to the root stable.
+        handlers = {
+            "w:p": lambda elem, inside_deletion: add_rsid_to_p(elem),
+            "w:r": add_rsid_to_r,
+            "w:t": lambda elem, inside_deletion: add_xml_space_to_t(elem),
+            "w:ins": lambda elem, inside_deletion: add_tracked_change_attrs(elem),
+            "w:del": lambda elem, inside_deletion: add_tracked_change_attrs(elem),
+            "w:comment": lambda elem, inside_deletion: add_comment_attrs(elem),
+            "w16cex:commentExtensible": (
+                lambda elem, inside_deletion: add_comment_extensible_date(elem)
+            ),
+        }
+
         for node in nodes:
             if node.nodeType != node.ELEMENT_NODE:
                 continue
 
             # Handle the node itself
-            if node.tagName == "w:p":
-                add_rsid_to_p(node)
-            elif node.tagName == "w:r":
-                add_rsid_to_r(node)
-            elif node.tagName == "w:t":
-                add_xml_space_to_t(node)
-            elif node.tagName in ("w:ins", "w:del"):
-                add_tracked_change_attrs(node)
-            elif node.tagName == "w:comment":
-                add_comment_attrs(node)
-            elif node.tagName == "w16cex:commentExtensible":
-                add_comment_extensible_date(node)
-
-            # Process descendants (getElementsByTagName doesn't return the element itself)
-            for elem in node.getElementsByTagName("w:p"):
-                add_rsid_to_p(elem)
-            for elem in node.getElementsByTagName("w:r"):
-                add_rsid_to_r(elem)
-            for elem in node.getElementsByTagName("w:t"):
-                add_xml_space_to_t(elem)
-            for tag in ("w:ins", "w:del"):
-                for elem in node.getElementsByTagName(tag):
-                    add_tracked_change_attrs(elem)
-            for elem in node.getElementsByTagName("w:comment"):
-                add_comment_attrs(elem)
-            for elem in node.getElementsByTagName("w16cex:commentExtensible"):
-                add_comment_extensible_date(elem)
-
-    def replace_node(self, elem, new_content):
+            inside_deletion = is_inside_deletion(node)
+            handler = handlers.get(node.tagName)
+            if handler:
+                handler(node, inside_deletion)
+
+            # Collect descendants by tag in a single traversal, carrying
+            # whether each one is inside a w:del
+            descendants = {tag: [] for tag in handlers}
+            inside_deletion = inside_deletion or node.tagName == "w:del"
+            stack = [(child, inside_deletion) for child in reversed(node.childNodes)]
+            while stack:
+                elem, inside_deletion = stack.pop()
+                if elem.nodeType != elem.ELEMENT_NODE:
+                    continue
+                tag = elem.tagName
+                if tag in descendants:
+                    descendants[tag].append((elem, inside_deletion))
+                inside_deletion = inside_deletion or tag == "w:del"
+                stack.extend(
+                    (child, inside_deletion) for child in reversed(elem.childNodes)
+                )
+
+            for tag, elems in descendants.items():
+                handler = handlers[tag]
+                for elem, inside_deletion in elems:
+                    handler(elem, inside_deletion)
+
+        # Re-index so lookups by attribute see the injected values
+        self._index_nodes(nodes)
+        # Every tracked-change helper ends here, so this also flags their edits
+        self.modified = True
+
+    def replace_node(self, elem, new_content, fields=None):
         """Replace node with automatic attribute injection."""
-        nodes = super().replace_node(elem, new_content)
+        nodes = super().replace_node(elem, new_content, fields)
         self._inject_attributes_to_nodes(nodes)
         return nodes
 
-    def insert_after(self, elem, xml_content):
+    def insert_after(self, elem, xml_content, fields=None):
         """Insert after with automatic attribute injection."""
-        nodes = super().insert_after(elem, xml_content)
+        nodes = super().insert_after(elem, xml_content, fields)
         self._inject_attributes_to_nodes(nodes)
         return nodes
 
-    def insert_before(self, elem, xml_content):
+    def insert_before(self, elem, xml_content, fields=None):
         """Insert before with automatic attribute injection."""
-        nodes = super().insert_before(elem, xml_content)
+        nodes = super().insert_before(elem, xml_content, fields)
         self._inject_attributes_to_nodes(nodes)
         return nodes
 
-    def append_to(self, elem, xml_content):
+    def append_to(self, elem, xml_content, fields=None):
         """Append to with automatic attribute injection."""
-        nodes = super().append_to(elem, xml_content)
+        nodes = super().append_to(elem, xml_content, fields)
         self._inject_attributes_to_nodes(nodes)
         return nodes
 
@@ -304,9 +357,10 @@ class DocxXMLEditor(XMLEditor):
             runs = list(ins_elem.getElementsByTagName("w:r"))
             if not runs:
                 continue
+            self.record_change(ins_elem)
 
             # Create deletion wrapper
-            del_wrapper = self.dom.createElement("w:del")
+            del_wrapper = self._dom.createElement("w:del")
 
             # Process each run
             for run in runs:
@@ -318,7 +372,7 @@ class DocxXMLEditor(XMLEditor):
                     run.setAttribute("w:rsidDel", self.rsid)
 
                 for t_elem in list(run.getElementsByTagName("w:t")):
-                    del_text = self.dom.createElement("w:delText")
+                    del_text = self._dom.createElement("w:delText")
                     # Copy ALL child nodes (not just firstChild) to handle entities
                     while t_elem.firstChild:
                         del_text.appendChild(t_elem.firstChild)
@@ -391,7 +445,7 @@ class DocxXMLEditor(XMLEditor):
                 continue
 
             # Create insertion wrapper
-            ins_elem = self.dom.createElement("w:ins")
+            ins_elem = self._dom.createElement("w:ins")
 
             for run in runs:
                 # Clone the run
@@ -399,7 +453,7 @@ class DocxXMLEditor(XMLEditor):
 
                 # Convert w:delText → w:t
                 for del_text in list(new_run.getElementsByTagName("w:delText")):
-                    t_elem = self.dom.createElement("w:t")
+                    t_elem = self._dom.createElement("w:t")
                     # Copy ALL child nodes (not just firstChild) to handle entities
                     while del_text.firstChild:
                         t_elem.appendChild(del_text.firstChild)
@@ -418,11 +472,14 @@ class DocxXMLEditor(XMLEditor):
                 ins_elem.appendChild(new_run)
 
             # Insert the new insertion after the deletion
-            nodes = self.insert_after(del_elem, ins_elem.toxml())
+            self.record_change(del_elem.parentNode)
+            del_elem.parentNode.insertBefore(ins_elem, del_elem.nextSibling)
+            self._invalidate_text(del_elem.parentNode)
+            self._inject_attributes_to_nodes([ins_elem])
 
             # If processing a single w:del, track the created insertion
-            if is_single_del and nodes:
-                created_insertion = nodes[0]
+            if is_single_del:
+                created_insertion = ins_elem
 
         # Return based on input type
         if is_single_del and created_insertion:
@@ -430,6 +487,188 @@ class DocxXMLEditor(XMLEditor):
         else:
             return [elem]
 
+    def accept_all(self, author=None, since=None, until=None, paragraphs=None):
+        """Accept tracked changes (all, or those matching the filters) in one pass.
+
+        Unlike revert_insertion/revert_deletion, this resolves the changes
+        instead of tracking their reversal: inserted content (w:ins, w:moveTo)
+        is unwrapped, deleted content (w:del, w:moveFrom) is removed,
+        paragraphs whose mark was deleted merge into the next paragraph,
+        deleted table rows are removed, and w:rPrChange/w:pPrChange records
+        are dropped. Move range markers are removed.
+
+        The matching changes are collected in a single walk over the tree and
+        resolved innermost first, so nested changes (another author's deletion
+        inside an insertion) come out right.
+
+        Args:
+            author: Only changes by this author (or by any in a list of authors)
+            since: Only changes dated at or after this datetime (naive means UTC)
+            until: Only changes dated before this datetime; changes without a
+                w:date never match a date window
+            paragraphs: Only changes in these paragraph indexes (e.g.
+                range(10, 20)), numbered as in suggest_text_revisions; changes
+                between paragraphs, such as table row markers, count toward
+                the next paragraph
+
+        Returns:
+            int: Number of tracked changes resolved
+
+        Example:
+            editor = doc["word/document.xml"]
+            editor.accept_all(author="Jane Doe")
+            editor.reject_all(since=datetime(2024, 5, 1), paragraphs=range(50))
+        """
+        return self._resolve_changes(True, author, since, until, paragraphs)
+
+    def reject_all(self, author=None, since=None, until=None, paragraphs=None):
+        """Reject tracked changes (all, or those matching the filters) in one pass.
+
+        The counterpart of accept_all: inserted content is removed, deleted
+        content is restored (w:delText back to w:t), paragraphs whose mark was
+        inserted merge into the next paragraph, inserted table rows are
+        removed, and w:rPrChange/w:pPrChange restore the recorded formatting.
+
+        Args:
+            author: Only changes by this author (or by any in a list of authors)
+            since: Only changes dated at or after this datetime (naive means UTC)
+            until: Only changes dated before this datetime
+            paragraphs: Only changes in these paragraph indexes (see accept_all)
+
+        Returns:
+            int: Number of tracked changes resolved
+        """
+        return self._resolve_changes(False, author, since, until, paragraphs)
+
+    def _resolve_changes(self, accept, author, since, until, paragraphs):
+        """Collect the matching changes in one walk and resolve them, innermost first."""
+        select = _change_selector(author, since, until, paragraphs)
+        changes = []
+        position = 0  # Index of the next top-level paragraph
+
+        def walk(node, in_paragraph):
+            nonlocal position
+            for child in node.childNodes:
+                if child.nodeType != child.ELEMENT_NODE:
+                    continue
+                if child.tagName == "w:p" and not in_paragraph:
+                    position += 1
+                    walk(child, True)
+                    continue
+                local = child.tagName[2:]
+                if child.tagName.startswith("w:") and local in _TRACKED_CHANGE_TAGS:
+                    if select(
+                        local,
+                        lambda name: child.getAttribute(f"w:{name}"),
+                        position - 1 if in_paragraph else position,
+                    ):
+                        changes.append(child)
+                walk(child, in_paragraph)
+
+        walk(self._root, False)
+
+        for change in reversed(changes):
+            self._resolve_change(change, accept)
+        if changes:
+            # Cheaper to rebuild lazily than to patch after a bulk rewrite
+            self._index = None
+            self._text_cache.clear()
+            self.modified = True
+        return len(changes)
+
+    def _resolve_change(self, change, accept):
+        """Accept or reject one tracked change element."""
+        local = change.tagName[2:]
+        parent = change.parentNode
+        action = _change_resolution(local, parent.tagName[2:], accept)
+        self.record_change(parent)
+
+        if action == "unwrap":
+            if local in _DELETION_TAGS:
+                # Restore deleted runs as they were before the deletion
+                for del_text in list(change.getElementsByTagName("w:delText")):
+                    self._rename_element(del_text, "w:t")
+                for instr in list(change.getElementsByTagName("w:delInstrText")):
+                    self._rename_element(instr, "w:instrText")
+                for run in change.getElementsByTagName("w:r"):
+                    if run.hasAttribute("w:rsidDel") and not run.hasAttribute("w:rsidR"):
+                        run.setAttribute("w:rsidR", run.getAttribute("w:rsidDel"))
+                        run.removeAttribute("w:rsidDel")
+            while change.firstChild:
+                parent.insertBefore(change.firstChild, change)
+            parent.removeChild(change)
+        elif action == "remove":
+            parent.removeChild(change)
+        elif action == "merge":
+            # Marker in w:pPr/w:rPr: the paragraph mark goes away
+            parent.removeChild(change)
+            para = parent.parentNode.parentNode
+            content = [
+                child
+                for child in para.childNodes
+                if child.nodeType == child.ELEMENT_NODE and child.tagName != "w:pPr"
+            ]
+            following = para.nextSibling
+            while following is not None and following.nodeType != following.ELEMENT_NODE:
+                following = following.nextSibling
+            previous = para.previousSibling
+            while previous is not None and previous.nodeType != previous.ELEMENT_NODE:
+                previous = previous.previousSibling
+            if following is not None and following.tagName == "w:p":
+                self.record_change(following)
+                anchor = following.firstChild
+                while anchor is not None and (
+                    anchor.nodeType != anchor.ELEMENT_NODE or anchor.tagName == "w:pPr"
+                ):
+                    anchor = anchor.nextSibling
+                for child in content:
+                    following.insertBefore(child, anchor)
+                para.parentNode.removeChild(para)
+            elif previous is not None and previous.tagName == "w:p":
+                # Last paragraph of its container: join the one before instead
+                self.record_change(previous)
+                for child in content:
+                    previous.appendChild(child)
+                para.parentNode.removeChild(para)
+        elif action == "remove_row":
+            row = parent.parentNode
+            row.parentNode.removeChild(row)
+        else:
+            # Rejected formatting change: put the recorded properties back
+            props = parent
+            old = next(
+                (c for c in change.childNodes if c.nodeType == c.ELEMENT_NODE), None
+            )
+            trailing = _TRAILING_PROPERTIES.get(props.tagName[2:], ())
+            for child in list(props.childNodes):
+                if child.nodeType == child.ELEMENT_NODE and not (
+                    child.tagName[2:] in trailing or child.tagName[2:] in _CHANGE_MARKERS
+                ):
+                    props.removeChild(child)
+            anchor = next(
+                (
+                    c
+                    for c in props.childNodes
+                    if c.nodeType == c.ELEMENT_NODE and c.tagName[2:] in trailing
+                ),
+                None,
+            )
+            if old is not None:
+                for child in list(old.childNodes):
+                    if child.nodeType == child.ELEMENT_NODE:
+                        props.insertBefore(child, anchor)
+
+    def _rename_element(self, elem, tag):
+        """Replace elem by an element named tag with the same attributes and children."""
+        renamed = self._dom.createElement(tag)
+        for i in range(elem.attributes.length):
+            attr = elem.attributes.item(i)
+            renamed.setAttribute(attr.name, attr.value)
+        while elem.firstChild:
+            renamed.appendChild(elem.firstChild)
+        elem.parentNode.replaceChild(renamed, elem)
+        return renamed
+
     @staticmethod
     def suggest_paragraph(xml_content: str) -> str:
         """Transform paragraph XML to add tracked change wrapping for insertion.
@@ -499,10 +738,11 @@ class DocxXMLEditor(XMLEditor):
             # Check for existing w:delText
             if elem.getElementsByTagName("w:delText"):
                 raise ValueError("w:r element already contains w:delText")
+            self.record_change(elem.parentNode)
 
             # Convert w:t → w:delText
             for t_elem in list(elem.getElementsByTagName("w:t")):
-                del_text = self.dom.createElement("w:delText")
+                del_text = self._dom.createElement("w:delText")
                 # Copy ALL child nodes (not just firstChild) to handle entities
                 while t_elem.firstChild:
                     del_text.appendChild(t_elem.firstChild)
@@ -520,7 +760,7 @@ class DocxXMLEditor(XMLEditor):
                 elem.setAttribute("w:rsidDel", self.rsid)
 
             # Wrap in w:del
-            del_wrapper = self.dom.createElement("w:del")
+            del_wrapper = self._dom.createElement("w:del")
             parent = elem.parentNode
             parent.insertBefore(del_wrapper, elem)
             parent.removeChild(elem)
@@ -535,6 +775,7 @@ class DocxXMLEditor(XMLEditor):
             # Check for existing tracked changes
             if elem.getElementsByTagName("w:ins") or elem.getElementsByTagName("w:del"):
                 raise ValueError("w:p element already contains tracked changes")
+            self.record_change(elem)
 
             # Check if it's a numbered list item
             pPr_list = elem.getElementsByTagName("w:pPr")
@@ -546,20 +787,21 @@ class DocxXMLEditor(XMLEditor):
                 rPr_list = pPr.getElementsByTagName("w:rPr")
 
                 if not rPr_list:
-                    rPr = self.dom.createElement("w:rPr")
+                    rPr = self._dom.createElement("w:rPr")
                     pPr.appendChild(rPr)
                 else:
                     rPr = rPr_list[0]
 
                 # Add <w:del/> marker
-                del_marker = self.dom.createElement("w:del")
+                del_marker = self._dom.createElement("w:del")
                 rPr.insertBefore(
                     del_marker, rPr.firstChild
                 ) if rPr.firstChild else rPr.appendChild(del_marker)
+                self._index_nodes([del_marker])
 
             # Convert w:t → w:delText in all runs
             for t_elem in list(elem.getElementsByTagName("w:t")):
-                del_text = self.dom.createElement("w:delText")
+                del_text = self._dom.createElement("w:delText")
                 # Copy ALL child nodes (not just firstChild) to handle entities
                 while t_elem.firstChild:
                     del_text.appendChild(t_elem.firstChild)
@@ -578,7 +820,7 @@ class DocxXMLEditor(XMLEditor):
                     run.setAttribute("w:rsidDel", self.rsid)
 
             # Wrap all non-pPr children in <w:del>
-            del_wrapper = self.dom.createElement("w:del")
+            del_wrapper = self._dom.createElement("w:del")
             for child in [c for c in elem.childNodes if c.nodeName != "w:pPr"]:
                 elem.removeChild(child)
                 del_wrapper.appendChild(child)
@@ -592,245 +834,2130 @@ class DocxXMLEditor(XMLEditor):
         else:
             raise ValueError(f"Element must be w:r or w:p, got {elem.nodeName}")
 
+    def suggest_replacements(self, replacements, regex=False, parent=None):
+        """Replace text everywhere with tracked changes, also across run boundaries.
 
-def _generate_hex_id() -> str:
-    """Generate random 8-character hex ID for para/durable IDs.
-
-    Values are constrained to be less than 0x7FFFFFFF per OOXML spec:
-    - paraId must be < 0x80000000
-    - durableId must be < 0x7FFFFFFF
-    We use the stricter constraint (0x7FFFFFFF) for both.
-    """
-    return f"{random.randint(1, 0x7FFFFFFE):08X}"
-
+        Builds each paragraph's text from its runs once, finds all matches of all
+        patterns, splits runs at the match boundaries and wraps the matched text
+        in <w:del>, followed by a <w:ins> run with the replacement (formatted
+        like the first deleted run). Attributes (w:id, author, date, RSIDs) are
+        injected once for all changes.
 
-def _generate_rsid() -> str:
-    """Generate random 8-character hex RSID."""
-    return "".join(random.choices("0123456789ABCDEF", k=8))
+        Only text in plain runs (w:rPr plus w:t children) directly inside a w:p
+        is searched; matches may span bookmarks, comment ranges and proofing
+        marks between runs, but not hyperlinks, fields, tabs, breaks or
+        existing tracked changes.
 
+        Args:
+            replacements: Dict or list of (pattern, replacement) pairs
+            regex: If True, patterns are regular expressions and replacements
+                may use backreferences (as in re.sub); overlapping matches go
+                to the leftmost, then to the earlier pattern. If False
+                (default), patterns are literal and the longest one wins.
+            parent: Only replace inside this element (default: whole document)
 
-class Document:
-    """Manages comments in unpacked Word documents."""
+        Returns:
+            int: Number of replacements made
 
-    def __init__(
-        self,
-        unpacked_dir,
-        rsid=None,
-        track_revisions=False,
-        author="Claude",
-        initials="C",
-    ):
+        Example:
+            editor = doc["word/document.xml"]
+            editor.suggest_replacements({"Contractor": "Supplier", "30 days": "60 days"})
+            editor.suggest_replacements([(r"\\$(\\d+)", r"USD \\1")], regex=True)
         """
-        Initialize with path to unpacked Word document directory.
-        Automatically sets up comment infrastructure (people.xml, RSIDs).
+        find = _compile_replacements(replacements, regex)
+        root = parent if parent is not None else self._root
+        paragraphs = list(root.getElementsByTagName("w:p"))
+        if root.tagName == "w:p":
+            paragraphs.insert(0, root)
+
+        changes = []
+        count = 0
+        for para in paragraphs:
+            para_changed = False
+            for runs in self._plain_run_groups(para):
+                texts = [self._run_text(run) for run in runs]
+                matches = find("".join(texts))
+                if matches:
+                    changes.extend(self._replace_in_runs(runs, texts, matches))
+                    count += len(matches)
+                    para_changed = True
+            if para_changed:
+                self._invalidate_text(para)
+
+        if changes:
+            self._inject_attributes_to_nodes(changes)
+        return count
+
+    def _plain_run_groups(self, para):
+        """Split a paragraph's plain runs into groups whose text is contiguous."""
+        groups = [[]]
+        for child in para.childNodes:
+            if child.nodeType != child.ELEMENT_NODE:
+                continue
+            if child.tagName == "w:r" and self._is_plain_run(child):
+                groups[-1].append(child)
+            elif child.tagName not in _MARKER_TAGS:
+                groups.append([])
+        return [group for group in groups if group]
 
-        Args:
-            unpacked_dir: Path to unpacked DOCX directory (must contain word/ subdirectory)
-            rsid: Optional RSID to use for all comment elements. If not provided, one will be generated.
-            track_revisions: If True, enables track revisions in settings.xml (default: False)
-            author: Default author name for comments (default: "Claude")
-            initials: Default author initials for comments (default: "C")
-        """
-        self.original_path = Path(unpacked_dir)
+    @staticmethod
+    def _is_plain_run(run):
+        """Check whether a run holds only w:rPr and at least one w:t."""
+        tags = [
+            child.tagName
+            for child in run.childNodes
+            if child.nodeType == child.ELEMENT_NODE and child.tagName != "w:rPr"
+        ]
+        return bool(tags) and all(tag == "w:t" for tag in tags)
 
-        if not self.original_path.exists() or not self.original_path.is_dir():
-            raise ValueError(f"Directory not found: {unpacked_dir}")
+    @staticmethod
+    def _run_text(run):
+        """Return the text of a plain run (or of all w:t elements below any element)."""
+        return "".join(
+            node.data
+            for t_elem in run.getElementsByTagName("w:t")
+            for node in t_elem.childNodes
+            if node.nodeType == node.TEXT_NODE
+        )
 
-        # Create temporary directory with subdirectories for unpacked content and baseline
-        self.temp_dir = tempfile.mkdtemp(prefix="docx_")
-        self.unpacked_path = Path(self.temp_dir) / "unpacked"
-        shutil.copytree(self.original_path, self.unpacked_path)
+    def _set_run_text(self, run, text):
+        """Replace the w:t children of a plain run with a single w:t holding text."""
+        for t_elem in list(run.getElementsByTagName("w:t")):
+            self._unindex_node(t_elem)
+            run.removeChild(t_elem)
+        t_elem = self._dom.createElement("w:t")
+        t_elem.appendChild(self._dom.createTextNode(text))
+        if text and (text[0].isspace() or text[-1].isspace()):
+            t_elem.setAttribute("xml:space", "preserve")
+        run.appendChild(t_elem)
+        self._index_nodes([t_elem])
+
+    def _replace_in_runs(self, runs, texts, matches):
+        """Split runs at match boundaries and track the replacements.
 
-        # Pack original directory into temporary .docx for validation baseline (outside unpacked dir)
-        self.original_docx = Path(self.temp_dir) / "original.docx"
-        pack_document(self.original_path, self.original_docx, validate=False)
+        Args:
+            runs: Contiguous plain runs
+            texts: Text of each run
+            matches: Sorted, non-overlapping (start, end, replacement) offsets
+                into the joined text; start == end inserts the replacement there
 
-        self.word_path = self.unpacked_path / "word"
+        Returns:
+            list: The new w:del and w:ins elements, in document order
+        """
+        self.record_change(runs[0])
+        bounds = sorted({offset for start, end, _ in matches for offset in (start, end)})
+
+        # Split runs so that every match boundary falls between two runs
+        pieces = []
+        start = 0
+        for run, text in zip(runs, texts):
+            end = start + len(text)
+            cuts = bounds[bisect_right(bounds, start) : bisect_left(bounds, end)]
+            if not cuts:
+                pieces.append((run, start, end))
+                start = end
+                continue
 
-        # Generate RSID if not provided
-        self.rsid = rsid if rsid else _generate_rsid()
-        print(f"Using RSID: {self.rsid}")
+            # The run keeps the first piece; clones (same properties) take the rest
+            self._set_run_text(run, text[: cuts[0] - start])
+            pieces.append((run, start, cuts[0]))
+            previous = run
+            edges = cuts + [end]
+            for piece_start, piece_end in zip(edges, edges[1:]):
+                piece = run.cloneNode(False)
+                for rpr in run.getElementsByTagName("w:rPr")[:1]:
+                    piece.appendChild(rpr.cloneNode(True))
+                self._set_run_text(piece, text[piece_start - start : piece_end - start])
+                run.parentNode.insertBefore(piece, previous.nextSibling)
+                self._index_nodes([piece])
+                pieces.append((piece, piece_start, piece_end))
+                previous = piece
+            start = end
+
+        changes = []
+        index = 0
+        previous_end = None
+        for start, end, replacement in matches:
+            while index < len(pieces) and pieces[index][2] <= start:
+                index += 1
+            if start == end:
+                # Pure insertion, formatted like the text before it
+                like = pieces[index - 1 if index else 0][0]
+                ins_elem = self._new_insertion(replacement, like)
+                if index < len(pieces):
+                    anchor = pieces[index][0]
+                    anchor.parentNode.insertBefore(ins_elem, anchor)
+                else:
+                    last = changes[-1] if start == previous_end else pieces[-1][0]
+                    last.parentNode.insertBefore(ins_elem, last.nextSibling)
+                changes.append(ins_elem)
+                previous_end = end
+                continue
+            deleted = []
+            while index < len(pieces) and pieces[index][1] < end:
+                deleted.append(pieces[index][0])
+                index += 1
+            changes.extend(self._track_replacement(deleted, replacement))
+            previous_end = end
+        return changes
+
+    def _track_replacement(self, runs, replacement):
+        """Wrap runs in w:del and add a w:ins run with the replacement after them."""
+
+        def previous_element(node):
+            node = node.previousSibling
+            while node is not None and node.nodeType != node.ELEMENT_NODE:
+                node = node.previousSibling
+            return node
+
+        # One w:del per chain of adjacent runs
+        chains = []
+        for run in runs:
+            if chains and previous_element(run) is chains[-1][-1]:
+                chains[-1].append(run)
+            else:
+                chains.append([run])
 
-        # Set default author and initials
-        self.author = author
-        self.initials = initials
+        changes = []
+        for chain in chains:
+            del_wrapper = self._dom.createElement("w:del")
+            chain[0].parentNode.insertBefore(del_wrapper, chain[0])
+            for run in chain:
+                for t_elem in list(run.getElementsByTagName("w:t")):
+                    del_text = self._dom.createElement("w:delText")
+                    while t_elem.firstChild:
+                        del_text.appendChild(t_elem.firstChild)
+                    for i in range(t_elem.attributes.length):
+                        attr = t_elem.attributes.item(i)
+                        del_text.setAttribute(attr.name, attr.value)
+                    self._unindex_node(t_elem)
+                    run.replaceChild(del_text, t_elem)
+                if run.hasAttribute("w:rsidR"):
+                    run.setAttribute("w:rsidDel", run.getAttribute("w:rsidR"))
+                    run.removeAttribute("w:rsidR")
+                elif not run.hasAttribute("w:rsidDel"):
+                    run.setAttribute("w:rsidDel", self.rsid)
+                del_wrapper.appendChild(run)
+            changes.append(del_wrapper)
+
+        if replacement:
+            ins_elem = self._new_insertion(replacement, runs[0])
+            last = changes[-1]
+            last.parentNode.insertBefore(ins_elem, last.nextSibling)
+            changes.append(ins_elem)
+        return changes
+
+    def _new_insertion(self, text, like=None):
+        """Create a detached w:ins with one run holding text, formatted like run like."""
+        ins_elem = self._dom.createElement("w:ins")
+        new_run = self._dom.createElement("w:r")
+        if like is not None:
+            for rpr in like.getElementsByTagName("w:rPr")[:1]:
+                new_run.appendChild(rpr.cloneNode(True))
+        self._set_run_text(new_run, text)
+        ins_elem.appendChild(new_run)
+        return ins_elem
+
+    def suggest_text_revisions(self, paragraphs):
+        """Track the changes that turn the paragraph texts into new ones.
+
+        Aligns the current paragraphs with the new texts by a patience diff
+        over whole paragraphs, so unchanged paragraphs cost one hash lookup.
+        Paired paragraphs whose text differs get a word-level diff, and only
+        the words that changed are wrapped in <w:del>/<w:ins> (as in
+        suggest_replacements). Paragraphs without a counterpart are deleted
+        with suggest_deletion; new ones are inserted as tracked paragraphs
+        with the properties of the paragraph before them.
+
+        Paragraphs are the w:p elements in document order, including table
+        cells but not text boxes; a paragraph's text is that of its w:t
+        elements. A changed paragraph can only be revised if all of its text
+        sits in one group of plain runs.
 
-        # Cache for lazy-loaded editors
-        self._editors = {}
+        Args:
+            paragraphs: The new text of every paragraph, in order
 
-        # Comment file paths
-        self.comments_path = self.word_path / "comments.xml"
-        self.comments_extended_path = self.word_path / "commentsExtended.xml"
-        self.comments_ids_path = self.word_path / "commentsIds.xml"
-        self.comments_extensible_path = self.word_path / "commentsExtensible.xml"
+        Returns:
+            int: Number of paragraphs revised, deleted or inserted
 
-        # Load existing comments and determine next ID (before setup modifies files)
-        self.existing_comments = self._load_existing_comments()
-        self.next_comment_id = self._get_next_comment_id()
+        Raises:
+            ValueError: If a changed paragraph cannot be revised or deleted
+                (nothing is changed then)
 
-        # Convenient access to document.xml editor (semi-private)
-        self._document = self["word/document.xml"]
+        Example:
+            editor = doc["word/document.xml"]
+            editor.suggest_text_revisions(Path("revised.txt").read_text().splitlines())
+        """
+        old = self._top_level_paragraphs()
+        actions = _plan_text_revisions(
+            [self._run_text(para) for para in old], list(paragraphs)
+        )
 
-        # Setup tracked changes infrastructure
-        self._setup_tracking(track_revisions=track_revisions)
+        # Check all paragraphs before changing any of them
+        for kind, index, _ in actions:
+            para = old[index] if index < len(old) else None
+            if kind == "revise" and self._revisable_runs(para) is None:
+                raise ValueError(
+                    f"Paragraph {index} has text outside plain runs and cannot be revised"
+                )
+            if kind == "delete" and (
+                para.getElementsByTagName("w:ins") or para.getElementsByTagName("w:del")
+            ):
+                raise ValueError(f"Paragraph {index} already contains tracked changes")
+            if kind == "insert" and not old:
+                raise ValueError("No paragraph to insert the new paragraphs next to")
+
+        # Insert first, so new paragraphs copy properties not yet marked deleted
+        count = 0
+        for kind, index, texts in actions:
+            if kind == "insert":
+                template = self._inserted_paragraph_template(old[index - 1 if index else 0])
+                fields = [{"text": text} for text in texts]
+                if index < len(old):
+                    self.insert_before(old[index], template, fields)
+                else:
+                    self.insert_after(old[-1], template, fields)
+                count += len(texts)
+
+        changes = []
+        for kind, index, text in actions:
+            if kind == "revise":
+                changes.extend(self._revise_paragraph(old[index], text))
+            elif kind == "delete":
+                self.suggest_deletion(old[index])
+            count += kind != "insert"
+
+        if changes:
+            self._inject_attributes_to_nodes(changes)
+        return count
+
+    def _top_level_paragraphs(self):
+        """Return the w:p elements in document order, skipping nested ones (text boxes)."""
+
+        def is_nested(para):
+            node = para.parentNode
+            while node is not None and node.nodeType == node.ELEMENT_NODE:
+                if node.tagName == "w:p":
+                    return True
+                node = node.parentNode
+            return False
 
-        # Add author to people.xml
-        self._add_author_to_people(author)
+        return [
+            para
+            for para in self._dom.getElementsByTagName("w:p")
+            if not is_nested(para)
+        ]
 
-    def __getitem__(self, xml_path: str) -> DocxXMLEditor:
-        """
-        Get or create a DocxXMLEditor for the specified XML file.
+    def _revisable_runs(self, para):
+        """Return the plain runs holding all of a paragraph's text, or None."""
+        groups = self._plain_run_groups(para)
+        if len(groups) > 1:
+            return None
+        runs = groups[0] if groups else []
+        if "".join(self._run_text(run) for run in runs) != self._run_text(para):
+            return None
+        return runs
+
+    def _revise_paragraph(self, para, text):
+        """Track a word-level diff from a paragraph's text to text; return the changes."""
+        self.record_change(para)
+        runs = self._revisable_runs(para)
+        if not runs:
+            ins_elem = self._new_insertion(text)
+            para.appendChild(ins_elem)
+            changes = [ins_elem]
+        else:
+            texts = [self._run_text(run) for run in runs]
+            changes = self._replace_in_runs(runs, texts, _word_diff("".join(texts), text))
+        self._invalidate_text(para)
+        return changes
+
+    def _inserted_paragraph_template(self, like):
+        """Return a {text} template for a tracked paragraph with the w:pPr of like."""
+        pPr = next(
+            (
+                child
+                for child in like.childNodes
+                if child.nodeType == child.ELEMENT_NODE and child.tagName == "w:pPr"
+            ),
+            None,
+        )
+        pPr = pPr.cloneNode(True) if pPr is not None else self._dom.createElement("w:pPr")
+        rPr = next(
+            (
+                child
+                for child in pPr.childNodes
+                if child.nodeType == child.ELEMENT_NODE and child.tagName == "w:rPr"
+            ),
+            None,
+        )
+        if rPr is None:
+            rPr = pPr.appendChild(self._dom.createElement("w:rPr"))
+        rPr.insertBefore(self._dom.createElement("w:ins"), rPr.firstChild)
+        return (
+            f"<w:p>{pPr.toxml()}<w:ins><w:r>"
+            '<w:t xml:space="preserve">{text}</w:t></w:r></w:ins></w:p>'
+        )
 
-        Enables lazy-loaded editors with bracket notation:
-            node = doc["word/document.xml"].get_node(tag="w:p", line_number=42)
 
-        Args:
-            xml_path: Relative path to XML file (e.g., "word/document.xml", "word/comments.xml")
+class LxmlDocxXMLEditor(LxmlXMLEditor):
+    """DocxXMLEditor counterpart on the lxml engine.
 
-        Returns:
-            DocxXMLEditor instance for the specified file
+    Applies the same RSID, author, date, and ID rules to inserted content and
+    offers the same tracked-change helpers (suggest_deletion, revert_insertion,
+    revert_deletion, suggest_paragraph), operating on lxml elements.
 
-        Raises:
-            ValueError: If the file does not exist
+    Attributes:
+        tree (lxml.etree._ElementTree): The parsed tree for direct manipulation
+    """
 
-        Example:
-            # Get node from document.xml
-            node = doc["word/document.xml"].get_node(tag="w:del", attrs={"w:id": "1"})
+    suggest_paragraph = staticmethod(DocxXMLEditor.suggest_paragraph)
 
-            # Get node from comments.xml
-            comment = doc["word/comments.xml"].get_node(tag="w:comment", attrs={"w:id": "0"})
-        """
-        if xml_path not in self._editors:
-            file_path = self.unpacked_path / xml_path
-            if not file_path.exists():
-                raise ValueError(f"XML file not found: {xml_path}")
-            # Use DocxXMLEditor with RSID, author, and initials for all editors
-            self._editors[xml_path] = DocxXMLEditor(
-                file_path, rsid=self.rsid, author=self.author, initials=self.initials
-            )
-        return self._editors[xml_path]
+    def __init__(
+        self, xml_path, rsid: str, author: str = "Claude", initials: str = "C"
+    ):
+        """Initialize with required RSID and optional author.
 
-    def add_comment(self, start, end, text: str) -> int:
+        Args:
+            xml_path: Path to XML file to edit
+            rsid: RSID to automatically apply to new elements
+            author: Author name for tracked changes and comments (default: "Claude")
+            initials: Author initials (default: "C")
         """
-        Add a comment spanning from one element to another.
+        super().__init__(xml_path)
+        self.rsid = rsid
+        self.author = author
+        self.initials = initials
+        # Not an XPath union: sorting attributes into document order is quadratic
+        self._change_ids = IdAllocator(
+            lambda: [
+                elem.get(_w("id"))
+                for elem in self._root.iter(_W_INS, _W_DEL)
+                if elem.get(_w("id")) is not None
+            ]
+        )
 
-        Args:
-            start: DOM element for the starting point
-            end: DOM element for the ending point
-            text: Comment content
+    def _get_next_change_id(self):
+        """Allocate the next change ID (seeded once from all tracked change elements)."""
+        return self._change_ids.allocate()
+
+    def _checkpoint_state(self):
+        """Return copies of the attributes rollback() restores, including change IDs."""
+        return {
+            **super()._checkpoint_state(),
+            "_change_ids": copy.copy(self._change_ids),
+        }
+
+    def _ensure_namespace(self, prefix, uri):
+        """Ensure a namespace is declared on the root element."""
+        root = self._root
+        if uri not in root.nsmap.values():
+            keep = [p for p in root.nsmap if p] + [prefix]
+            lxml.etree.cleanup_namespaces(
+                self._tree, top_nsmap={prefix: uri}, keep_ns_prefixes=keep
+            )
+            self._namespaces[prefix] = uri
+            self._ns_decl = None
 
-        Returns:
-            The comment ID that was created
+    def _inject_attributes_to_nodes(self, nodes):
+        """Inject RSID, author, and date attributes into elements where applicable.
 
-        Example:
-            start_node = cm.get_document_node(tag="w:del", id="1")
-            end_node = cm.get_document_node(tag="w:ins", id="2")
-            cm.add_comment(start=start_node, end=end_node, text="Explanation")
+        Follows the same rules as DocxXMLEditor._inject_attributes_to_nodes.
+
+        Args:
+            nodes: List of lxml elements to process
         """
-        comment_id = self.next_comment_id
-        para_id = _generate_hex_id()
-        durable_id = _generate_hex_id()
         timestamp = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+        # Every tracked-change helper ends here, so this also flags their edits
+        self.modified = True
+
+        def set_default(elem, name, value):
+            if elem.get(name) is None:
+                elem.set(name, value)
+
+        def add_rsid_to_p(elem, inside_deletion):
+            set_default(elem, _w("rsidR"), self.rsid)
+            set_default(elem, _w("rsidRDefault"), self.rsid)
+            set_default(elem, _w("rsidP"), self.rsid)
+            for name in (_W14_PARA_ID, _W14_TEXT_ID):
+                if elem.get(name) is None:
+                    self._ensure_namespace("w14", W14_NAMESPACE)
+                    elem.set(name, _generate_hex_id())
+
+        def add_rsid_to_r(elem, inside_deletion):
+            # Use w:rsidDel for <w:r> inside <w:del>, otherwise w:rsidR
+            if inside_deletion:
+                set_default(elem, _w("rsidDel"), self.rsid)
+            else:
+                set_default(elem, _w("rsidR"), self.rsid)
 
-        # Add comment ranges to document.xml immediately
-        self._document.insert_before(start, self._comment_range_start_xml(comment_id))
+        def add_xml_space_to_t(elem, inside_deletion):
+            text = elem.text
+            if text and (text[0].isspace() or text[-1].isspace()):
+                set_default(elem, _XML_SPACE, "preserve")
 
-        # If end node is a paragraph, append comment markup inside it
-        # Otherwise insert after it (for run-level anchors)
-        if end.tagName == "w:p":
-            self._document.append_to(end, self._comment_range_end_xml(comment_id))
-        else:
-            self._document.insert_after(end, self._comment_range_end_xml(comment_id))
+        def add_tracked_change_attrs(elem, inside_deletion):
+            if elem.get(_w("id")) is None:
+                elem.set(_w("id"), str(self._get_next_change_id()))
+            else:
+                self._change_ids.observe(elem.get(_w("id")))
+            set_default(elem, _w("author"), self.author)
+            set_default(elem, _w("date"), timestamp)
+            if elem.get(_W16DU_DATE_UTC) is None:
+                self._ensure_namespace("w16du", W16DU_NAMESPACE)
+                elem.set(_W16DU_DATE_UTC, timestamp)
+
+        def add_comment_attrs(elem, inside_deletion):
+            set_default(elem, _w("author"), self.author)
+            set_default(elem, _w("date"), timestamp)
+            set_default(elem, _w("initials"), self.initials)
+
+        def add_comment_extensible_date(elem, inside_deletion):
+            if elem.get(_W16CEX_DATE_UTC) is None:
+                self._ensure_namespace("w16cex", W16CEX_NAMESPACE)
+                elem.set(_W16CEX_DATE_UTC, timestamp)
+
+        # Handlers by tag, in the order descendants are processed, as in
+        # DocxXMLEditor, so both engines allocate w:ids in the same order
+        handlers = {
+            _W_P: add_rsid_to_p,
+            _W_R: add_rsid_to_r,
+            _W_T: add_xml_space_to_t,
+            _W_INS: add_tracked_change_attrs,
+            _W_DEL: add_tracked_change_attrs,
+            _W_COMMENT: add_comment_attrs,
+            _W16CEX_EXT: add_comment_extensible_date,
+        }
 
-        # Add to comments.xml immediately
-        self._add_to_comments_xml(
-            comment_id, para_id, text, self.author, self.initials, timestamp
-        )
+        for node in nodes:
+            if not isinstance(node.tag, str):
+                continue
 
-        # Add to commentsExtended.xml immediately
-        self._add_to_comments_extended_xml(para_id, parent_para_id=None)
+            # Handle the node itself
+            inside_deletion = next(node.iterancestors(_W_DEL), None) is not None
+            handler = handlers.get(node.tag)
+            if handler:
+                handler(node, inside_deletion)
+
+            # Collect descendants by tag in a single traversal; runs under a
+            # w:del are found from the deletions rather than per run
+            descendants = {tag: [] for tag in handlers}
+            for elem in node.iterdescendants(*handlers):
+                descendants[elem.tag].append(elem)
+            if inside_deletion or node.tag == _W_DEL:
+                deleted_runs = None
+            else:
+                deleted_runs = {
+                    run
+                    for deletion in descendants[_W_DEL]
+                    for run in deletion.iterdescendants(_W_R)
+                }
+
+            for tag, elems in descendants.items():
+                handler = handlers[tag]
+                for elem in elems:
+                    handler(elem, deleted_runs is None or elem in deleted_runs)
+
+    def replace_node(self, elem, new_content, fields=None):
+        """Replace node with automatic attribute injection."""
+        nodes = super().replace_node(elem, new_content, fields)
+        self._inject_attributes_to_nodes(nodes)
+        return nodes
 
-        # Add to commentsIds.xml immediately
-        self._add_to_comments_ids_xml(para_id, durable_id)
+    def insert_after(self, elem, xml_content, fields=None):
+        """Insert after with automatic attribute injection."""
+        nodes = super().insert_after(elem, xml_content, fields)
+        self._inject_attributes_to_nodes(nodes)
+        return nodes
 
-        # Add to commentsExtensible.xml immediately
-        self._add_to_comments_extensible_xml(durable_id)
+    def insert_before(self, elem, xml_content, fields=None):
+        """Insert before with automatic attribute injection."""
+        nodes = super().insert_before(elem, xml_content, fields)
+        self._inject_attributes_to_nodes(nodes)
+        return nodes
 
-        # Update existing_comments so replies work
-        self.existing_comments[comment_id] = {"para_id": para_id}
+    def append_to(self, elem, xml_content, fields=None):
+        """Append to with automatic attribute injection."""
+        nodes = super().append_to(elem, xml_content, fields)
+        self._inject_attributes_to_nodes(nodes)
+        return nodes
 
-        self.next_comment_id += 1
-        return comment_id
+    def revert_insertion(self, elem):
+        """Reject an insertion by wrapping its content in a deletion.
 
-    def reply_to_comment(
-        self,
-        parent_comment_id: int,
-        text: str,
-    ) -> int:
-        """
-        Add a reply to an existing comment.
+        See DocxXMLEditor.revert_insertion.
 
         Args:
-            parent_comment_id: The w:id of the parent comment to reply to
-            text: Reply text
+            elem: Element to process (w:ins, w:p, w:body, etc.)
 
         Returns:
-            The comment ID that was created for the reply
+            list: List containing the processed element(s)
 
-        Example:
-            cm.reply_to_comment(parent_comment_id=0, text="I agree with this change")
+        Raises:
+            ValueError: If the element contains no w:ins elements
         """
-        if parent_comment_id not in self.existing_comments:
-            raise ValueError(f"Parent comment with id={parent_comment_id} not found")
+        if elem.tag == _W_INS:
+            ins_elements = [elem]
+        else:
+            ins_elements = list(elem.iterdescendants(_W_INS))
 
-        parent_info = self.existing_comments[parent_comment_id]
-        comment_id = self.next_comment_id
-        para_id = _generate_hex_id()
-        durable_id = _generate_hex_id()
-        timestamp = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+        if not ins_elements:
+            raise ValueError(
+                f"revert_insertion requires w:ins elements. "
+                f"The provided element <{self.tag_name(elem)}> contains no insertions. "
+            )
 
-        # Add comment ranges to document.xml immediately
-        parent_start_elem = self._document.get_node(
-            tag="w:commentRangeStart", attrs={"w:id": str(parent_comment_id)}
-        )
-        parent_ref_elem = self._document.get_node(
-            tag="w:commentReference", attrs={"w:id": str(parent_comment_id)}
-        )
+        for ins_elem in ins_elements:
+            runs = list(ins_elem.iter(_W_R))
+            if not runs:
+                continue
+            self.record_change(ins_elem)
 
-        self._document.insert_after(
-            parent_start_elem, self._comment_range_start_xml(comment_id)
-        )
-        parent_ref_run = parent_ref_elem.parentNode
-        self._document.insert_after(
-            parent_ref_run, f'<w:commentRangeEnd w:id="{comment_id}"/>'
-        )
-        self._document.insert_after(
-            parent_ref_run, self._comment_ref_run_xml(comment_id)
-        )
+            for run in runs:
+                _mark_run_deleted(run, self.rsid)
 
-        # Add to comments.xml immediately
-        self._add_to_comments_xml(
-            comment_id, para_id, text, self.author, self.initials, timestamp
-        )
+            # Move all content from ins into a deletion wrapper
+            del_wrapper = lxml.etree.Element(_W_DEL)
+            del_wrapper.text, ins_elem.text = ins_elem.text, None
+            del_wrapper.extend(list(ins_elem))
+            ins_elem.append(del_wrapper)
 
-        # Add to commentsExtended.xml immediately (with parent)
-        self._add_to_comments_extended_xml(
-            para_id, parent_para_id=parent_info["para_id"]
-        )
+            self._inject_attributes_to_nodes([del_wrapper])
 
-        # Add to commentsIds.xml immediately
-        self._add_to_comments_ids_xml(para_id, durable_id)
+        return [elem]
 
-        # Add to commentsExtensible.xml immediately
-        self._add_to_comments_extensible_xml(durable_id)
+    def revert_deletion(self, elem):
+        """Reject a deletion by re-inserting the deleted content.
 
-        # Update existing_comments so replies work
-        self.existing_comments[comment_id] = {"para_id": para_id}
+        See DocxXMLEditor.revert_deletion.
 
-        self.next_comment_id += 1
-        return comment_id
+        Args:
+            elem: Element to process (w:del, w:p, w:body, etc.)
 
-    def __del__(self):
+        Returns:
+            list: If elem is w:del, returns [elem, new_ins]. Otherwise returns [elem].
+
+        Raises:
+            ValueError: If the element contains no w:del elements
+        """
+        is_single_del = elem.tag == _W_DEL
+        if is_single_del:
+            del_elements = [elem]
+        else:
+            del_elements = list(elem.iterdescendants(_W_DEL))
+
+        if not del_elements:
+            raise ValueError(
+                f"revert_deletion requires w:del elements. "
+                f"The provided element <{self.tag_name(elem)}> contains no deletions. "
+            )
+
+        created_insertion = None
+        for del_elem in del_elements:
+            runs = list(del_elem.iter(_W_R))
+            if not runs:
+                continue
+
+            ins_elem = lxml.etree.Element(_W_INS)
+            for run in runs:
+                new_run = copy.deepcopy(run)
+                new_run.tail = None
+                for del_text in new_run.iter(_W_DELTEXT):
+                    del_text.tag = _W_T
+                if new_run.get(_w("rsidDel")) is not None:
+                    new_run.set(_w("rsidR"), new_run.attrib.pop(_w("rsidDel")))
+                elif new_run.get(_w("rsidR")) is None:
+                    new_run.set(_w("rsidR"), self.rsid)
+                ins_elem.append(new_run)
+
+            for node in ins_elem.iter():
+                node.sourceline = 0
+            self.record_change(del_elem.getparent())
+            del_elem.addnext(ins_elem)
+            self._invalidate_text(del_elem.getparent())
+            self._inject_attributes_to_nodes([ins_elem])
+
+            if is_single_del:
+                created_insertion = ins_elem
+
+        if is_single_del and created_insertion is not None:
+            return [elem, created_insertion]
+        return [elem]
+
+    def accept_all(self, author=None, since=None, until=None, paragraphs=None):
+        """Accept tracked changes (all, or those matching the filters) in one pass.
+
+        See DocxXMLEditor.accept_all.
+
+        Args:
+            author: Only changes by this author (or by any in a list of authors)
+            since: Only changes dated at or after this datetime (naive means UTC)
+            until: Only changes dated before this datetime
+            paragraphs: Only changes in these paragraph indexes
+
+        Returns:
+            int: Number of tracked changes resolved
+        """
+        return self._resolve_changes(True, author, since, until, paragraphs)
+
+    def reject_all(self, author=None, since=None, until=None, paragraphs=None):
+        """Reject tracked changes (all, or those matching the filters) in one pass.
+
+        See DocxXMLEditor.reject_all.
+
+        Args:
+            author: Only changes by this author (or by any in a list of authors)
+            since: Only changes dated at or after this datetime (naive means UTC)
+            until: Only changes dated before this datetime
+            paragraphs: Only changes in these paragraph indexes
+
+        Returns:
+            int: Number of tracked changes resolved
+        """
+        return self._resolve_changes(False, author, since, until, paragraphs)
+
+    def _resolve_changes(self, accept, author, since, until, paragraphs):
+        """Collect the matching changes in one walk and resolve them, innermost first."""
+        select = _change_selector(author, since, until, paragraphs)
+        changes = []
+        position = 0  # Index of the next top-level paragraph
+        paragraph = None  # The current top-level paragraph
+
+        tags = [_W_P, *(_w(name) for name in _TRACKED_CHANGE_TAGS)]
+        for elem in self._root.iter(*tags):
+            in_paragraph = paragraph is not None and any(
+                ancestor is paragraph for ancestor in elem.iterancestors(_W_P)
+            )
+            if elem.tag == _W_P:
+                if not in_paragraph:
+                    paragraph = elem
+                    position += 1
+                continue
+            if select(
+                lxml.etree.QName(elem).localname,
+                lambda name: elem.get(_w(name)),
+                position - 1 if in_paragraph else position,
+            ):
+                changes.append(elem)
+
+        for change in reversed(changes):
+            self._resolve_change(change, accept)
+        if changes:
+            self._text_cache.clear()
+            self.modified = True
+        return len(changes)
+
+    def _resolve_change(self, change, accept):
+        """Accept or reject one tracked change element."""
+        local = lxml.etree.QName(change).localname
+        parent = change.getparent()
+        action = _change_resolution(local, lxml.etree.QName(parent).localname, accept)
+        self.record_change(parent)
+
+        if action == "unwrap":
+            if local in _DELETION_TAGS:
+                # Restore deleted runs as they were before the deletion
+                for del_text in change.iter(_W_DELTEXT):
+                    del_text.tag = _W_T
+                for instr in change.iter(_w("delInstrText")):
+                    instr.tag = _w("instrText")
+                for run in change.iter(_W_R):
+                    if run.get(_w("rsidDel")) is not None and run.get(_w("rsidR")) is None:
+                        run.set(_w("rsidR"), run.attrib.pop(_w("rsidDel")))
+            _unwrap(change)
+        elif action == "remove":
+            _remove_keeping_tail(change)
+        elif action == "merge":
+            # Marker in w:pPr/w:rPr: the paragraph mark goes away
+            _remove_keeping_tail(change)
+            para = parent.getparent().getparent()
+            content = [c for c in para if c.tag != _w("pPr")]
+            following = para.getnext()
+            while following is not None and not isinstance(following.tag, str):
+                following = following.getnext()
+            previous = para.getprevious()
+            while previous is not None and not isinstance(previous.tag, str):
+                previous = previous.getprevious()
+            if following is not None and following.tag == _W_P:
+                self.record_change(following)
+                index = 1 if following.find(_w("pPr")) is not None else 0
+                for offset, child in enumerate(content):
+                    following.insert(index + offset, child)
+                _remove_keeping_tail(para)
+            elif previous is not None and previous.tag == _W_P:
+                # Last paragraph of its container: join the one before instead
+                self.record_change(previous)
+                previous.extend(content)
+                _remove_keeping_tail(para)
+        elif action == "remove_row":
+            _remove_keeping_tail(parent.getparent())
+        else:
+            # Rejected formatting change: put the recorded properties back
+            props = parent
+            old = next((c for c in change if isinstance(c.tag, str)), None)
+            trailing = {
+                _w(name)
+                for name in _TRAILING_PROPERTIES.get(lxml.etree.QName(props).localname, ())
+            }
+            kept = trailing | {_w(name) for name in _CHANGE_MARKERS}
+            for child in list(props):
+                if isinstance(child.tag, str) and child.tag not in kept:
+                    _remove_keeping_tail(child)
+            index = next(
+                (i for i, c in enumerate(props) if c.tag in trailing), len(props)
+            )
+            if old is not None:
+                for offset, child in enumerate(
+                    [c for c in old if isinstance(c.tag, str)]
+                ):
+                    props.insert(index + offset, child)
+
+    def suggest_deletion(self, elem):
+        """Mark a w:r or w:p element as deleted with tracked changes (in-place).
+
+        See DocxXMLEditor.suggest_deletion.
+
+        Args:
+            elem: A w:r or w:p element without existing tracked changes
+
+        Returns:
+            Element: The w:del wrapper (for w:r) or the modified w:p
+
+        Raises:
+            ValueError: If element has existing tracked changes or invalid structure
+        """
+        if elem.tag == _W_R:
+            if next(elem.iter(_W_DELTEXT), None) is not None:
+                raise ValueError("w:r element already contains w:delText")
+            self.record_change(elem.getparent())
+
+            _mark_run_deleted(elem, self.rsid)
+
+            # Wrap in w:del, leaving the run's tail outside the wrapper
+            del_wrapper = lxml.etree.Element(_W_DEL)
+            del_wrapper.tail, elem.tail = elem.tail, None
+            elem.addprevious(del_wrapper)
+            del_wrapper.append(elem)
+
+            self._inject_attributes_to_nodes([del_wrapper])
+            return del_wrapper
+
+        elif elem.tag == _W_P:
+            if next(elem.iter(_W_INS, _W_DEL), None) is not None:
+                raise ValueError("w:p element already contains tracked changes")
+            self.record_change(elem)
+
+            pPr = next(elem.iter(_w("pPr")), None)
+            if pPr is not None and next(pPr.iter(_w("numPr")), None) is not None:
+                # Add <w:del/> marker to w:rPr in w:pPr
+                rPr = next(pPr.iter(_w("rPr")), None)
+                if rPr is None:
+                    rPr = lxml.etree.SubElement(pPr, _w("rPr"))
+                rPr.insert(0, lxml.etree.Element(_W_DEL))
+
+            for run in elem.iter(_W_R):
+                _mark_run_deleted(run, self.rsid)
+
+            # Wrap all non-pPr children in <w:del>
+            del_wrapper = lxml.etree.Element(_W_DEL)
+            del_wrapper.extend([c for c in elem if c.tag != _w("pPr")])
+            elem.append(del_wrapper)
+
+            self._inject_attributes_to_nodes([del_wrapper])
+            return elem
+
+        else:
+            raise ValueError(f"Element must be w:r or w:p, got {self.tag_name(elem)}")
+
+    def suggest_replacements(self, replacements, regex=False, parent=None):
+        """Replace text everywhere with tracked changes, also across run boundaries.
+
+        See DocxXMLEditor.suggest_replacements.
+
+        Args:
+            replacements: Dict or list of (pattern, replacement) pairs
+            regex: If True, patterns are regular expressions (default: literal)
+            parent: Only replace inside this element (default: whole document)
+
+        Returns:
+            int: Number of replacements made
+        """
+        find = _compile_replacements(replacements, regex)
+        root = parent if parent is not None else self._root
+
+        changes = []
+        count = 0
+        for para in list(root.iter(_W_P)):
+            para_changed = False
+            for runs in self._plain_run_groups(para):
+                texts = ["".join(t.text or "" for t in run.iter(_W_T)) for run in runs]
+                matches = find("".join(texts))
+                if matches:
+                    changes.extend(self._replace_in_runs(runs, texts, matches))
+                    count += len(matches)
+                    para_changed = True
+            if para_changed:
+                self._invalidate_text(para)
+
+        if changes:
+            self._inject_attributes_to_nodes(changes)
+        return count
+
+    def _plain_run_groups(self, para):
+        """Split a paragraph's plain runs into groups whose text is contiguous."""
+        groups = [[]]
+        for child in para:
+            if not isinstance(child.tag, str):
+                continue
+            if child.tag == _W_R and self._is_plain_run(child):
+                groups[-1].append(child)
+            elif child.tag not in _MARKER_CLARK_NAMES:
+                groups.append([])
+        return [group for group in groups if group]
+
+    @staticmethod
+    def _is_plain_run(run):
+        """Check whether a run holds only w:rPr and at least one w:t."""
+        tags = [
+            child.tag
+            for child in run
+            if isinstance(child.tag, str) and child.tag != _W_RPR
+        ]
+        return bool(tags) and all(tag == _W_T for tag in tags)
+
+    @staticmethod
+    def _new_run_like(run):
+        """Create an empty run with the attributes and w:rPr of run."""
+        new_run = lxml.etree.Element(_W_R, attrib=dict(run.attrib))
+        rpr = run.find(_W_RPR)
+        if rpr is not None:
+            rpr = copy.deepcopy(rpr)
+            rpr.tail = None
+            new_run.append(rpr)
+        return new_run
+
+    @staticmethod
+    def _set_run_text(run, text):
+        """Replace the w:t children of a plain run with a single w:t holding text."""
+        for t_elem in list(run.iter(_W_T)):
+            run.remove(t_elem)
+        t_elem = lxml.etree.SubElement(run, _W_T)
+        t_elem.text = text
+        if text and (text[0].isspace() or text[-1].isspace()):
+            t_elem.set(_XML_SPACE, "preserve")
+
+    def _replace_in_runs(self, runs, texts, matches):
+        """Split runs at match boundaries and track the replacements.
+
+        See DocxXMLEditor._replace_in_runs.
+        """
+        self.record_change(runs[0])
+        bounds = sorted({offset for start, end, _ in matches for offset in (start, end)})
+
+        pieces = []
+        start = 0
+        for run, text in zip(runs, texts):
+            end = start + len(text)
+            cuts = bounds[bisect_right(bounds, start) : bisect_left(bounds, end)]
+            if not cuts:
+                pieces.append((run, start, end))
+                start = end
+                continue
+
+            # The run keeps the first piece; clones (same properties) take the rest
+            self._set_run_text(run, text[: cuts[0] - start])
+            pieces.append((run, start, cuts[0]))
+            previous = run
+            edges = cuts + [end]
+            for piece_start, piece_end in zip(edges, edges[1:]):
+                piece = self._new_run_like(run)
+                self._set_run_text(piece, text[piece_start - start : piece_end - start])
+                previous.addnext(piece)
+                pieces.append((piece, piece_start, piece_end))
+                previous = piece
+            start = end
+
+        changes = []
+        index = 0
+        previous_end = None
+        for start, end, replacement in matches:
+            while index < len(pieces) and pieces[index][2] <= start:
+                index += 1
+            if start == end:
+                # Pure insertion, formatted like the text before it
+                like = pieces[index - 1 if index else 0][0]
+                ins_elem = self._new_insertion(replacement, like)
+                if index < len(pieces):
+                    pieces[index][0].addprevious(ins_elem)
+                else:
+                    last = changes[-1] if start == previous_end else pieces[-1][0]
+                    ins_elem.tail, last.tail = last.tail, None
+                    last.addnext(ins_elem)
+                changes.append(ins_elem)
+                previous_end = end
+                continue
+            deleted = []
+            while index < len(pieces) and pieces[index][1] < end:
+                deleted.append(pieces[index][0])
+                index += 1
+            changes.extend(self._track_replacement(deleted, replacement))
+            previous_end = end
+        return changes
+
+    def _track_replacement(self, runs, replacement):
+        """Wrap runs in w:del and add a w:ins run with the replacement after them."""
+        # One w:del per chain of adjacent runs
+        chains = []
+        for run in runs:
+            if chains and run.getprevious() is chains[-1][-1]:
+                chains[-1].append(run)
+            else:
+                chains.append([run])
+
+        changes = []
+        for chain in chains:
+            del_wrapper = lxml.etree.Element(_W_DEL)
+            chain[0].addprevious(del_wrapper)
+            for run in chain:
+                _mark_run_deleted(run, self.rsid)
+            del_wrapper.extend(chain)
+            # Leave the last run's tail outside the wrapper
+            del_wrapper.tail, chain[-1].tail = chain[-1].tail, None
+            changes.append(del_wrapper)
+
+        if replacement:
+            ins_elem = self._new_insertion(replacement, runs[0])
+            last = changes[-1]
+            ins_elem.tail, last.tail = last.tail, None
+            last.addnext(ins_elem)
+            changes.append(ins_elem)
+        return changes
+
+    def _new_insertion(self, text, like=None):
+        """Create a detached w:ins with one run holding text, formatted like run like."""
+        ins_elem = lxml.etree.Element(_W_INS)
+        if like is not None:
+            new_run = self._new_run_like(like)
+            new_run.attrib.clear()
+        else:
+            new_run = lxml.etree.Element(_W_R)
+        self._set_run_text(new_run, text)
+        ins_elem.append(new_run)
+        return ins_elem
+
+    def suggest_text_revisions(self, paragraphs):
+        """Track the changes that turn the paragraph texts into new ones.
+
+        See DocxXMLEditor.suggest_text_revisions.
+
+        Args:
+            paragraphs: The new text of every paragraph, in order
+
+        Returns:
+            int: Number of paragraphs revised, deleted or inserted
+
+        Raises:
+            ValueError: If a changed paragraph cannot be revised or deleted
+                (nothing is changed then)
+        """
+        old = [
+            para
+            for para in self._root.iter(_W_P)
+            if next(para.iterancestors(_W_P), None) is None
+        ]
+        actions = _plan_text_revisions(
+            ["".join(t.text or "" for t in para.iter(_W_T)) for para in old],
+            list(paragraphs),
+        )
+
+        # Check all paragraphs before changing any of them
+        for kind, index, _ in actions:
+            para = old[index] if index < len(old) else None
+            if kind == "revise" and self._revisable_runs(para) is None:
+                raise ValueError(
+                    f"Paragraph {index} has text outside plain runs and cannot be revised"
+                )
+            if kind == "delete" and next(para.iter(_W_INS, _W_DEL), None) is not None:
+                raise ValueError(f"Paragraph {index} already contains tracked changes")
+            if kind == "insert" and not old:
+                raise ValueError("No paragraph to insert the new paragraphs next to")
+
+        # Insert first, so new paragraphs copy properties not yet marked deleted
+        count = 0
+        for kind, index, texts in actions:
+            if kind == "insert":
+                template = self._inserted_paragraph_template(old[index - 1 if index else 0])
+                fields = [{"text": text} for text in texts]
+                if index < len(old):
+                    self.insert_before(old[index], template, fields)
+                else:
+                    self.insert_after(old[-1], template, fields)
+                count += len(texts)
+
+        changes = []
+        for kind, index, text in actions:
+            if kind == "revise":
+                changes.extend(self._revise_paragraph(old[index], text))
+            elif kind == "delete":
+                self.suggest_deletion(old[index])
+            count += kind != "insert"
+
+        if changes:
+            self._inject_attributes_to_nodes(changes)
+        return count
+
+    def _revisable_runs(self, para):
+        """Return the plain runs holding all of a paragraph's text, or None."""
+        groups = self._plain_run_groups(para)
+        if len(groups) > 1:
+            return None
+        runs = groups[0] if groups else []
+        run_text = "".join(t.text or "" for run in runs for t in run.iter(_W_T))
+        if run_text != "".join(t.text or "" for t in para.iter(_W_T)):
+            return None
+        return runs
+
+    def _revise_paragraph(self, para, text):
+        """Track a word-level diff from a paragraph's text to text; return the changes."""
+        self.record_change(para)
+        runs = self._revisable_runs(para)
+        if not runs:
+            ins_elem = self._new_insertion(text)
+            if len(para):
+                ins_elem.tail, para[-1].tail = para[-1].tail, None
+            para.append(ins_elem)
+            changes = [ins_elem]
+        else:
+            texts = ["".join(t.text or "" for t in run.iter(_W_T)) for run in runs]
+            changes = self._replace_in_runs(runs, texts, _word_diff("".join(texts), text))
+        self._invalidate_text(para)
+        return changes
+
+    @staticmethod
+    def _inserted_paragraph_template(like):
+        """Return a {text} template for a tracked paragraph with the w:pPr of like."""
+        pPr = like.find(_w("pPr"))
+        if pPr is not None:
+            pPr = copy.deepcopy(pPr)
+            pPr.tail = None
+        else:
+            pPr = lxml.etree.Element(_w("pPr"), nsmap={"w": W_NAMESPACE})
+        rPr = pPr.find(_W_RPR)
+        if rPr is None:
+            rPr = lxml.etree.SubElement(pPr, _W_RPR)
+        rPr.insert(0, lxml.etree.Element(_W_INS))
+        return (
+            f"<w:p>{lxml.etree.tostring(pPr, encoding='unicode')}<w:ins><w:r>"
+            '<w:t xml:space="preserve">{text}</w:t></w:r></w:ins></w:p>'
+        )
+
+
+def _w(local):
+    """Return the Clark name of a WordprocessingML element or attribute."""
+    return f"{{{W_NAMESPACE}}}{local}"
+
+
+_W_P = _w("p")
+_W_R = _w("r")
+_W_T = _w("t")
+_W_RPR = _w("rPr")
+_W_DELTEXT = _w("delText")
+_W_INS = _w("ins")
+_W_DEL = _w("del")
+_W_COMMENT = _w("comment")
+_W14_PARA_ID = f"{{{W14_NAMESPACE}}}paraId"
+_W14_TEXT_ID = f"{{{W14_NAMESPACE}}}textId"
+_W16DU_DATE_UTC = f"{{{W16DU_NAMESPACE}}}dateUtc"
+_W16CEX_EXT = f"{{{W16CEX_NAMESPACE}}}commentExtensible"
+_W16CEX_DATE_UTC = f"{{{W16CEX_NAMESPACE}}}dateUtc"
+_XML_SPACE = f"{{{XML_NAMESPACE}}}space"
+
+
+# Zero-width elements that may sit between runs without breaking up their text
+_ZERO_WIDTH_MARKERS = (
+    "bookmarkStart",
+    "bookmarkEnd",
+    "commentRangeStart",
+    "commentRangeEnd",
+    "proofErr",
+    "permStart",
+    "permEnd",
+)
+_MARKER_TAGS = {f"w:{name}" for name in _ZERO_WIDTH_MARKERS}
+_MARKER_CLARK_NAMES = {_w(name) for name in _ZERO_WIDTH_MARKERS}
+
+
+def _mark_run_deleted(run, rsid):
+    """Convert a run to deleted form: w:t -> w:delText and w:rsidR -> w:rsidDel."""
+    for t_elem in run.iter(_W_T):
+        t_elem.tag = _W_DELTEXT
+    if run.get(_w("rsidR")) is not None:
+        run.set(_w("rsidDel"), run.attrib.pop(_w("rsidR")))
+    elif run.get(_w("rsidDel")) is None:
+        run.set(_w("rsidDel"), rsid)
+
+
+# Tracked change elements resolved by accept_all/reject_all
+_INSERTION_TAGS = ("ins", "moveTo")
+_DELETION_TAGS = ("del", "moveFrom")
+_CHANGE_MARKERS = _INSERTION_TAGS + _DELETION_TAGS
+_TRACKED_CHANGE_TAGS = frozenset(
+    _CHANGE_MARKERS
+    + (
+        "moveFromRangeStart",
+        "moveFromRangeEnd",
+        "moveToRangeStart",
+        "moveToRangeEnd",
+        "rPrChange",
+        "pPrChange",
+    )
+)
+
+# Children of a properties element that its *PrChange record does not cover
+_TRAILING_PROPERTIES = {"pPr": ("rPr", "sectPr")}
+
+
+def _change_resolution(local, parent_local, accept):
+    """
+    Decide how to accept or reject a tracked change element.
+
+    Args:
+        local: Local name of the change element (e.g. "ins")
+        parent_local: Local name of its parent (w:rPr for paragraph marks,
+            w:trPr for table rows)
+        accept: True to accept, False to reject
+
+    Returns:
+        str: "unwrap", "remove", "merge" (remove the marker and merge the
+        paragraph into the next), "remove_row" or "restore" (put back the
+        properties recorded in a *PrChange)
+    """
+    if local.endswith("PrChange"):
+        return "remove" if accept else "restore"
+    if local not in _CHANGE_MARKERS:
+        return "remove"  # Move range markers
+    # Accepting an insertion or rejecting a deletion keeps the content
+    keep = (local in _INSERTION_TAGS) == accept
+    if parent_local == "rPr":
+        return "remove" if keep else "merge"
+    if parent_local == "trPr":
+        return "remove" if keep else "remove_row"
+    return "unwrap" if keep else "remove"
+
+
+def _change_selector(author=None, since=None, until=None, paragraphs=None):
+    """
+    Build the filter of accept_all/reject_all.
+
+    Returns:
+        callable: (local name, attribute getter, paragraph index) -> bool, to
+        be called on the changes in document order; a move range end matches
+        when its start did
+    """
+    if author is None or isinstance(author, str):
+        authors = None if author is None else {author}
+    else:
+        authors = set(author)
+
+    def as_utc(moment):
+        return moment if moment.tzinfo else moment.replace(tzinfo=timezone.utc)
+
+    since = as_utc(since) if since is not None else None
+    until = as_utc(until) if until is not None else None
+    open_ranges = set()
+
+    def select(local, get, position):
+        if local.endswith("RangeEnd"):
+            return (local[: -len("End")], get("id")) in open_ranges
+        if paragraphs is not None and position not in paragraphs:
+            return False
+        if authors is not None and get("author") not in authors:
+            return False
+        if since is not None or until is not None:
+            try:
+                moment = as_utc(datetime.fromisoformat(get("date").replace("Z", "+00:00")))
+            except (AttributeError, ValueError):
+                return False
+            if (since is not None and moment < since) or (
+                until is not None and moment >= until
+            ):
+                return False
+        if local.endswith("RangeStart"):
+            open_ranges.add((local[: -len("Start")], get("id")))
+        return True
+
+    return select
+
+
+def _unwrap(elem):
+    """Replace an lxml element by its children, keeping its text and tail."""
+    if elem.text:
+        previous = elem.getprevious()
+        if previous is not None:
+            previous.tail = (previous.tail or "") + elem.text
+        else:
+            parent = elem.getparent()
+            parent.text = (parent.text or "") + elem.text
+    for child in list(elem):
+        elem.addprevious(child)
+    _remove_keeping_tail(elem)
+
+
+def _compile_replacements(replacements, regex):
+    """
+    Compile find/replace pairs into a single matcher.
+
+    Args:
+        replacements: Dict or list of (pattern, replacement) pairs
+        regex: Whether patterns are regular expressions (else literal strings)
+
+    Returns:
+        callable: text -> sorted, non-overlapping (start, end, replacement)
+        tuples; empty matches are ignored
+    """
+    pairs = list(replacements.items() if isinstance(replacements, dict) else replacements)
+
+    if not regex:
+        # One pass over the text with a trie-shaped regex; the longest literal wins
+        table = {}
+        for pattern, replacement in pairs:
+            if pattern:
+                table.setdefault(pattern, replacement)
+        if not table:
+            return lambda text: []
+        matcher = re.compile(_literal_alternation(table))
+        return lambda text: [
+            (match.start(), match.end(), table[match.group()])
+            for match in matcher.finditer(text)
+        ]
+
+    compiled = [(re.compile(pattern), replacement) for pattern, replacement in pairs]
+
+    def find(text):
+        candidates = sorted(
+            (match.start(), order, match.end(), match.expand(replacement))
+            for order, (pattern, replacement) in enumerate(compiled)
+            for match in pattern.finditer(text)
+            if match.end() > match.start()
+        )
+        matches = []
+        position = 0
+        for start, _, end, replacement in candidates:
+            if start >= position:
+                matches.append((start, end, replacement))
+                position = end
+        return matches
+
+    return find
+
+
+def _literal_alternation(words):
+    """Build a regex matching any of the words, preferring the longest, as a trie."""
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = None
+
+    def build(node):
+        branches = [
+            re.escape(char) + build(child) for char, child in sorted(node.items()) if char
+        ]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+        # A word ends here: the longer continuations are optional
+        return f"(?:{body})?" if "" in node else body
+
+    return build(trie)
+
+
+# Word-level tokens: words, runs of whitespace, and single other characters
+_TOKEN_PATTERN = re.compile(r"\w+|\s+|[^\w\s]")
+
+_WORD_PATTERN = re.compile(r"\w+")
+
+# Largest range product compared with difflib when no unique item anchors a diff
+_DIFFLIB_LIMIT = 1_000_000
+
+# Largest block of changed paragraphs (old x new) paired by word overlap
+_PAIRING_LIMIT = 10_000
+
+
+class _Match(NamedTuple):
+    """Items a[i:i + size] equal to b[j:j + size], found by _diff_opcodes."""
+
+    i: int
+    j: int
+    size: int
+
+
+class _Pending(NamedTuple):
+    """Ranges a[alo:ahi] and b[blo:bhi] that _diff_opcodes still has to diff."""
+
+    alo: int
+    ahi: int
+    blo: int
+    bhi: int
+
+
+def _plan_text_revisions(old_texts, new_texts):
+    """
+    Align old and new paragraph texts and list the edits between them.
+
+    Returns:
+        list: ("revise", old_index, new_text), ("delete", old_index, None) and
+        ("insert", old_index, new_texts) tuples; insertions go before the old
+        paragraph at old_index (after the last one if it equals len(old_texts))
+    """
+    actions = []
+    for tag, i1, i2, j1, j2 in _diff_opcodes(old_texts, new_texts):
+        if tag == "equal":
+            continue
+        inserted = []
+        for i, j in _pair_paragraphs(old_texts, new_texts, i1, i2, j1, j2):
+            if i is None:
+                inserted.append(new_texts[j])
+                continue
+            if inserted:
+                actions.append(("insert", i, inserted))
+                inserted = []
+            if j is None:
+                actions.append(("delete", i, None))
+            elif old_texts[i] != new_texts[j]:
+                actions.append(("revise", i, new_texts[j]))
+        if inserted:
+            actions.append(("insert", i2, inserted))
+    return actions
+
+
+def _pair_paragraphs(old_texts, new_texts, i1, i2, j1, j2):
+    """
+    Pair up the changed paragraphs old_texts[i1:i2] and new_texts[j1:j2].
+
+    Keeps the order and maximizes the total word overlap of the pairs; two
+    paragraphs only pair if at least half of their words agree. Blocks too
+    large to compare pairwise are paired by position.
+
+    Returns:
+        list: (old_index, new_index) steps in document order, with None on
+        the side of a deleted or inserted paragraph
+    """
+    rows, cols = i2 - i1, j2 - j1
+    if rows * cols > _PAIRING_LIMIT:
+        paired = min(rows, cols)
+        return (
+            [(i1 + k, j1 + k) for k in range(paired)]
+            + [(i, None) for i in range(i1 + paired, i2)]
+            + [(None, j) for j in range(j1 + paired, j2)]
+        )
+
+    old_words = [Counter(_WORD_PATTERN.findall(text)) for text in old_texts[i1:i2]]
+    new_words = [Counter(_WORD_PATTERN.findall(text)) for text in new_texts[j1:j2]]
+
+    # score[r][c]: best total overlap pairing the first r old and c new paragraphs
+    score = [[0.0] * (cols + 1) for _ in range(rows + 1)]
+    for r in range(1, rows + 1):
+        for c in range(1, cols + 1):
+            best = max(score[r - 1][c], score[r][c - 1])
+            total = sum(old_words[r - 1].values()) + sum(new_words[c - 1].values())
+            if total:
+                overlap = 2 * sum((old_words[r - 1] & new_words[c - 1]).values()) / total
+                if overlap >= 0.5:
+                    best = max(best, score[r - 1][c - 1] + overlap)
+            score[r][c] = best
+
+    # Walk back; at the end of the list, insertions come after deletions
+    steps = []
+    r, c = rows, cols
+    while r or c:
+        if c and score[r][c] == score[r][c - 1]:
+            c -= 1
+            steps.append((None, j1 + c))
+        elif r and score[r][c] == score[r - 1][c]:
+            r -= 1
+            steps.append((i1 + r, None))
+        else:
+            r, c = r - 1, c - 1
+            steps.append((i1 + r, j1 + c))
+    return steps[::-1]
+
+
+def _word_diff(old_text, new_text):
+    """
+    Return the (start, end, replacement) edits turning old_text into new_text.
+
+    Edits separated only by whitespace are merged, so a rewritten phrase
+    becomes one deletion and one insertion.
+    """
+    old_tokens = _TOKEN_PATTERN.findall(old_text)
+    new_tokens = _TOKEN_PATTERN.findall(new_text)
+    offsets = [0]
+    for token in old_tokens:
+        offsets.append(offsets[-1] + len(token))
+
+    edits = []
+    for tag, i1, i2, j1, j2 in _diff_opcodes(old_tokens, new_tokens):
+        if tag == "equal":
+            continue
+        start, end = offsets[i1], offsets[i2]
+        replacement = "".join(new_tokens[j1:j2])
+        if edits:
+            last_start, last_end, last_replacement = edits[-1]
+            gap = old_text[last_end:start]
+            if gap.isspace():
+                edits[-1] = (last_start, end, last_replacement + gap + replacement)
+                continue
+        edits.append((start, end, replacement))
+    return edits
+
+
+def _diff_opcodes(a, b):
+    """
+    Diff two sequences of hashable items with patience diff.
+
+    Common prefixes and suffixes are matched first; in between, items that
+    occur exactly once on each side anchor the alignment (their longest
+    increasing run), and the gaps are diffed the same way. Ranges without
+    such anchors fall back to difflib, or count as replaced when too large.
+
+    Returns:
+        list: difflib-style (tag, i1, i2, j1, j2) opcodes covering both
+        sequences, with adjacent changes merged
+    """
+    blocks = []
+    stack = [_Pending(0, len(a), 0, len(b))]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, _Match):
+            blocks.append(item)
+            continue
+        alo, ahi, blo, bhi = item
+
+        prefix = 0
+        while (
+            alo + prefix < ahi
+            and blo + prefix < bhi
+            and a[alo + prefix] == b[blo + prefix]
+        ):
+            prefix += 1
+        suffix = 0
+        while (
+            alo + prefix < ahi - suffix
+            and blo + prefix < bhi - suffix
+            and a[ahi - suffix - 1] == b[bhi - suffix - 1]
+        ):
+            suffix += 1
+
+        items = [_Match(alo, blo, prefix)]
+        lo_a, hi_a, lo_b, hi_b = alo + prefix, ahi - suffix, blo + prefix, bhi - suffix
+        if lo_a < hi_a and lo_b < hi_b:
+            count_a = Counter(a[lo_a:hi_a])
+            count_b = Counter(b[lo_b:hi_b])
+            position_b = {b[j]: j for j in range(lo_b, hi_b) if count_b[b[j]] == 1}
+            anchors = _longest_increasing(
+                [
+                    (i, position_b[a[i]])
+                    for i in range(lo_a, hi_a)
+                    if count_a[a[i]] == 1 and a[i] in position_b
+                ]
+            )
+            if anchors:
+                for i, j in anchors:
+                    items.append(_Pending(lo_a, i, lo_b, j))
+                    items.append(_Match(i, j, 1))
+                    lo_a, lo_b = i + 1, j + 1
+                items.append(_Pending(lo_a, hi_a, lo_b, hi_b))
+            elif (hi_a - lo_a) * (hi_b - lo_b) <= _DIFFLIB_LIMIT:
+                matcher = difflib.SequenceMatcher(
+                    None, a[lo_a:hi_a], b[lo_b:hi_b], autojunk=False
+                )
+                items.extend(
+                    _Match(lo_a + i, lo_b + j, size)
+                    for i, j, size in matcher.get_matching_blocks()
+                )
+        items.append(_Match(hi_a, hi_b, suffix))
+
+        # Matched blocks and ranges still to diff, kept in order; empty ones
+        # are dropped
+        for item in reversed(items):
+            if isinstance(item, _Match):
+                if item.size:
+                    stack.append(item)
+            elif item.alo < item.ahi or item.blo < item.bhi:
+                stack.append(item)
+
+    opcodes = []
+    i = j = 0
+    for block_a, block_b, size in blocks + [(len(a), len(b), 0)]:
+        if i < block_a or j < block_b:
+            if i < block_a and j < block_b:
+                tag = "replace"
+            else:
+                tag = "delete" if i < block_a else "insert"
+            opcodes.append((tag, i, block_a, j, block_b))
+        if size:
+            if opcodes and opcodes[-1][0] == "equal":
+                _, i1, _, j1, _ = opcodes.pop()
+            else:
+                i1, j1 = block_a, block_b
+            opcodes.append(("equal", i1, block_a + size, j1, block_b + size))
+        i, j = block_a + size, block_b + size
+    return opcodes
+
+
+def _longest_increasing(pairs):
+    """Return the longest run of (i, j) pairs, in the given order, with increasing j."""
+    tails = []  # Smallest last j of an increasing run of each length
+    tail_indexes = []
+    previous = []
+    for k, (_, j) in enumerate(pairs):
+        length = bisect_left(tails, j)
+        if length == len(tails):
+            tails.append(j)
+            tail_indexes.append(k)
+        else:
+            tails[length] = j
+            tail_indexes[length] = k
+        previous.append(tail_indexes[length - 1] if length else -1)
+
+    result = []
+    k = tail_indexes[-1] if tail_indexes else -1
+    while k >= 0:
+        result.append(pairs[k])
+        k = previous[k]
+    return result[::-1]
+
+
+# Editor classes for the engines a Document can use
+EDITOR_ENGINES = {"minidom": DocxXMLEditor, "lxml": LxmlDocxXMLEditor}
+
+
+def _link_or_copy(source_file, target_file):
+    """Hard-link a file, copying it if it cannot be linked."""
+    try:
+        os.link(source_file, target_file)
+    except OSError:
+        # Different filesystem, or links not supported
+        shutil.copy2(source_file, target_file)
+
+
+def _link_tree(source, target):
+    """
+    Mirror a directory tree, hard-linking the XML parts and copying other files.
+
+    Editors always replace XML parts (through _write_atomic) rather than write
+    into them, so a link never lets an edit reach the source. Other files
+    (media, embeddings) may be written in place by callers and are copied.
+    """
+
+    def link_or_copy(source_file, target_file):
+        if source_file.endswith((".xml", ".rels")):
+            _link_or_copy(source_file, target_file)
+        else:
+            shutil.copy2(source_file, target_file)
+
+    shutil.copytree(source, target, copy_function=link_or_copy)
+
+
+def _file_signature(path):
+    """Return (inode, size, mtime) of a file, or None if it does not exist."""
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+
+def _copy_changed_files(source, target):
+    """Copy files from source to target that are missing there or differ in size or mtime.
+
+    Files are copied with their metadata (so unchanged files match on the next
+    save) to a temporary name and renamed into place.
+    """
+    source = Path(source)
+    target = Path(target)
+    for dir_path, _, file_names in os.walk(source):
+        target_dir = target / Path(dir_path).relative_to(source)
+        for name in file_names:
+            source_file = Path(dir_path) / name
+            target_file = target_dir / name
+            source_stat = source_file.stat()
+            try:
+                target_stat = target_file.stat()
+            except FileNotFoundError:
+                target_stat = None
+            if (
+                target_stat is not None
+                and target_stat.st_size == source_stat.st_size
+                and target_stat.st_mtime_ns == source_stat.st_mtime_ns
+            ):
+                continue
+            target_dir.mkdir(parents=True, exist_ok=True)
+            temp_file = target_dir / f".{name}.tmp"
+            shutil.copy2(source_file, temp_file)
+            os.replace(temp_file, target_file)
+
+
+def _generate_hex_id() -> str:
+    """Generate random 8-character hex ID for para/durable IDs.
+
+    Values are constrained to be less than 0x7FFFFFFF per OOXML spec:
+    - paraId must be < 0x80000000
+    - durableId must be < 0x7FFFFFFF
+    We use the stricter constraint (0x7FFFFFFF) for both.
+    """
+    return f"{random.randint(1, 0x7FFFFFFE):08X}"
+
+
+def _generate_rsid() -> str:
+    """Generate random 8-character hex RSID."""
+    return "".join(random.choices("0123456789ABCDEF", k=8))
+
+
+class Document:
+    """Manages comments in Word documents, unpacked or opened directly as .docx."""
+
+    def __init__(
+        self,
+        unpacked_dir,
+        rsid=None,
+        track_revisions=False,
+        author="Claude",
+        initials="C",
+        engine="minidom",
+    ):
+        """
+        Initialize with path to unpacked Word document directory.
+        Automatically sets up comment infrastructure (people.xml, RSIDs).
+
+        A .docx file path is accepted as well (see open()).
+
+        Args:
+            unpacked_dir: Path to unpacked DOCX directory (must contain word/ subdirectory)
+            rsid: Optional RSID to use for all comment elements. If not provided, one will be generated.
+            track_revisions: If True, enables track revisions in settings.xml (default: False)
+            author: Default author name for comments (default: "Claude")
+            initials: Default author initials for comments (default: "C")
+            engine: XML engine for all editors: "minidom" (DocxXMLEditor, default)
+                or "lxml" (LxmlDocxXMLEditor, faster and lighter on large documents)
+        """
+        self.original_path = Path(unpacked_dir)
+
+        is_package = self.original_path.is_file()
+        if is_package and not zipfile.is_zipfile(self.original_path):
+            raise ValueError(f"Not a .docx file: {unpacked_dir}")
+        if not is_package and not self.original_path.is_dir():
+            raise ValueError(f"Directory not found: {unpacked_dir}")
+        if engine not in EDITOR_ENGINES:
+            raise ValueError(
+                f"Unknown engine: {engine}. Expected one of {sorted(EDITOR_ENGINES)}"
+            )
+        self.engine = engine
+
+        self.temp_dir = tempfile.mkdtemp(prefix="docx_")
+        self.unpacked_path = Path(self.temp_dir) / "unpacked"
+        if is_package:
+            # Parts are extracted from (a link to) the .docx into an initially
+            # empty working copy when first used; the .docx itself is the
+            # validation baseline, and save_as() copies untouched entries as stored.
+            self._package_path = Path(self.temp_dir) / "original.docx"
+            _link_or_copy(self.original_path, self._package_path)
+            with zipfile.ZipFile(self._package_path) as package:
+                self._package_entries = {
+                    info.filename: info for info in package.infolist()
+                }
+            # Part name -> file signature when extracted (see _file_signature)
+            self._extracted = {}
+            self.unpacked_path.mkdir()
+            self._original_docx = self._package_path
+        else:
+            # Create subdirectories for unpacked content and baseline. Their XML
+            # parts are hard-linked to the original files (copy-on-write:
+            # editors replace parts instead of writing into them), so no XML is
+            # copied up front; media and other files are copied.
+            self._package_path = None
+            _link_tree(self.original_path, self.unpacked_path)
+            self._baseline_path = Path(self.temp_dir) / "baseline"
+            _link_tree(self.original_path, self._baseline_path)
+
+            # Validation baseline .docx, packed from the baseline on first use
+            self._original_docx = None
+
+        self.word_path = self.unpacked_path / "word"
+
+        # Generate RSID if not provided
+        self.rsid = rsid if rsid else _generate_rsid()
+        print(f"Using RSID: {self.rsid}")
+
+        # Set default author and initials
+        self.author = author
+        self.initials = initials
+
+        # Cache for lazy-loaded editors
+        self._editors = {}
+
+        # State saved by checkpoint(), for rollback()
+        self._checkpoint = None
+
+        # Comment file paths
+        self.comments_path = self.word_path / "comments.xml"
+        self.comments_extended_path = self.word_path / "commentsExtended.xml"
+        self.comments_ids_path = self.word_path / "commentsIds.xml"
+        self.comments_extensible_path = self.word_path / "commentsExtensible.xml"
+
+        # Load existing comments and seed comment IDs (before setup modifies files)
+        self.existing_comments = self._load_existing_comments()
+        self._comment_ids = IdAllocator(self._existing_comment_ids)
+        self._comment_ids.peek()
+
+        # Convenient access to document.xml editor (semi-private)
+        self._document = self["word/document.xml"]
+
+        # Setup tracked changes infrastructure
+        self._setup_tracking(track_revisions=track_revisions)
+
+        # Add author to people.xml
+        self._add_author_to_people(author)
+
+    @classmethod
+    def open(cls, docx_file, **kwargs) -> "Document":
+        """
+        Open a .docx file directly, without unpacking it first.
+
+        Parts are read from the package when first used, so only the parts an
+        edit session touches are extracted and parsed. Save the result with
+        save_as() (or save(), which writes back to docx_file).
+
+        Args:
+            docx_file: Path to the .docx file
+            **kwargs: Same options as Document() (rsid, author, engine, ...)
+
+        Raises:
+            ValueError: If docx_file is not a .docx file
+
+        Example:
+            doc = Document.open("input.docx", author="John Doe")
+            doc.add_comment(start=node, end=node, text="Check this")
+            doc.save_as("output.docx")
+        """
+        if not Path(docx_file).is_file():
+            raise ValueError(f"File not found: {docx_file}")
+        return cls(docx_file, **kwargs)
+
+    @property
+    def next_comment_id(self) -> int:
+        """The ID the next add_comment() or reply_to_comment() call will use."""
+        return self._comment_ids.peek()
+
+    @next_comment_id.setter
+    def next_comment_id(self, value: int) -> None:
+        # Counts up from value as given, like the counter this property replaced
+        self._comment_ids = IdAllocator(tuple, start=value)
+
+    @property
+    def original_docx(self) -> Path:
+        """The original document packed as .docx (validation baseline), built on first use."""
+        if self._original_docx is None:
+            # Outside the unpacked dir, so it never ends up in the saved document
+            original_docx = Path(self.temp_dir) / "original.docx"
+            # In this process: worker processes started from a user's script
+            # fail to bootstrap where they are spawned
+            pack_document(self._baseline_path, original_docx, validate=False, workers=1)
+            self._original_docx = original_docx
+        return self._original_docx
+
+    def __getitem__(self, xml_path: str) -> DocxXMLEditor:
+        """
+        Get or create a DocxXMLEditor (or LxmlDocxXMLEditor) for the specified XML file.
+
+        Enables lazy-loaded editors with bracket notation:
+            node = doc["word/document.xml"].get_node(tag="w:p", line_number=42)
+
+        Args:
+            xml_path: Relative path to XML file (e.g., "word/document.xml", "word/comments.xml")
+
+        Returns:
+            Editor instance for the specified file, using the Document's engine
+
+        Raises:
+            ValueError: If the file does not exist
+
+        Example:
+            # Get node from document.xml
+            node = doc["word/document.xml"].get_node(tag="w:del", attrs={"w:id": "1"})
+
+            # Get node from comments.xml
+            comment = doc["word/comments.xml"].get_node(tag="w:comment", attrs={"w:id": "0"})
+        """
+        if xml_path not in self._editors:
+            file_path = self.unpacked_path / xml_path
+            if not self._has_part(file_path):
+                raise ValueError(f"XML file not found: {xml_path}")
+            # Use the engine's editor with RSID, author, and initials for all editors
+            editor = EDITOR_ENGINES[self.engine](
+                file_path, rsid=self.rsid, author=self.author, initials=self.initials
+            )
+            if self._checkpoint is not None:
+                # Unchanged since the checkpoint, so it starts from here
+                editor.checkpoint()
+            self._editors[xml_path] = editor
+        return self._editors[xml_path]
+
+    def add_comment(self, start, end, text: str) -> int:
+        """
+        Add a comment spanning from one element to another.
+
+        Args:
+            start: DOM element for the starting point
+            end: DOM element for the ending point
+            text: Comment content
+
+        Returns:
+            The comment ID that was created
+
+        Example:
+            start_node = cm.get_document_node(tag="w:del", id="1")
+            end_node = cm.get_document_node(tag="w:ins", id="2")
+            cm.add_comment(start=start_node, end=end_node, text="Explanation")
+        """
+        return self.add_comments([{"start": start, "end": end, "text": text}])[0]
+
+    def add_comments(self, comments) -> list:
+        """
+        Add many comments at once.
+
+        Produces the same output as calling add_comment() for each item in
+        order, but the entries for comments.xml, commentsExtended.xml,
+        commentsIds.xml and commentsExtensible.xml are inserted with a single
+        edit per part.
+
+        Args:
+            comments: Iterable of dicts with "start", "end" and "text" keys,
+                as taken by add_comment()
+
+        Returns:
+            list[int]: The comment IDs that were created, in input order
+
+        Example:
+            doc.add_comments([
+                {"start": node1, "end": node1, "text": "Check this"},
+                {"start": node2, "end": node3, "text": "And this"},
+            ])
+        """
+        entries = []
+        try:
+            for comment in comments:
+                comment_id = self._comment_ids.allocate()
+
+                # Add comment ranges to document.xml
+                fields = {"comment_id": comment_id}
+                (range_start,) = self._document.insert_before(
+                    comment["start"], self._comment_range_start_xml(), fields
+                )
+
+                # If end node is a paragraph, append comment markup inside it
+                # Otherwise insert after it (for run-level anchors)
+                end = comment["end"]
+                if self._document.tag_name(end) == "w:p":
+                    end_nodes = self._document.append_to(
+                        end, self._comment_range_end_xml(), fields
+                    )
+                else:
+                    end_nodes = self._document.insert_after(
+                        end, self._comment_range_end_xml(), fields
+                    )
+                # The template starts with the range end and ends with the run
+                self._comment_anchors[comment_id] = (
+                    range_start,
+                    end_nodes[0],
+                    end_nodes[-1],
+                )
+
+                entries.append(self._new_comment_entry(comment_id, comment["text"]))
+        finally:
+            # Keep the comments parts consistent with document.xml on failure
+            self._add_comment_entries(entries)
+        return [entry["comment_id"] for entry in entries]
+
+    def reply_to_comment(
+        self,
+        parent_comment_id: int,
+        text: str,
+    ) -> int:
+        """
+        Add a reply to an existing comment.
+
+        Args:
+            parent_comment_id: The w:id of the parent comment to reply to
+            text: Reply text
+
+        Returns:
+            The comment ID that was created for the reply
+
+        Example:
+            cm.reply_to_comment(parent_comment_id=0, text="I agree with this change")
+        """
+        return self.reply_to_comments(
+            [{"parent_comment_id": parent_comment_id, "text": text}]
+        )[0]
+
+    def reply_to_comments(self, replies) -> list:
+        """
+        Add many replies at once.
+
+        Produces the same output as calling reply_to_comment() for each item in
+        order (a reply may answer a comment added earlier in the same batch),
+        with a single edit per comments part.
+
+        Args:
+            replies: Iterable of dicts with "parent_comment_id" and "text" keys,
+                as taken by reply_to_comment()
+
+        Returns:
+            list[int]: The comment IDs that were created, in input order
+
+        Raises:
+            ValueError: If a parent comment does not exist. Replies before the
+                failing one are still added, as with sequential calls.
+
+        Example:
+            doc.reply_to_comments([
+                {"parent_comment_id": 0, "text": "Agreed"},
+                {"parent_comment_id": 1, "text": "Fixed"},
+            ])
+        """
+        entries = []
+        try:
+            for reply in replies:
+                parent_comment_id = reply["parent_comment_id"]
+                if parent_comment_id not in self.existing_comments:
+                    raise ValueError(
+                        f"Parent comment with id={parent_comment_id} not found"
+                    )
+
+                parent_info = self.existing_comments[parent_comment_id]
+                comment_id = self._comment_ids.allocate()
+
+                # Add comment ranges to document.xml, next to the parent's
+                parent_start_elem, _, parent_ref_run = self._comment_anchor(
+                    parent_comment_id
+                )
+
+                fields = {"comment_id": comment_id}
+                (range_start,) = self._document.insert_after(
+                    parent_start_elem, self._comment_range_start_xml(), fields
+                )
+                (range_end,) = self._document.insert_after(
+                    parent_ref_run, '<w:commentRangeEnd w:id="{comment_id}"/>', fields
+                )
+                (ref_run,) = self._document.insert_after(
+                    parent_ref_run, self._comment_ref_run_xml(), fields
+                )
+                self._comment_anchors[comment_id] = (range_start, range_end, ref_run)
+
+                entries.append(
+                    self._new_comment_entry(
+                        comment_id, reply["text"], parent_info["para_id"]
+                    )
+                )
+        finally:
+            # Keep the comments parts consistent with document.xml on failure
+            self._add_comment_entries(entries)
+        return [entry["comment_id"] for entry in entries]
+
+    def suggest_text_revisions(self, paragraphs) -> int:
+        """
+        Track the changes that turn the body text into the given paragraphs.
+
+        Unchanged paragraphs are skipped by comparing whole paragraph texts;
+        changed ones get word-level <w:del>/<w:ins> markup. See
+        DocxXMLEditor.suggest_text_revisions for the details.
+
+        Args:
+            paragraphs: The new text of every paragraph in word/document.xml,
+                in order
+
+        Returns:
+            int: Number of paragraphs revised, deleted or inserted
+
+        Raises:
+            ValueError: If a changed paragraph cannot be revised or deleted
+                (nothing is changed then)
+
+        Example:
+            doc = Document.open("contract.docx")
+            doc.suggest_text_revisions(Path("revised.txt").read_text().splitlines())
+            doc.save_as("contract-redline.docx")
+        """
+        return self._document.suggest_text_revisions(paragraphs)
+
+    def checkpoint(self) -> None:
+        """
+        Remember the current state of the document so rollback() can return to it.
+
+        Cheap even for large documents: nothing is serialized or copied up
+        front. Each open editor saves its top-level child lists and copies a
+        paragraph or table only when an edit first reaches it (see
+        XMLEditor.checkpoint); parts opened later start out unchanged. A new
+        checkpoint replaces the previous one.
+
+        Example:
+            doc.checkpoint()
+            try:
+                doc.suggest_text_revisions(new_paragraphs)
+                doc.save()
+            except ValueError:
+                doc.rollback()  # Back to the checkpoint, without reloading anything
+        """
+        for editor in self._editors.values():
+            editor.checkpoint()
+        self._checkpoint = {
+            "files": {path for path in self.unpacked_path.rglob("*") if path.is_file()},
+            "existing_comments": dict(self.existing_comments),
+            "comment_anchors": dict(self._comment_anchors),
+            "comment_ids": copy.copy(self._comment_ids),
+        }
+
+    def rollback(self) -> None:
+        """
+        Undo all edits made since checkpoint().
+
+        Restores the open editors' trees (edits made through their methods),
+        comment bookkeeping and IDs, and removes parts created since (such as
+        comments.xml for a first comment). The checkpoint stays active, so
+        a failing step can be rolled back and retried. Parts saved in between
+        are written again by the next save().
+
+        Paragraphs and tables edited since the checkpoint are replaced by
+        their saved copies, so look up nodes from them again afterwards.
+
+        Raises:
+            ValueError: If checkpoint() was never called
+        """
+        checkpoint = self._checkpoint
+        if checkpoint is None:
+            raise ValueError("No checkpoint to roll back to")
+
+        for path in list(self.unpacked_path.rglob("*")):
+            name = path.relative_to(self.unpacked_path).as_posix()
+            if (
+                path.is_file()
+                and path not in checkpoint["files"]
+                # Extracted from the package since, not created
+                and not (self._package_path is not None and name in self._package_entries)
+            ):
+                path.unlink()
+                self._editors.pop(name, None)
+        for editor in self._editors.values():
+            editor.rollback()
+
+        self.existing_comments = dict(checkpoint["existing_comments"])
+        self._comment_anchors = dict(checkpoint["comment_anchors"])
+        self._comment_ids = copy.copy(checkpoint["comment_ids"])
+
+    def __del__(self):
         """Clean up temporary directory on deletion."""
         if hasattr(self, "temp_dir") and Path(self.temp_dir).exists():
             shutil.rmtree(self.temp_dir)
@@ -842,6 +2969,10 @@ class Document:
         Raises:
             ValueError: If validation fails.
         """
+        if self._package_path is not None:
+            # The validators read the whole working copy
+            self._extract_all()
+
         # Create validators with current state
         schema_validator = DOCXSchemaValidator(
             self.unpacked_path, self.original_docx, verbose=False
@@ -861,13 +2992,57 @@ class Document:
         Save all modified XML files to disk and copy to destination directory.
 
         This persists all changes made via add_comment() and reply_to_comment().
+        Only editors whose tree was modified are serialized, and only files
+        that differ from the destination (by size or modification time) are
+        copied; every file is replaced atomically.
+
+        For a document opened from a .docx file, this writes a .docx instead
+        (see save_as()).
+
+        Args:
+            destination: Optional path to save to. If None, saves back to original directory
+                (or .docx file).
+            validate: If True, validates document before saving (default: True).
+        """
+        target_path = Path(destination) if destination else self.original_path
+        if self._package_path is not None:
+            self.save_as(target_path, validate=validate)
+            return
+
+        self._save_parts(validate)
+
+        # Copy changed files from temp directory to destination (or original directory)
+        _copy_changed_files(self.unpacked_path, target_path)
+
+    def save_as(self, output_file, validate=True) -> None:
+        """
+        Save the document as a .docx file.
+
+        For a document opened from a .docx file, the output is written directly:
+        changed and new parts are condensed and compressed as pack.py does,
+        and every untouched entry is copied byte-for-byte, without
+        recompression. For an unpacked directory, the working copy is packed
+        with pack_document(). The file is replaced atomically.
 
         Args:
-            destination: Optional path to save to. If None, saves back to original directory.
+            output_file: Path of the .docx file to write
             validate: If True, validates document before saving (default: True).
         """
+        output_file = Path(output_file)
+        self._save_parts(validate)
+
+        output_file.parent.mkdir(parents=True, exist_ok=True)
+        temp_file = output_file.with_name(f".{output_file.stem}.tmp.docx")
+        if self._package_path is not None:
+            self._write_package(temp_file)
+        else:
+            pack_document(self.unpacked_path, temp_file, workers=1)
+        os.replace(temp_file, output_file)
+
+    def _save_parts(self, validate):
+        """Finish comment metadata, write modified parts to the working copy and validate."""
         # Only ensure comment relationships and content types if comment files exist
-        if self.comments_path.exists():
+        if self._has_part(self.comments_path):
             self._ensure_comment_relationships()
             self._ensure_comment_content_types()
 
@@ -879,45 +3054,115 @@ class Document:
         if validate:
             self.validate()
 
-        # Copy contents from temp directory to destination (or original directory)
-        target_path = Path(destination) if destination else self.original_path
-        shutil.copytree(self.unpacked_path, target_path, dirs_exist_ok=True)
+    # ==================== Private: Package Access ====================
+
+    def _has_part(self, path):
+        """
+        Check whether a part exists in the working copy.
+
+        For a document opened from a .docx file, parts are extracted from the
+        package on first access, so this also makes the part available on disk.
+        """
+        if self._package_path is not None and not path.exists():
+            name = path.relative_to(self.unpacked_path).as_posix()
+            if name in self._package_entries and name not in self._extracted:
+                self._extract_parts([name])
+        return path.exists()
+
+    def _extract_parts(self, names):
+        """Extract parts from the package into the working copy, as stored (no formatting)."""
+        with zipfile.ZipFile(self._package_path) as package:
+            for name in names:
+                path = self.unpacked_path / name
+                path.parent.mkdir(parents=True, exist_ok=True)
+                path.write_bytes(package.read(self._package_entries[name]))
+                self._extracted[name] = _file_signature(path)
+
+    def _extract_all(self):
+        """Extract every part not yet in the working copy (e.g. for validation)."""
+        self._extract_parts(
+            name
+            for name, info in self._package_entries.items()
+            if not info.is_dir() and name not in self._extracted
+        )
+
+    def _write_package(self, output_file):
+        """
+        Write the working copy as a .docx, reusing the package's untouched entries.
+
+        Entries keep the package's order. A part is rewritten when its file was
+        replaced or changed since extraction (editors save through a rename);
+        parts created in the working copy are added at the end.
+        """
+        with zipfile.ZipFile(self._package_path) as package, zipfile.ZipFile(
+            output_file, "w"
+        ) as output:
+
+            def write_part(name, date_time):
+                path = self.unpacked_path / name
+                info = zipfile.ZipInfo(name, date_time)
+                info.compress_type, compresslevel = compression_for(name)
+                if name.endswith((".xml", ".rels")):
+                    # Condensed straight into the entry, however large the part
+                    write_condensed_entry(output, info, path, compresslevel)
+                else:
+                    output.writestr(
+                        info, path.read_bytes(), compresslevel=compresslevel
+                    )
+
+            for name, info in self._package_entries.items():
+                if name not in self._extracted:
+                    copy_zip_entry(package, info, output)
+                    continue
+                signature = _file_signature(self.unpacked_path / name)
+                if signature is None:
+                    continue  # Removed from the working copy
+                if signature == self._extracted[name]:
+                    copy_zip_entry(package, info, output)
+                else:
+                    write_part(name, info.date_time)
+
+            for path in sorted(self.unpacked_path.rglob("*")):
+                name = path.relative_to(self.unpacked_path).as_posix()
+                if path.is_file() and name not in self._package_entries:
+                    write_part(name, datetime.now().timetuple()[:6])
 
     # ==================== Private: Initialization ====================
 
-    def _get_next_comment_id(self):
-        """Get the next available comment ID."""
-        if not self.comments_path.exists():
-            return 0
+    def _existing_comment_ids(self):
+        """Return the w:id values of all comments in comments.xml (seeds comment IDs)."""
+        if not self._has_part(self.comments_path):
+            return []
 
         editor = self["word/comments.xml"]
-        max_id = -1
-        for comment_elem in editor.dom.getElementsByTagName("w:comment"):
-            comment_id = comment_elem.getAttribute("w:id")
-            if comment_id:
-                try:
-                    max_id = max(max_id, int(comment_id))
-                except ValueError:
-                    pass
-        return max_id + 1
+        return [
+            editor.get_attribute(comment_elem, "w:id")
+            for comment_elem in editor._get_nodes("w:comment")
+        ]
 
     def _load_existing_comments(self):
-        """Load existing comments from files to enable replies."""
-        if not self.comments_path.exists():
+        """
+        Load existing comments from files to enable replies.
+
+        Also builds the comment anchor index (see _comment_anchor) from a
+        single pass over the comment markers in document.xml.
+        """
+        self._comment_anchors = {}
+        if not self._has_part(self.comments_path):
             return {}
 
         editor = self["word/comments.xml"]
         existing = {}
 
-        for comment_elem in editor.dom.getElementsByTagName("w:comment"):
-            comment_id = comment_elem.getAttribute("w:id")
+        for comment_elem in editor._get_nodes("w:comment"):
+            comment_id = editor.get_attribute(comment_elem, "w:id")
             if not comment_id:
                 continue
 
             # Find para_id from the w:p element within the comment
             para_id = None
-            for p_elem in comment_elem.getElementsByTagName("w:p"):
-                para_id = p_elem.getAttribute("w14:paraId")
+            for p_elem in editor._get_nodes("w:p", parent=comment_elem):
+                para_id = editor.get_attribute(p_elem, "w14:paraId")
                 if para_id:
                     break
 
@@ -926,8 +3171,57 @@ class Document:
 
             existing[int(comment_id)] = {"para_id": para_id}
 
+        document = self["word/document.xml"]
+        markers = {}
+        for tag in ("w:commentRangeStart", "w:commentRangeEnd", "w:commentReference"):
+            markers[tag] = {}
+            for elem in document._get_nodes(tag):
+                # The first marker wins, as the document order lookup would
+                markers[tag].setdefault(document.get_attribute(elem, "w:id"), elem)
+        for comment_id in existing:
+            key = str(comment_id)
+            ref_elem = markers["w:commentReference"].get(key)
+            self._comment_anchors[comment_id] = (
+                markers["w:commentRangeStart"].get(key),
+                markers["w:commentRangeEnd"].get(key),
+                document.get_parent(ref_elem) if ref_elem is not None else None,
+            )
+
         return existing
 
+    def _comment_anchor(self, comment_id):
+        """
+        Return (range start, range end, reference run) for a comment.
+
+        Anchors come from the index kept by _load_existing_comments,
+        add_comments and reply_to_comments. Missing or detached entries (after
+        direct DOM edits) are looked up again in document.xml. The range end
+        is None when the document has none.
+
+        Raises:
+            ValueError: If the range start or comment reference is not found
+        """
+        anchors = self._comment_anchors.get(comment_id)
+        if anchors is None or not all(
+            elem is not None and self._document.is_attached(elem)
+            for elem in (anchors[0], anchors[2])
+        ):
+            range_start = self._document._get_node(
+                tag="w:commentRangeStart", attrs={"w:id": str(comment_id)}
+            )
+            ref_elem = self._document._get_node(
+                tag="w:commentReference", attrs={"w:id": str(comment_id)}
+            )
+            range_ends = self._document._get_nodes(
+                "w:commentRangeEnd", attrs={"w:id": str(comment_id)}
+            )
+            anchors = self._comment_anchors[comment_id] = (
+                range_start,
+                range_ends[0] if range_ends else None,
+                self._document.get_parent(ref_elem),
+            )
+        return anchors
+
     # ==================== Private: Setup Methods ====================
 
     def _setup_tracking(self, track_revisions=False):
@@ -953,7 +3247,7 @@ class Document:
 
     def _update_people_xml(self, path):
         """Create people.xml if it doesn't exist."""
-        if not path.exists():
+        if not self._has_part(path):
             # Copy from template
             shutil.copy(TEMPLATE_DIR / "people.xml", path)
 
@@ -965,7 +3259,7 @@ class Document:
             return
 
         # Add Override element
-        root = editor.dom.documentElement
+        root = editor._root
         override_xml = '<Override PartName="/word/people.xml" ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.people+xml"/>'
         editor.append_to(root, override_xml)
 
@@ -976,8 +3270,8 @@ class Document:
         if self._has_relationship(editor, "people.xml"):
             return
 
-        root = editor.dom.documentElement
-        root_tag = root.tagName  # type: ignore
+        root = editor._root
+        root_tag = editor.tag_name(root)
         prefix = root_tag.split(":")[0] + ":" if ":" in root_tag else ""
         next_rid = editor.get_next_rid()
 
@@ -997,35 +3291,32 @@ class Document:
         - rsids: late (after compat)
         """
         editor = self["word/settings.xml"]
-        root = editor.get_node(tag="w:settings")
-        prefix = root.tagName.split(":")[0] if ":" in root.tagName else "w"
+        root = editor._get_node(tag="w:settings")
+        root_tag = editor.tag_name(root)
+        prefix = root_tag.split(":")[0] if ":" in root_tag else "w"
 
         # Conditionally add trackRevisions if requested
         if track_revisions:
-            track_revisions_exists = any(
-                elem.tagName == f"{prefix}:trackRevisions"
-                for elem in editor.dom.getElementsByTagName(f"{prefix}:trackRevisions")
-            )
-
-            if not track_revisions_exists:
+            if not editor._get_nodes(f"{prefix}:trackRevisions"):
                 track_rev_xml = f"<{prefix}:trackRevisions/>"
                 # Try to insert before documentProtection, defaultTabStop, or at start
                 inserted = False
                 for tag in [f"{prefix}:documentProtection", f"{prefix}:defaultTabStop"]:
-                    elements = editor.dom.getElementsByTagName(tag)
+                    elements = editor._get_nodes(tag)
                     if elements:
                         editor.insert_before(elements[0], track_rev_xml)
                         inserted = True
                         break
                 if not inserted:
                     # Insert as first child of settings
-                    if root.firstChild:
-                        editor.insert_before(root.firstChild, track_rev_xml)
+                    children = editor._get_nodes("*", parent=root)
+                    if children:
+                        editor.insert_before(children[0], track_rev_xml)
                     else:
                         editor.append_to(root, track_rev_xml)
 
         # Always check if rsids section exists
-        rsids_elements = editor.dom.getElementsByTagName(f"{prefix}:rsids")
+        rsids_elements = editor._get_nodes(f"{prefix}:rsids")
 
         if not rsids_elements:
             # Add new rsids section
@@ -1036,15 +3327,13 @@ class Document:
 
             # Try to insert after compat, before clrSchemeMapping, or before closing tag
             inserted = False
-            compat_elements = editor.dom.getElementsByTagName(f"{prefix}:compat")
+            compat_elements = editor._get_nodes(f"{prefix}:compat")
             if compat_elements:
                 editor.insert_after(compat_elements[0], rsids_xml)
                 inserted = True
 
             if not inserted:
-                clr_elements = editor.dom.getElementsByTagName(
-                    f"{prefix}:clrSchemeMapping"
-                )
+                clr_elements = editor._get_nodes(f"{prefix}:clrSchemeMapping")
                 if clr_elements:
                     editor.insert_before(clr_elements[0], rsids_xml)
                     inserted = True
@@ -1054,9 +3343,8 @@ class Document:
         else:
             # Check if this rsid already exists
             rsids_elem = rsids_elements[0]
-            rsid_exists = any(
-                elem.getAttribute(f"{prefix}:val") == self.rsid
-                for elem in rsids_elem.getElementsByTagName(f"{prefix}:rsid")
+            rsid_exists = editor._get_nodes(
+                f"{prefix}:rsid", attrs={f"{prefix}:val": self.rsid}, parent=rsids_elem
             )
 
             if not rsid_exists:
@@ -1065,92 +3353,114 @@ class Document:
 
     # ==================== Private: XML File Creation ====================
 
-    def _add_to_comments_xml(
-        self, comment_id, para_id, text, author, initials, timestamp
-    ):
-        """Add a single comment to comments.xml."""
-        if not self.comments_path.exists():
+    def _new_comment_entry(self, comment_id, text, parent_para_id=None):
+        """Create the comments-part entry for a new comment and register it for replies."""
+        para_id = _generate_hex_id()
+        durable_id = _generate_hex_id()
+        # Update existing_comments so replies work (also within a batch)
+        self.existing_comments[comment_id] = {"para_id": para_id}
+        return {
+            "comment_id": comment_id,
+            "para_id": para_id,
+            "durable_id": durable_id,
+            "parent_para_id": parent_para_id,
+            "text": text,
+        }
+
+    def _add_comment_entries(self, entries):
+        """Add comment entries to comments.xml and its companion parts, one edit per part."""
+        if not entries:
+            return
+        self._add_to_comments_xml(entries)
+        self._add_to_comments_extended_xml(entries)
+        self._add_to_comments_ids_xml(entries)
+        self._add_to_comments_extensible_xml(entries)
+
+    def _add_to_comments_xml(self, entries):
+        """Add comments to comments.xml."""
+        if not self._has_part(self.comments_path):
             shutil.copy(TEMPLATE_DIR / "comments.xml", self.comments_path)
 
         editor = self["word/comments.xml"]
-        root = editor.get_node(tag="w:comments")
+        root = editor._get_node(tag="w:comments")
 
-        escaped_text = (
-            text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
-        )
         # Note: w:rsidR, w:rsidRDefault, w:rsidP on w:p, w:rsidR on w:r,
-        # and w:author, w:date, w:initials on w:comment are automatically added by DocxXMLEditor
-        comment_xml = f'''<w:comment w:id="{comment_id}">
+        # and w:author, w:date, w:initials on w:comment are automatically added by DocxXMLEditor.
+        # The text is filled in as a field, so it needs no XML escaping; each
+        # entry fills one copy of the template.
+        comment_xml = '''<w:comment w:id="{comment_id}">
   <w:p w14:paraId="{para_id}" w14:textId="77777777">
     <w:r><w:rPr><w:rStyle w:val="CommentReference"/></w:rPr><w:annotationRef/></w:r>
-    <w:r><w:rPr><w:color w:val="000000"/><w:sz w:val="20"/><w:szCs w:val="20"/></w:rPr><w:t>{escaped_text}</w:t></w:r>
+    <w:r><w:rPr><w:color w:val="000000"/><w:sz w:val="20"/><w:szCs w:val="20"/></w:rPr><w:t>{text}</w:t></w:r>
   </w:p>
 </w:comment>'''
-        editor.append_to(root, comment_xml)
+        editor.append_to(root, comment_xml, entries)
 
-    def _add_to_comments_extended_xml(self, para_id, parent_para_id):
-        """Add a single comment to commentsExtended.xml."""
-        if not self.comments_extended_path.exists():
+    def _add_to_comments_extended_xml(self, entries):
+        """Add comments to commentsExtended.xml."""
+        if not self._has_part(self.comments_extended_path):
             shutil.copy(
                 TEMPLATE_DIR / "commentsExtended.xml", self.comments_extended_path
             )
 
         editor = self["word/commentsExtended.xml"]
-        root = editor.get_node(tag="w15:commentsEx")
-
-        if parent_para_id:
-            xml = f'<w15:commentEx w15:paraId="{para_id}" w15:paraIdParent="{parent_para_id}" w15:done="0"/>'
-        else:
-            xml = f'<w15:commentEx w15:paraId="{para_id}" w15:done="0"/>'
-        editor.append_to(root, xml)
-
-    def _add_to_comments_ids_xml(self, para_id, durable_id):
-        """Add a single comment to commentsIds.xml."""
-        if not self.comments_ids_path.exists():
+        root = editor._get_node(tag="w15:commentsEx")
+
+        reply_xml = '<w15:commentEx w15:paraId="{para_id}" w15:paraIdParent="{parent_para_id}" w15:done="0"/>'
+        comment_xml = '<w15:commentEx w15:paraId="{para_id}" w15:done="0"/>'
+        # One edit per run of replies or top-level comments, keeping their order
+        for is_reply, group in groupby(
+            entries, lambda entry: bool(entry["parent_para_id"])
+        ):
+            editor.append_to(root, reply_xml if is_reply else comment_xml, list(group))
+
+    def _add_to_comments_ids_xml(self, entries):
+        """Add comments to commentsIds.xml."""
+        if not self._has_part(self.comments_ids_path):
             shutil.copy(TEMPLATE_DIR / "commentsIds.xml", self.comments_ids_path)
 
         editor = self["word/commentsIds.xml"]
-        root = editor.get_node(tag="w16cid:commentsIds")
+        root = editor._get_node(tag="w16cid:commentsIds")
 
-        xml = f'<w16cid:commentId w16cid:paraId="{para_id}" w16cid:durableId="{durable_id}"/>'
-        editor.append_to(root, xml)
+        xml = '<w16cid:commentId w16cid:paraId="{para_id}" w16cid:durableId="{durable_id}"/>'
+        editor.append_to(root, xml, entries)
 
-    def _add_to_comments_extensible_xml(self, durable_id):
-        """Add a single comment to commentsExtensible.xml."""
-        if not self.comments_extensible_path.exists():
+    def _add_to_comments_extensible_xml(self, entries):
+        """Add comments to commentsExtensible.xml."""
+        if not self._has_part(self.comments_extensible_path):
             shutil.copy(
                 TEMPLATE_DIR / "commentsExtensible.xml", self.comments_extensible_path
             )
 
         editor = self["word/commentsExtensible.xml"]
-        root = editor.get_node(tag="w16cex:commentsExtensible")
+        root = editor._get_node(tag="w16cex:commentsExtensible")
 
-        xml = f'<w16cex:commentExtensible w16cex:durableId="{durable_id}"/>'
-        editor.append_to(root, xml)
+        xml = '<w16cex:commentExtensible w16cex:durableId="{durable_id}"/>'
+        editor.append_to(root, xml, entries)
 
     # ==================== Private: XML Fragments ====================
 
-    def _comment_range_start_xml(self, comment_id):
-        """Generate XML for comment range start."""
-        return f'<w:commentRangeStart w:id="{comment_id}"/>'
+    def _comment_range_start_xml(self):
+        """Return the XML template for a comment range start (field: comment_id)."""
+        return '<w:commentRangeStart w:id="{comment_id}"/>'
 
-    def _comment_range_end_xml(self, comment_id):
-        """Generate XML for comment range end with reference run.
+    def _comment_range_end_xml(self):
+        """Return the XML template for a comment range end with reference run.
 
-        Note: w:rsidR is automatically added by DocxXMLEditor.
+        Field: comment_id. Note: w:rsidR is automatically added by DocxXMLEditor.
         """
-        return f'''<w:commentRangeEnd w:id="{comment_id}"/>
+        return '''<w:commentRangeEnd w:id="{comment_id}"/>
 <w:r>
   <w:rPr><w:rStyle w:val="CommentReference"/></w:rPr>
   <w:commentReference w:id="{comment_id}"/>
 </w:r>'''
 
-    def _comment_ref_run_xml(self, comment_id):
-        """Generate XML for comment reference run.
+    def _comment_ref_run_xml(self):
+        """Return the XML template for a comment reference run.
 
-        Note: w:rsidR is automatically added by DocxXMLEditor.
+        Field: comment_id. Note: w:rsidR is automatically added by DocxXMLEditor.
         """
-        return f'''<w:r>
+        return '''<w:r>
   <w:rPr><w:rStyle w:val="CommentReference"/></w:rPr>
   <w:commentReference w:id="{comment_id}"/>
 </w:r>'''
@@ -1159,35 +3469,26 @@ class Document:
 
     def _has_relationship(self, editor, target):
         """Check if a relationship with given target exists."""
-        for rel_elem in editor.dom.getElementsByTagName("Relationship"):
-            if rel_elem.getAttribute("Target") == target:
-                return True
-        return False
+        return bool(editor._get_nodes("Relationship", attrs={"Target": target}))
 
     def _has_override(self, editor, part_name):
         """Check if an override with given part name exists."""
-        for override_elem in editor.dom.getElementsByTagName("Override"):
-            if override_elem.getAttribute("PartName") == part_name:
-                return True
-        return False
+        return bool(editor._get_nodes("Override", attrs={"PartName": part_name}))
 
     def _has_author(self, editor, author):
         """Check if an author already exists in people.xml."""
-        for person_elem in editor.dom.getElementsByTagName("w15:person"):
-            if person_elem.getAttribute("w15:author") == author:
-                return True
-        return False
+        return bool(editor._get_nodes("w15:person", attrs={"w15:author": author}))
 
     def _add_author_to_people(self, author):
         """Add author to people.xml (called during initialization)."""
         people_path = self.word_path / "people.xml"
 
         # people.xml should already exist from _setup_tracking
-        if not people_path.exists():
+        if not self._has_part(people_path):
             raise ValueError("people.xml should exist after _setup_tracking")
 
         editor = self["word/people.xml"]
-        root = editor.get_node(tag="w15:people")
+        root = editor._get_node(tag="w15:people")
 
         # Check if author already exists
         if self._has_author(editor, author):
@@ -1207,37 +3508,32 @@ class Document:
         if self._has_relationship(editor, "comments.xml"):
             return
 
-        root = editor.dom.documentElement
-        root_tag = root.tagName  # type: ignore
+        root = editor._root
+        root_tag = editor.tag_name(root)
         prefix = root_tag.split(":")[0] + ":" if ":" in root_tag else ""
-        next_rid_num = int(editor.get_next_rid()[3:])
 
         # Add relationship elements
         rels = [
             (
-                next_rid_num,
                 "http://schemas.openxmlformats.org/officeDocument/2006/relationships/comments",
                 "comments.xml",
             ),
             (
-                next_rid_num + 1,
                 "http://schemas.microsoft.com/office/2011/relationships/commentsExtended",
                 "commentsExtended.xml",
             ),
             (
-                next_rid_num + 2,
                 "http://schemas.microsoft.com/office/2016/09/relationships/commentsIds",
                 "commentsIds.xml",
             ),
             (
-                next_rid_num + 3,
                 "http://schemas.microsoft.com/office/2018/08/relationships/commentsExtensible",
                 "commentsExtensible.xml",
             ),
         ]
 
-        for rel_id, rel_type, target in rels:
-            rel_xml = f'<{prefix}Relationship Id="rId{rel_id}" Type="{rel_type}" Target="{target}"/>'
+        for rel_type, target in rels:
+            rel_xml = f'<{prefix}Relationship Id="{editor.get_next_rid()}" Type="{rel_type}" Target="{target}"/>'
             editor.append_to(root, rel_xml)
 
     def _ensure_comment_content_types(self):
@@ -1247,7 +3543,7 @@ class Document:
         if self._has_override(editor, "/word/comments.xml"):
             return
 
-        root = editor.dom.documentElement
+        root = editor._root
 
         # Add Override elements
         overrides = [
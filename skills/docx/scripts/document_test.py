@@ -0,0 +1,861 @@
+import io
+import random
+import re
+import tempfile
+import unittest
+import zipfile
+from datetime import datetime
+from pathlib import Path
+
+import lxml.etree
+
+from ooxml.scripts.pack import pack_document
+
+from .document import Document, DocxXMLEditor, LxmlDocxXMLEditor
+from .utilities import XMLEditor, _iter_elements, _number_lines
+from .utilities_test import NAMESPACES, make_part
+
+ENGINES = (DocxXMLEditor, LxmlDocxXMLEditor)
+
+PACKAGE_FILES = {
+    "[Content_Types].xml": """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">
+  <Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>
+  <Default Extension="xml" ContentType="application/xml"/>
+  <Override PartName="/word/document.xml" ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>
+  <Override PartName="/word/settings.xml" ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.settings+xml"/>
+</Types>""",
+    "_rels/.rels": """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+  <Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="word/document.xml"/>
+</Relationships>""",
+    "word/_rels/document.xml.rels": """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+  <Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/settings" Target="settings.xml"/>
+</Relationships>""",
+    "word/settings.xml": """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<w:settings xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">
+  <w:defaultTabStop w:val="720"/>
+  <w:compat/>
+</w:settings>""",
+}
+
+
+def make_document(directory, paragraphs=10):
+    """Write an unpacked .docx with numbered paragraphs, some with tracked changes"""
+    directory = Path(directory)
+    for name, content in PACKAGE_FILES.items():
+        (directory / name).parent.mkdir(parents=True, exist_ok=True)
+        (directory / name).write_text(content, encoding="utf-8")
+    body = []
+    for i in range(paragraphs):
+        body.append(
+            f'    <w:p w14:paraId="{i + 1:08X}">\n'
+            f"      <w:r>\n        <w:t>Paragraph {i} says hello world</w:t>\n      </w:r>\n"
+            "    </w:p>"
+        )
+        if i % 3 == 0:
+            body.append(
+                "    <w:p>\n"
+                f'      <w:ins w:id="{i}" w:author="Jane"><w:r><w:t>inserted {i}</w:t></w:r></w:ins>\n'
+                f'      <w:del w:id="{i + 100000}" w:author="Jane"><w:r><w:delText>deleted {i}</w:delText></w:r></w:del>\n'
+                "    </w:p>"
+            )
+    body = "\n".join(body)
+    (directory / "word/document.xml").write_text(
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        f"<w:document {NAMESPACES}>\n  <w:body>\n{body}\n    <w:sectPr/>\n"
+        "  </w:body>\n</w:document>",
+        encoding="utf-8",
+    )
+    return directory
+
+
+def canonical_xml(data):
+    """Return XML bytes with dates masked and whitespace-only text dropped"""
+    data = re.sub(rb"\d{4}-\d\d-\d\dT[\d:]+Z", b"DATE", data)
+    parser = lxml.etree.XMLParser(remove_blank_text=True)
+    return lxml.etree.tostring(lxml.etree.fromstring(data, parser), method="c14n")
+
+
+def canonical(editor):
+    """Return the editor's output in canonical form (see canonical_xml)"""
+    stream = io.BytesIO()
+    editor.write(stream)
+    return canonical_xml(stream.getvalue())
+
+
+def canonical_tree(directory):
+    """Return {relative path: canonical XML} for the XML files under a directory"""
+    directory = Path(directory)
+    return {
+        str(path.relative_to(directory)): canonical_xml(path.read_bytes())
+        for path in sorted(directory.rglob("*"))
+        if path.suffix in (".xml", ".rels")
+    }
+
+
+def file_states(directory):
+    """Return {path: (inode, modification time)} for the files under a directory"""
+    return {
+        path: (path.stat().st_ino, path.stat().st_mtime_ns)
+        for path in Path(directory).rglob("*")
+        if path.is_file()
+    }
+
+
+def edit_session(document):
+    """Comment on, delete, insert and revert content in the make_document fixture"""
+    editor = document["word/document.xml"]
+    paragraph = editor.get_node(tag="w:p", contains="Paragraph 1 says")
+    run = editor.get_node(tag="w:r", contains="Paragraph 2 says")
+    comment = document.add_comment(
+        start=paragraph, end=paragraph, text="Look {here} & <there>"
+    )
+    document.add_comment(start=run, end=run, text=" spaced ")
+    document.reply_to_comment(comment, "reply")
+    editor.suggest_deletion(editor.get_node(tag="w:r", contains="Paragraph 4 says"))
+    editor.insert_after(
+        editor.get_node(tag="w:p", contains="Paragraph 0 says"),
+        "<w:p><w:ins><w:r><w:t>new</w:t></w:r></w:ins>"
+        "<w:del><w:r><w:t> old </w:t></w:r></w:del></w:p>",
+    )
+    editor.revert_insertion(editor.get_node(tag="w:ins", attrs={"w:id": "3"}))
+    editor.revert_deletion(editor.get_node(tag="w:del", attrs={"w:id": "100003"}))
+
+
+W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+TRACKED_BODY = """<w:body>
+  <w:p><w:r><w:rPr><w:b/></w:rPr><w:t>The Contr</w:t></w:r><w:r><w:t xml:space="preserve">actor pays $100 </w:t></w:r><w:bookmarkStart w:id="0" w:name="b"/><w:r><w:t>within 30 days.</w:t></w:r></w:p>
+  <w:p><w:r><w:t>Contractor and Contractor's agent</w:t></w:r></w:p>
+  <w:p><w:ins w:id="1" w:author="Jane" w:date="2024-01-02T00:00:00Z"><w:r><w:t>Jane added this. </w:t></w:r></w:ins><w:r><w:t>Kept text</w:t></w:r><w:del w:id="2" w:author="John" w:date="2024-03-01T00:00:00Z"><w:r><w:delText> John removed this</w:delText></w:r></w:del></w:p>
+  <w:p><w:del w:id="3" w:author="Jane" w:date="2024-02-01T00:00:00Z"><w:r><w:delText>Only deleted</w:delText></w:r></w:del></w:p>
+  <w:p><w:r><w:t>Pay $250 within 60 days</w:t></w:r><w:ins w:id="4" w:author="John" w:date="2024-04-01T00:00:00Z"><w:r><w:t>, or else</w:t></w:r></w:ins></w:p>
+</w:body>"""
+
+
+def make_tracked_part(directory, name):
+    """Write a document part whose paragraphs have split runs and tracked changes"""
+    path = Path(directory) / name
+    path.write_text(
+        f'<?xml version="1.0" encoding="UTF-8"?>\n<w:document {NAMESPACES}>\n'
+        f"{TRACKED_BODY}\n</w:document>",
+        encoding="utf-8",
+    )
+    return path
+
+
+def paragraph_texts(editor, accepted):
+    """Return each paragraph's text with every tracked change accepted or rejected"""
+    stream = io.BytesIO()
+    editor.write(stream)
+    root = lxml.etree.fromstring(stream.getvalue())
+    hidden = f"{W}del" if accepted else f"{W}ins"
+    return [
+        "".join(
+            text.text or ""
+            for text in paragraph.iter(f"{W}t", f"{W}delText")
+            if not any(ancestor.tag == hidden for ancestor in text.iterancestors())
+        )
+        for paragraph in root.iter(f"{W}p")
+    ]
+
+
+class DocumentTestCase(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.tmp = Path(directory.name)
+        self.source = make_document(self.tmp / "source")
+
+    def open_document(self, source=None, **kwargs):
+        """Open a Document with a fixed RSID and seeded paraIds, closing it after the test"""
+        random.seed(1)
+        kwargs.setdefault("rsid", "00AB12CD")
+        document = Document(source or self.source, **kwargs)
+        self.addCleanup(document.__del__)
+        return document
+
+
+def canonical_id(elem):
+    """Return the w:id of a minidom or lxml element"""
+    if hasattr(elem, "getAttribute"):
+        return elem.getAttribute("w:id")
+    return elem.get("{http://schemas.openxmlformats.org/wordprocessingml/2006/main}id")
+
+
+class TestEngines(DocumentTestCase):
+
+    def test_engines_save_the_same_parts(self):
+        """Test that an edit session saves the same parts on minidom and lxml"""
+        saved = {}
+        for engine in ("minidom", "lxml"):
+            document = self.open_document(engine=engine)
+            edit_session(document)
+            document.save(self.tmp / engine, validate=False)
+            saved[engine] = canonical_tree(self.tmp / engine)
+        self.assertEqual(saved["minidom"], saved["lxml"])
+        self.assertIn("word/comments.xml", saved["lxml"])
+
+    def test_engines_find_the_same_nodes(self):
+        """Test that lookups on both engines return the same elements"""
+        editors = [
+            engine(make_part(self.tmp, name=f"{engine.__name__}.xml"), rsid="00AB12CD")
+            for engine in ENGINES
+        ]
+        lookups = [
+            {"tag": "w:p", "attrs": {"w14:paraId": "00000004"}},
+            {"tag": "w:r", "contains": "Paragraph 3 says"},
+            {"tag": "w:p", "line_number": 9},
+            {"tag": "w:t", "line_number": range(14, 18)},
+        ]
+        for lookup in lookups:
+            with self.subTest(**lookup):
+                minidom_node, lxml_node = (editor.get_node(**lookup) for editor in editors)
+                # One element per line and tag in the fixture
+                self.assertEqual(minidom_node.parse_position[0], lxml_node.sourceline)
+                self.assertEqual(editors[1].tag_name(lxml_node), lookup["tag"])
+
+
+class TestChangeIds(DocumentTestCase):
+
+    def test_ids_match_a_rescan(self):
+        """Test each new change ID against the highest w:id in the part plus one"""
+        document = self.open_document()
+        editor = document["word/document.xml"]
+        paragraph = editor.get_node(tag="w:p", contains="Paragraph 2 says")
+        for content in (
+            "<w:ins><w:r/></w:ins>",
+            '<w:del w:id="100500"><w:r/></w:del>',
+            "<w:del><w:r/></w:del>",
+        ):
+            highest = max(
+                int(elem.getAttribute("w:id"))
+                for tag in ("w:ins", "w:del")
+                for elem in editor.dom.getElementsByTagName(tag)
+            )
+            (node,) = editor.append_to(paragraph, content)
+            if "w:id" not in content:
+                self.assertEqual(node.getAttribute("w:id"), str(highest + 1))
+        self.assertEqual(editor._get_next_change_id(), 100502)
+
+    def test_comment_ids_count_up(self):
+        """Test that comment and reply IDs continue from the existing comments"""
+        document = self.open_document()
+        editor = document["word/document.xml"]
+        paragraph = editor.get_node(tag="w:p", contains="Paragraph 2 says")
+        first = document.add_comment(start=paragraph, end=paragraph, text="one")
+        reply = document.reply_to_comment(first, "two")
+        self.assertEqual([first, reply], [0, 1])
+        document.save(validate=False)
+
+        reopened = self.open_document()
+        self.assertEqual(reopened.next_comment_id, 2)
+        reopened.next_comment_id = 10
+        paragraph = reopened["word/document.xml"].get_node(
+            tag="w:p", contains="Paragraph 3 says"
+        )
+        comment = reopened.add_comment(start=paragraph, end=paragraph, text="three")
+        self.assertEqual(comment, 10)
+
+
+class TestSave(DocumentTestCase):
+
+    def test_only_changed_files_are_replaced(self):
+        """Test that saving back leaves untouched files as they were"""
+        untouched = self.source / "_rels/.rels"
+        before = file_states(self.source)[untouched]
+        document = self.open_document()
+        edit_session(document)
+        document.save(validate=False)
+        self.assertEqual(file_states(self.source)[untouched], before)
+        saved = (self.source / "word/document.xml").read_bytes()
+        self.assertEqual(saved, document["word/document.xml"].dom.toxml(encoding="utf-8"))
+        self.assertTrue((self.source / "word/comments.xml").exists())
+
+    def test_saving_twice_writes_nothing_new(self):
+        """Test that a second save after no further edits does not touch any file"""
+        document = self.open_document()
+        edit_session(document)
+        document.save(validate=False)
+        before = file_states(self.source)
+        document.save(validate=False)
+        self.assertEqual(file_states(self.source), before)
+
+
+class TestWorkingCopy(DocumentTestCase):
+
+    def file_contents(self, directory):
+        return {
+            str(path.relative_to(directory)): path.read_bytes()
+            for path in sorted(Path(directory).rglob("*"))
+            if path.is_file()
+        }
+
+    def test_edits_never_reach_the_source(self):
+        """Test that saving elsewhere leaves every source file's bytes as they were"""
+        for engine in ("minidom", "lxml"):
+            with self.subTest(engine=engine):
+                before = self.file_contents(self.source)
+                document = self.open_document(engine=engine)
+                edit_session(document)
+                document.save(self.tmp / f"copy-{engine}", validate=False)
+                self.assertEqual(self.file_contents(self.source), before)
+                self.assertNotEqual(
+                    self.file_contents(self.tmp / f"copy-{engine}"), before
+                )
+
+    def test_baseline_is_the_unedited_source(self):
+        """Test that the validation baseline holds the parts as they were before editing"""
+        document = self.open_document()
+        edit_session(document)
+        document["word/document.xml"].save()
+        with zipfile.ZipFile(document.original_docx) as package:
+            baseline = package.read("word/document.xml")
+        source = (self.source / "word/document.xml").read_bytes()
+        self.assertEqual(canonical_xml(baseline), canonical_xml(source))
+
+
+class TestBatchComments(DocumentTestCase):
+
+    TEXTS = ["first", "second & <third>", " padded "]
+
+    def anchors(self, document):
+        editor = document["word/document.xml"]
+        paragraph = editor.get_node(tag="w:p", contains="Paragraph 1 says")
+        run = editor.get_node(tag="w:r", contains="Paragraph 4 says")
+        last = editor.get_node(tag="w:p", contains="Paragraph 7 says")
+        return [(paragraph, paragraph), (run, run), (run, last)]
+
+    def saved(self, document, name):
+        document.save(self.tmp / name, validate=False)
+        return canonical_tree(self.tmp / name)
+
+    def test_batches_match_single_calls(self):
+        """Test that add_comments and reply_to_comments save what single calls save"""
+        for engine in ("minidom", "lxml"):
+            with self.subTest(engine=engine):
+                single = self.open_document(engine=engine)
+                ids = [
+                    single.add_comment(start=start, end=end, text=text)
+                    for (start, end), text in zip(self.anchors(single), self.TEXTS)
+                ]
+                ids.append(single.reply_to_comment(ids[0], "reply"))
+                ids.append(single.reply_to_comment(ids[2], ""))
+
+                batch = self.open_document(engine=engine)
+                batch_ids = batch.add_comments(
+                    {"start": start, "end": end, "text": text}
+                    for (start, end), text in zip(self.anchors(batch), self.TEXTS)
+                )
+                batch_ids += batch.reply_to_comments(
+                    [
+                        {"parent_comment_id": batch_ids[0], "text": "reply"},
+                        {"parent_comment_id": batch_ids[2], "text": ""},
+                    ]
+                )
+                self.assertEqual(batch_ids, ids)
+                self.assertEqual(
+                    self.saved(batch, f"batch-{engine}"),
+                    self.saved(single, f"single-{engine}"),
+                )
+
+    def test_failed_reply_keeps_earlier_replies(self):
+        """Test that replies before an unknown parent are added, as with single calls"""
+        document = self.open_document()
+        start, end = self.anchors(document)[0]
+        (comment,) = document.add_comments([{"start": start, "end": end, "text": "first"}])
+        with self.assertRaisesRegex(ValueError, "not found"):
+            document.reply_to_comments(
+                [
+                    {"parent_comment_id": comment, "text": "kept"},
+                    {"parent_comment_id": 99, "text": "lost"},
+                ]
+            )
+        comments = document["word/comments.xml"].get_nodes("w:comment")
+        self.assertEqual(len(comments), 2)
+        self.assertEqual(document.next_comment_id, 2)
+
+
+class TestCommentAnchors(DocumentTestCase):
+
+    def next_element(self, node):
+        node = node.nextSibling
+        while node is not None and node.nodeType != node.ELEMENT_NODE:
+            node = node.nextSibling
+        return node
+
+    def assertNextToParent(self, document, parent, reply):
+        editor = document["word/document.xml"]
+        starts = {
+            elem.getAttribute("w:id"): elem
+            for elem in editor.get_nodes("w:commentRangeStart")
+        }
+        references = {
+            elem.getAttribute("w:id"): elem.parentNode
+            for elem in editor.get_nodes("w:commentReference")
+        }
+        self.assertIs(self.next_element(starts[str(parent)]), starts[str(reply)])
+        reply_run = self.next_element(references[str(parent)])
+        self.assertIs(reply_run, references[str(reply)])
+        range_end = self.next_element(reply_run)
+        self.assertEqual(range_end.tagName, "w:commentRangeEnd")
+        self.assertEqual(range_end.getAttribute("w:id"), str(reply))
+
+    def replied(self, name, prepare, lookup):
+        """Add a comment, prepare the document, reply and return the saved parts"""
+        document = self.open_document(self.source)
+        editor = document["word/document.xml"]
+        run = editor.get_node(tag="w:r", contains="Paragraph 4 says")
+        parent = document.add_comment(start=run, end=run, text="parent")
+        document = prepare(document) or document
+        if lookup:
+            # Find every anchor in document.xml, as replies did before the index
+            document._comment_anchors.clear()
+        reply = document.reply_to_comment(parent, "reply")
+        self.assertNextToParent(document, parent, reply)
+        document.save(self.tmp / name, validate=False)
+        return canonical_tree(self.tmp / name)
+
+    def test_replies_match_a_lookup(self):
+        """Test reply placement with indexed anchors against anchors looked up again"""
+
+        def reopen(document):
+            document.save(self.tmp / "reopened", validate=False)
+            return self.open_document(self.tmp / "reopened")
+
+        def replace_reference_run(document):
+            editor = document["word/document.xml"]
+            run = editor.get_nodes("w:commentReference")[0].parentNode
+            editor.replace_node(run, run.toxml())
+
+        scenarios = {
+            "added": lambda document: None,
+            "reopened": reopen,
+            "replaced": replace_reference_run,
+        }
+        for name, prepare in scenarios.items():
+            with self.subTest(scenario=name):
+                self.assertEqual(
+                    self.replied(f"{name}-indexed", prepare, lookup=False),
+                    self.replied(f"{name}-lookup", prepare, lookup=True),
+                )
+
+
+class TestOpenDocx(DocumentTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.docx = self.tmp / "source.docx"
+        pack_document(self.source, self.docx, workers=1)
+
+    def package_parts(self, path):
+        with zipfile.ZipFile(path) as package:
+            self.assertIsNone(package.testzip())
+            return {
+                info.filename: (
+                    canonical_xml(package.read(info))
+                    if info.filename.endswith((".xml", ".rels"))
+                    else package.read(info)
+                )
+                for info in package.infolist()
+            }
+
+    def test_open_matches_unpacked_editing(self):
+        """Test that editing a .docx directly saves what editing it unpacked saves"""
+        for engine in ("minidom", "lxml"):
+            with self.subTest(engine=engine):
+                direct = self.open_document(self.docx, engine=engine)
+                edit_session(direct)
+                direct.save_as(self.tmp / f"direct-{engine}.docx", validate=False)
+
+                unpacked = self.open_document(engine=engine)
+                edit_session(unpacked)
+                unpacked.save_as(self.tmp / f"unpacked-{engine}.docx", validate=False)
+
+                self.assertEqual(
+                    self.package_parts(self.tmp / f"direct-{engine}.docx"),
+                    self.package_parts(self.tmp / f"unpacked-{engine}.docx"),
+                )
+
+    def test_untouched_entries_are_copied_as_stored(self):
+        """Test that entries no edit touched keep their compressed bytes and attributes"""
+        document = Document.open(self.docx, rsid="00AB12CD")
+        self.addCleanup(document.__del__)
+        editor = document["word/document.xml"]
+        paragraph = editor.get_node(tag="w:p", contains="Paragraph 1")
+        document.add_comment(start=paragraph, end=paragraph, text="comment")
+        document.save_as(self.tmp / "out.docx", validate=False)
+
+        def stored(info):
+            return info.CRC, info.compress_size, info.date_time, info.compress_type
+
+        with zipfile.ZipFile(self.docx) as source:
+            with zipfile.ZipFile(self.tmp / "out.docx") as out:
+                self.assertEqual(
+                    stored(out.getinfo("_rels/.rels")),
+                    stored(source.getinfo("_rels/.rels")),
+                )
+                self.assertIn("word/comments.xml", out.namelist())
+
+    def test_open_rejects_other_files(self):
+        """Test that open() refuses paths that are not .docx files"""
+        (self.tmp / "notes.txt").write_text("text")
+        for path in (self.tmp / "notes.txt", self.tmp / "missing.docx", self.source):
+            with self.subTest(path=path.name), self.assertRaises(ValueError):
+                Document.open(path)
+
+
+class TestReplacements(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def replaced(self, engine, replacements, regex=False):
+        path = make_tracked_part(self.tmp.name, f"{engine.__name__}.xml")
+        editor = engine(path, rsid="00AB12CD")
+        rejected = paragraph_texts(editor, accepted=False)
+        before = paragraph_texts(editor, accepted=True)
+        count = editor.suggest_replacements(replacements, regex=regex)
+        # Rejecting every change still gives the original text
+        self.assertEqual(paragraph_texts(editor, accepted=False), rejected)
+        return editor, before, count
+
+    def test_literal_replacements_across_runs(self):
+        """Test that accepting the changes gives the text with every literal match replaced"""
+        replacements = {
+            "Contractor": "Supplier",
+            "Contractor's agent": "agents",
+            "30 days": "60 days",
+        }
+        pattern = re.compile(
+            "|".join(re.escape(p) for p in sorted(replacements, key=len, reverse=True))
+        )
+        for engine in ENGINES:
+            with self.subTest(engine=engine.__name__):
+                editor, before, count = self.replaced(engine, replacements)
+                expected = [
+                    pattern.sub(lambda match: replacements[match.group()], text)
+                    for text in before
+                ]
+                self.assertEqual(paragraph_texts(editor, accepted=True), expected)
+                self.assertEqual(count, sum(len(pattern.findall(text)) for text in before))
+                self.assertEqual(count, 4)
+
+    def test_regex_replacements(self):
+        """Test regular expressions with backreferences against re.sub"""
+        for engine in ENGINES:
+            with self.subTest(engine=engine.__name__):
+                editor, before, count = self.replaced(
+                    engine, [(r"\$(\d+)", r"USD \1")], regex=True
+                )
+                expected = [re.sub(r"\$(\d+)", r"USD \1", text) for text in before]
+                self.assertEqual(paragraph_texts(editor, accepted=True), expected)
+                self.assertEqual(count, 2)
+
+    def test_engines_replace_alike(self):
+        """Test that both engines produce the same tracked changes"""
+        random.seed(5)
+        minidom_editor, _, _ = self.replaced(DocxXMLEditor, {"Contractor": "Supplier"})
+        random.seed(5)
+        lxml_editor, _, _ = self.replaced(LxmlDocxXMLEditor, {"Contractor": "Supplier"})
+        self.assertEqual(canonical(minidom_editor), canonical(lxml_editor))
+
+
+class TestTextRevisions(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def revised(self, engine, name, resolve):
+        """Suggest revisions on a fresh part, resolve them, and return the paragraph texts"""
+        path = make_part(self.tmp.name, paragraphs=8, name=name)
+        editor = engine(path, rsid="00AB12CD")
+        original = paragraph_texts(editor, accepted=True)
+        revised = list(original)
+        revised[1] = "Paragraph 1 says goodbye"
+        revised[4] = "Now paragraph 4 says hello again"
+        del revised[6]
+        revised.insert(2, "A brand new paragraph")
+        count = editor.suggest_text_revisions(revised)
+        self.assertEqual(count, 4)
+        self.assertEqual(paragraph_texts(editor, accepted=False)[:2], original[:2])
+        getattr(editor, resolve)()
+        return original, revised, paragraph_texts(editor, accepted=True)
+
+    def test_accepting_gives_the_new_text(self):
+        """Test that accepting every suggested change yields exactly the revised paragraphs"""
+        for engine in ENGINES:
+            with self.subTest(engine=engine.__name__):
+                _, revised, accepted = self.revised(
+                    engine, f"accept-{engine.__name__}.xml", "accept_all"
+                )
+                # suggest_deletion keeps the paragraph mark, so an empty paragraph stays
+                self.assertEqual([text for text in accepted if text], revised)
+
+    def test_rejecting_gives_the_old_text(self):
+        """Test that rejecting every suggested change yields the original paragraphs"""
+        for engine in ENGINES:
+            with self.subTest(engine=engine.__name__):
+                original, _, rejected = self.revised(
+                    engine, f"reject-{engine.__name__}.xml", "reject_all"
+                )
+                self.assertEqual(rejected, original)
+
+    def test_unchanged_text_changes_nothing(self):
+        """Test that passing the current text leaves the part unmodified"""
+        for engine in ENGINES:
+            with self.subTest(engine=engine.__name__):
+                path = make_part(self.tmp.name, name=f"same-{engine.__name__}.xml")
+                editor = engine(path, rsid="00AB12CD")
+                before = canonical(editor)
+                current = paragraph_texts(editor, accepted=True)
+                self.assertEqual(editor.suggest_text_revisions(current), 0)
+                self.assertEqual(canonical(editor), before)
+                self.assertFalse(editor.modified)
+
+
+class TestResolveChanges(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def editor(self, engine, name):
+        path = make_tracked_part(self.tmp.name, f"{name}-{engine.__name__}.xml")
+        return engine(path, rsid="00AB12CD")
+
+    def remaining_ids(self, editor):
+        stream = io.BytesIO()
+        editor.write(stream)
+        root = lxml.etree.fromstring(stream.getvalue())
+        changes = root.iter(f"{W}ins", f"{W}del")
+        return sorted(int(change.get(f"{W}id")) for change in changes)
+
+    def test_resolving_everything(self):
+        """Test that accept_all and reject_all give the accepted and rejected text"""
+        for engine in ENGINES:
+            with self.subTest(engine=engine.__name__):
+                for method, accepted in (("accept_all", True), ("reject_all", False)):
+                    editor = self.editor(engine, method)
+                    expected = paragraph_texts(editor, accepted=accepted)
+                    self.assertEqual(getattr(editor, method)(), 4)
+                    self.assertEqual(self.remaining_ids(editor), [])
+                    self.assertEqual(paragraph_texts(editor, accepted=True), expected)
+
+    def test_filters(self):
+        """Test that author, date and paragraph filters resolve only the matching changes"""
+        cases = [
+            ({"author": "Jane"}, [2, 4]),
+            ({"author": ["Jane", "John"]}, []),
+            ({"since": datetime(2024, 2, 1)}, [1]),
+            ({"until": datetime(2024, 2, 1)}, [2, 3, 4]),
+            ({"paragraphs": range(2, 3)}, [3, 4]),
+            ({"author": "John", "paragraphs": range(3, 5)}, [1, 2, 3]),
+        ]
+        for engine in ENGINES:
+            for filters, remaining in cases:
+                with self.subTest(engine=engine.__name__, **filters):
+                    editor = self.editor(engine, "filters")
+                    before = self.remaining_ids(editor)
+                    count = editor.accept_all(**filters)
+                    self.assertEqual(self.remaining_ids(editor), remaining)
+                    self.assertEqual(count, len(before) - len(remaining))
+
+    def test_engines_resolve_alike(self):
+        """Test that both engines leave the same XML"""
+        for method in ("accept_all", "reject_all"):
+            with self.subTest(method=method):
+                editors = [self.editor(engine, f"alike-{method}") for engine in ENGINES]
+                for editor in editors:
+                    getattr(editor, method)(author="Jane")
+                self.assertEqual(*(canonical(editor) for editor in editors))
+
+
+class TestRollback(DocumentTestCase):
+
+    def comment_and_save(self, document, name):
+        """Add the same comment with the same random IDs and return the saved parts"""
+        random.seed(7)
+        editor = document["word/document.xml"]
+        paragraph = editor.get_node(tag="w:p", contains="Paragraph 5 says")
+        document.add_comment(start=paragraph, end=paragraph, text="after")
+        document.save(self.tmp / name, validate=False)
+        return canonical_tree(self.tmp / name)
+
+    def test_rollback_matches_never_editing(self):
+        """Test that edits rolled back leave no trace in what is saved afterwards"""
+        for engine in ("minidom", "lxml"):
+            with self.subTest(engine=engine):
+                untouched = self.open_document(engine=engine)
+                expected = self.comment_and_save(untouched, f"untouched-{engine}")
+
+                document = self.open_document(engine=engine)
+                document.checkpoint()
+                edit_session(document)
+                document["word/settings.xml"].get_nodes("w:compat")
+                document.rollback()
+                # The checkpoint stays active: roll back a second attempt too
+                edit_session(document)
+                document.rollback()
+                saved = self.comment_and_save(document, f"rolled-back-{engine}")
+                self.assertEqual(saved, expected)
+
+    def test_rollback_needs_a_checkpoint(self):
+        """Test that rollback() without checkpoint() raises"""
+        document = self.open_document()
+        with self.assertRaisesRegex(ValueError, "No checkpoint"):
+            document.rollback()
+
+
+class TestCurrentLines(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def elements(self, editor):
+        if isinstance(editor, LxmlDocxXMLEditor):
+            return [elem for elem in editor.root.iter() if isinstance(elem.tag, str)]
+        return list(_iter_elements(editor.dom))
+
+    def assertLinesMatchSave(self, editor):
+        """Check current lines against the lines of the saved file, read back"""
+        stream = io.BytesIO()
+        editor.write(stream)
+        saved = Path(self.tmp.name) / "saved.xml"
+        saved.write_bytes(stream.getvalue())
+        reread = [elem.parse_position[0] for elem in _iter_elements(XMLEditor(saved).dom)]
+        elements = self.elements(editor)
+        self.assertEqual([editor.current_line(elem) for elem in elements], reread)
+
+        text = stream.getvalue().decode(editor.encoding)
+        self.assertEqual(editor.render_lines(), _number_lines(text, 1))
+        for first in range(1, text.count("\n") + 2, 5):
+            lines = range(first, first + 4)
+            self.assertEqual(editor.render_lines(lines), _number_lines(text, 1, lines))
+
+        paragraphs = [elem for elem in elements if editor.tag_name(elem) == "w:p"]
+        for paragraph in paragraphs:
+            line = editor.current_line(paragraph)
+            if [editor.current_line(p) for p in paragraphs].count(line) == 1:
+                found = editor.get_node(tag="w:p", line_number=line, current_lines=True)
+                self.assertIs(found, paragraph)
+
+    def test_lines_follow_edits(self):
+        """Test current lines after each kind of edit against saving and reading back"""
+        for engine in ENGINES:
+            with self.subTest(engine=engine.__name__):
+                path = make_tracked_part(self.tmp.name, f"{engine.__name__}.xml")
+                editor = engine(path, rsid="00AB12CD")
+                self.assertLinesMatchSave(editor)
+                editor.insert_after(
+                    editor.get_node(tag="w:p", contains="Kept text"),
+                    "<w:p>\n<w:ins><w:r><w:t>new</w:t></w:r></w:ins>\n\n"
+                    "<w:del><w:r><w:t> old </w:t></w:r></w:del></w:p>",
+                )
+                self.assertLinesMatchSave(editor)
+                editor.suggest_deletion(editor.get_node(tag="w:r", contains="Pay $250"))
+                self.assertLinesMatchSave(editor)
+                editor.checkpoint()
+                editor.replace_node(
+                    editor.get_node(tag="w:p", contains="Contractor and"),
+                    "<w:p><w:r><w:t>a</w:t></w:r></w:p>\n<w:p><w:r><w:t>b</w:t></w:r></w:p>",
+                )
+                self.assertLinesMatchSave(editor)
+                editor.rollback()
+                self.assertLinesMatchSave(editor)
+                editor.accept_all()
+                self.assertLinesMatchSave(editor)
+
+                paragraph = editor.get_nodes("w:p")[1]
+                parent = editor.get_parent(paragraph)
+                if engine is DocxXMLEditor:
+                    parent.removeChild(paragraph)
+                else:
+                    parent.remove(paragraph)
+                editor.mark_modified()
+                self.assertLinesMatchSave(editor)
+
+
+class TestInjection(unittest.TestCase):
+
+    CELL = (
+        "<w:tc><w:p><w:r><w:t> a </w:t></w:r>"
+        "<w:del><w:r><w:t>b</w:t></w:r><w:ins><w:r><w:t>c</w:t></w:r></w:ins></w:del>"
+        '<w:ins w:id="7"><w:r><w:t>d</w:t></w:r></w:ins></w:p></w:tc>'
+    )
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def edit(self, editor_class):
+        random.seed(3)
+        path = make_part(self.tmp.name, name=f"{editor_class.__name__}.xml")
+        editor = editor_class(path, rsid="00AB12CD")
+        paragraph = editor.get_node(tag="w:p", contains="Paragraph 3")
+        table = "<w:tbl>" + f"<w:tr>{self.CELL * 3}</w:tr>" * 3 + "</w:tbl>"
+        editor.insert_after(paragraph, table)
+        editor.insert_after(
+            paragraph,
+            "<w:comment><w:p><w:r><w:t>x</w:t></w:r></w:p></w:comment>"
+            "<w:r><w:t>y </w:t></w:r>",
+        )
+        editor.insert_before(paragraph, "<w:del><w:r/></w:del><w:ins><w:r/></w:ins>")
+        deletion = editor.get_nodes(tag="w:del")[0]
+        editor.append_to(deletion, "<w:r><w:t>more</w:t></w:r><w:ins><w:r/></w:ins>")
+        return editor
+
+    def test_engines_inject_the_same_attributes(self):
+        """Test that both engines allocate IDs, RSIDs and paraIds in the same order"""
+        minidom_editor, lxml_editor = (self.edit(engine) for engine in ENGINES)
+        self.assertEqual(canonical(minidom_editor), canonical(lxml_editor))
+
+    def test_change_ids_follow_tag_order(self):
+        """Test that new w:ins IDs are allocated before new w:del IDs within a fragment"""
+        for engine in ENGINES:
+            with self.subTest(engine=engine.__name__):
+                path = make_part(self.tmp.name, name=f"ids-{engine.__name__}.xml")
+                editor = engine(path, rsid="00AB12CD")
+                paragraph = editor.get_node(tag="w:p", contains="Paragraph 0")
+                editor.insert_after(
+                    paragraph,
+                    "<w:p><w:del><w:r/></w:del><w:ins><w:r/></w:ins>"
+                    "<w:del><w:r/></w:del></w:p>",
+                )
+                changes = editor.get_nodes(tag="w:del") + editor.get_nodes(tag="w:ins")
+                ids = [canonical_id(node) for node in changes]
+                self.assertEqual(ids, ["1", "2", "0"])
+
+
+    def test_attributes_follow_the_element_rules(self):
+        """Test each injected attribute against the rule for its element, on both engines"""
+        for engine in ENGINES:
+            with self.subTest(engine=engine.__name__):
+                editor = self.edit(engine)
+                data = canonical(editor)
+                root = lxml.etree.fromstring(data)
+                w = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+                for run in root.iter(f"{w}r"):
+                    if run.get(f"{w}rsidR") is None and run.get(f"{w}rsidDel") is None:
+                        continue  # Part of the fixture
+                    deleted = any(a.tag == f"{w}del" for a in run.iterancestors())
+                    self.assertEqual(run.get(f"{w}rsidDel") is not None, deleted)
+                    self.assertEqual(run.get(f"{w}rsidR") is not None, not deleted)
+                for text in root.iter(f"{w}t"):
+                    padded = text.text != text.text.strip()
+                    preserve = text.get("{http://www.w3.org/XML/1998/namespace}space")
+                    self.assertEqual(preserve == "preserve", padded)
+                # Allocated IDs are unique (the fragment repeats w:id="7" itself)
+                ids = [c.get(f"{w}id") for c in root.iter(f"{w}ins", f"{w}del")]
+                ids = [change_id for change_id in ids if change_id != "7"]
+                self.assertEqual(len(ids), len(set(ids)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -6,6 +6,9 @@ This module provides XMLEditor, a tool for manipulating XML files with support f
 line-number-based node finding and DOM manipulation. Each element is automatically
 annotated with its original line and column position during parsing.
 
+LxmlXMLEditor offers the same API on top of lxml.etree, which is much faster and
+lighter on memory for large parts. It returns lxml elements instead of minidom nodes.
+
 Example usage:
     editor = XMLEditor("document.xml")
 
@@ -22,6 +25,18 @@ Example usage:
     # Combine filters
     elem = editor.get_node(tag="w:p", line_number=range(1, 50), contains="text")
 
+    # Lines as they are after edits (what save() would write)
+    print(editor.render_lines(range(500, 540)))
+    elem = editor.get_node(tag="w:p", line_number=512, current_lines=True)
+
+    # Find every match of a CSS-like selector, in document order
+    paras = editor.query("w:tc > w:p")
+    insertions = editor.query('w:ins[w:author="John Doe"]')
+
+    # Read-only: stream elements without parsing the file into a DOM
+    for record in XMLEditor.scan("document.xml", "w:ins", contains="text"):
+        print(record.line, record.attributes["w:author"], record.text)
+
     # Replace, insert, or manipulate
     new_elem = editor.replace_node(elem, "<w:r><w:t>new text</w:t></w:r>")
     editor.insert_after(new_elem, "<w:r><w:t>more</w:t></w:r>")
@@ -30,12 +45,39 @@ Example usage:
     editor.save()
 """
 
+import bisect
+import contextlib
+import copy
+import functools
+import hashlib
 import html
+import io
+import os
+import re
+import shutil
+import tempfile
+import xml.sax.handler
 from pathlib import Path
-from typing import Optional, Union
+from typing import NamedTuple, Optional, Union
 
 import defusedxml.minidom
 import defusedxml.sax
+import lxml.etree
+
+_XML_NAMESPACE = "http://www.w3.org/XML/1998/namespace"
+
+
+class NodeRecord(NamedTuple):
+    """An element reported by XMLEditor.scan."""
+
+    # Qualified tag name (e.g., "w:p")
+    tag: str
+    # Attribute values by qualified name (e.g., {"w:id": "1"})
+    attributes: dict
+    # Line the element starts on, as matched by get_node(line_number=...)
+    line: int
+    # Non-whitespace text nodes within the element, as matched by contains=
+    text: str
 
 
 class XMLEditor:
@@ -46,10 +88,27 @@ class XMLEditor:
     of each element. This enables finding nodes by their line number in the original
     file, which is useful when working with Read tool output.
 
+    Lookups go through an element index that is built on first use and kept
+    current by the editing methods (replace_node, insert_*, append_to). Text
+    used by contains= lookups is memoized per element; those methods drop only
+    the cached text of the edited element's ancestors. Attributes set
+    directly on nodes are picked up after mark_modified().
+
+    checkpoint() and rollback() undo edits in memory: after a checkpoint, each
+    top-level element (a child of the root or of w:body) is copied just before
+    the first edit below it, and rollback() puts the copies back.
+
+    Parse positions never change. The lines elements are on after edits (what
+    save() would write) come from current_line(), render_lines() and
+    get_node(..., current_lines=True), backed by a line map that only
+    recounts the top-level elements edited since it was last used.
+
     Attributes:
         xml_path: Path to the XML file being edited
         encoding: Detected encoding of the XML file ('ascii' or 'utf-8')
         dom: Parsed DOM tree with parse_position attributes on elements
+        modified: Whether an editing method changed the tree since it was loaded
+            or last saved
     """
 
     def __init__(self, xml_path):
@@ -71,7 +130,54 @@ class XMLEditor:
         self.encoding = "ascii" if 'encoding="ascii"' in header else "utf-8"
 
         parser = _create_line_tracking_parser()
-        self.dom = defusedxml.minidom.parse(str(self.xml_path), parser)
+        self._dom = defusedxml.minidom.parse(str(self.xml_path), parser)
+
+        # Set by the editing methods; save() only writes modified files, or
+        # files whose tree or nodes were handed out for direct edits and whose
+        # bytes changed (_digest: SHA-256 of the file, read when first needed)
+        self.modified = False
+        self._handed_out = False
+        self._digest = None
+
+        # Lookup tables for get_node, built on first use
+        self._index = None
+        self._text_cache = _TextCache()
+
+        # Parsed insert fragments and the root's xmlns declarations
+        self._fragments = _FragmentCache()
+        self._ns_decl = None
+
+        # Saved state for rollback(), set by checkpoint()
+        self._checkpoint = None
+
+        # Current line numbers, built on first use
+        self._line_map = None
+
+        self._rids = IdAllocator(
+            lambda: (
+                elem.getAttribute("Id")
+                for elem in self._dom.getElementsByTagName("Relationship")
+            ),
+            prefix="rId",
+            start=1,
+        )
+
+    @property
+    def dom(self):
+        """The parsed DOM tree; save() writes the file once it was handed out."""
+        self._handed_out = True
+        return self._dom
+
+    @property
+    def root(self):
+        """The root element; save() writes the file once it was handed out."""
+        self._handed_out = True
+        return self._dom.documentElement
+
+    @property
+    def _root(self):
+        """The root element, without marking the tree as handed out."""
+        return self._dom.documentElement
 
     def get_node(
         self,
@@ -79,6 +185,7 @@ class XMLEditor:
         attrs: Optional[dict[str, str]] = None,
         line_number: Optional[Union[int, range]] = None,
         contains: Optional[str] = None,
+        current_lines: bool = False,
     ):
         """
         Get a DOM element by tag and identifier.
@@ -92,6 +199,8 @@ class XMLEditor:
             line_number: Line number (int) or line range (range) in original XML file (1-indexed)
             contains: Text string that must appear in any text node within the element.
                       Supports both entity notation (&#8220;) and Unicode characters (\u201c).
+            current_lines: Match line_number against the lines as they are after
+                      edits (see render_lines) instead of the original file
 
         Returns:
             defusedxml.minidom.Element: The matching DOM element
@@ -108,9 +217,272 @@ class XMLEditor:
             elem = editor.get_node(tag="w:p", contains="specific text")
             elem = editor.get_node(tag="w:t", contains="&#8220;Agreement")  # Entity notation
             elem = editor.get_node(tag="w:t", contains="\u201cAgreement")   # Unicode character
+            elem = editor.get_node(tag="w:p", line_number=530, current_lines=True)
+        """
+        self._handed_out = True
+        return self._get_node(tag, attrs, line_number, contains, current_lines)
+
+    def _get_node(
+        self, tag, attrs=None, line_number=None, contains=None, current_lines=False
+    ):
+        """Find the element get_node returns, without marking the tree as handed out."""
+        index_built = self._index is not None
+        text_cached = contains is not None and bool(self._text_cache.texts)
+        matches = self._find_matches(tag, attrs, line_number, contains, current_lines)
+
+        # Elements added or changed through direct DOM manipulation are not
+        # tracked by the index or the text cache, so refresh them before
+        # reporting an error or returning a match found by stale text (such
+        # elements have no parse position, so line lookups can keep the index)
+        rebuild_index = not matches and index_built and line_number is None
+        clear_text = text_cached and (
+            len(matches) != 1
+            or html.unescape(contains)
+            not in self._collect_text(matches[0], use_cache=False)
+        )
+        if rebuild_index or clear_text:
+            if rebuild_index:
+                self._index = None
+            if clear_text:
+                self._text_cache.clear()
+            else:
+                self._text_cache.clear_tables()
+            matches = self._find_matches(
+                tag, attrs, line_number, contains, current_lines
+            )
+
+        return _select_single_match(matches, tag, attrs, line_number, contains)
+
+    @staticmethod
+    def scan(
+        source,
+        tag: str = "*",
+        attrs: Optional[dict[str, str]] = None,
+        contains: Optional[str] = None,
+    ):
+        """
+        Stream the elements of an XML file as NodeRecords without building a DOM.
+
+        For jobs that only read a part: the file is fed to an expat SAX parser
+        in chunks and no tree is built, so memory stays flat however large the
+        part is. Text is only gathered inside matching elements (scanning "*"
+        therefore keeps the text of the whole part, as the root matches).
+        Filters work as in get_node. An element is reported when it ends, so
+        a match nested in another match comes before it.
+
+        Args:
+            source: Path of the XML file, or a binary file object (e.g. a zip entry)
+            tag: The XML tag name (e.g., "w:p"), or "*" for any element
+            attrs: Dictionary of attribute name-value pairs to match
+            contains: Text that must appear in the element's text (entities allowed)
+
+        Yields:
+            NodeRecord: tag, attributes, line and text of each matching element
+
+        Example:
+            with zipfile.ZipFile("document.docx") as package:
+                with package.open("word/document.xml") as part:
+                    insertions = list(XMLEditor.scan(part, "w:ins"))
+            authors = {record.attributes.get("w:author") for record in insertions}
+        """
+        if contains is not None:
+            contains = html.unescape(contains)
+        handler = _ScanHandler(tag, attrs, contains)
+        parser = defusedxml.sax.make_parser()
+        parser.setContentHandler(handler)
+        # parse() would set this, feed() does not; the reader is its own locator
+        handler.setDocumentLocator(parser)
+
+        if isinstance(source, (str, os.PathLike)):
+            opened = open(source, "rb")
+        else:
+            # Left open for the caller
+            opened = contextlib.nullcontext(source)
+        with opened as stream:
+            while chunk := stream.read(_SCAN_CHUNK_SIZE):
+                parser.feed(chunk)
+                yield from handler.records
+                handler.records.clear()
+            parser.close()
+        yield from handler.records
+
+    def get_nodes(self, tag: str, attrs: Optional[dict[str, str]] = None, parent=None):
         """
+        Get all DOM elements with a tag, in document order.
+
+        Args:
+            tag: The XML tag name (e.g., "w:p"), or "*" for any element
+            attrs: Dictionary of attribute name-value pairs to match
+            parent: Only search descendants of this element (default: whole document)
+
+        Returns:
+            list: Matching elements (empty if none)
+
+        Example:
+            rels = editor.get_nodes("Relationship", attrs={"Target": "people.xml"})
+        """
+        self._handed_out = True
+        return self._get_nodes(tag, attrs, parent)
+
+    def _get_nodes(self, tag, attrs=None, parent=None):
+        """Collect what get_nodes returns, without marking the tree as handed out."""
+        scope = parent if parent is not None else self._dom
+        return [
+            elem
+            for elem in scope.getElementsByTagName(tag)
+            if attrs is None
+            or all(elem.getAttribute(name) == value for name, value in attrs.items())
+        ]
+
+    def query(self, selector: str, parent=None):
+        """
+        Get all DOM elements matching a CSS-like selector, in document order.
+
+        Selectors combine tags (or "*") and attribute tests with descendant
+        (space) and child (>) combinators. Selectors are parsed once and cached;
+        an attribute value test takes its candidates from the element index.
+        XPath needs the lxml engine (LxmlXMLEditor.query).
+
+        Args:
+            selector: Selector such as "w:tbl w:p", "w:tc > w:p[w14:paraId]"
+                      or 'w:ins[w:author="John Doe"]'
+            parent: Only search descendants of this element (default: whole document)
+
+        Returns:
+            list: Matching elements (empty if none)
+
+        Raises:
+            ValueError: If the selector is invalid or is an XPath expression
+
+        Example:
+            paras = editor.query("w:body > w:p")
+            runs = editor.query('w:del[w:author="John Doe"] w:r', parent=para)
+        """
+        self._handed_out = True
+        if _is_xpath(selector):
+            raise ValueError(
+                f"XPath selectors require the lxml engine: {selector!r}. "
+                f"Use a CSS-like selector or Document(..., engine='lxml')."
+            )
+        steps = _parse_selector(selector)
+
+        index_built = self._index is not None
+        matches = self._query_steps(steps, parent)
+        if not matches and index_built and parent is None:
+            # Elements added through direct DOM manipulation are not indexed
+            self._index = None
+            self._text_cache.clear_tables()
+            matches = self._query_steps(steps, parent)
+        return matches
+
+    def tag_name(self, elem):
+        """Return the qualified tag name of an element (e.g., "w:p")."""
+        return elem.tagName
+
+    def get_parent(self, elem):
+        """Return the parent element of an element."""
+        return elem.parentNode
+
+    def get_attribute(self, elem, name):
+        """Return an attribute value by qualified name, or "" if it is not set."""
+        return elem.getAttribute(name)
+
+    def is_attached(self, elem):
+        """Check whether an element is still part of this editor's document."""
+        node = elem.parentNode
+        while node is not None:
+            if node is self._dom:
+                return True
+            node = node.parentNode
+        return False
+
+    def current_line(self, elem):
+        """
+        Return the line an element starts on in the file save() would write now.
+
+        Unlike parse_position, this follows every edit made through the
+        editing methods. After editing nodes directly, call mark_modified().
+
+        Raises:
+            ValueError: If elem is not part of the document
+        """
+        return self._get_line_map().line_of(elem)
+
+    def render_lines(self, line_number: Optional[Union[int, range]] = None):
+        """
+        Return the current XML with line numbers, as save() would write it.
+
+        Only the top-level elements on the requested lines are serialized, so
+        edited regions can be re-read without saving and reparsing the file.
+        The numbers are the ones get_node(..., current_lines=True) matches.
+
+        Args:
+            line_number: Line number (int) or line range (range) to render
+                (default: the whole file)
+
+        Returns:
+            str: One "<number>\\t<text>" line per XML line
+
+        Example:
+            print(editor.render_lines(range(100, 140)))
+        """
+        first_line, pieces = self._get_line_map().pieces(line_number)
+        writer = io.StringIO()
+        for kind, node in pieces:
+            if kind == "head":
+                writer.write(_xml_declaration(self.encoding))
+                for child in self._dom.childNodes:
+                    if child is self._dom.documentElement:
+                        break
+                    child.writexml(writer, "", "", "")
+            elif kind == "start":
+                # Attributes only: the start tag of an empty copy
+                writer.write(node.cloneNode(False).toxml()[:-2] + ">")
+            elif kind == "end":
+                writer.write(f"</{node.tagName}>")
+            else:
+                node.writexml(writer, "", "", "")
+        text = writer.getvalue().encode(self.encoding, "xmlcharrefreplace")
+        return _number_lines(text.decode(self.encoding), first_line, line_number)
+
+    def _find_matches(self, tag, attrs, line_number, contains, current_lines=False):
+        """
+        Collect all elements with the given tag that pass the get_node filters.
+
+        Candidates come from the element index; every filter is re-checked on
+        each candidate so entries made stale by later edits are discarded.
+        A contains-only lookup scans the tag's flat text table instead, and a
+        current_lines lookup takes the elements on those lines from the line map.
+
+        Returns:
+            list: Matching elements (unordered)
+        """
+        if contains is not None:
+            # Normalize the search string: convert HTML entities to Unicode characters
+            # This allows searching for both "&#8220;Rowan" and ""Rowan"
+            contains = html.unescape(contains)
+
+        if contains is not None and attrs is None and line_number is None:
+            return [
+                elem
+                for elem in self._text_cache.search(
+                    tag,
+                    lambda: self._get_index().candidates(tag),
+                    contains,
+                    self._get_element_text,
+                )
+                if self.is_attached(elem)
+            ]
+
+        if current_lines and line_number is not None:
+            candidates = self._get_line_map().elements(tag, line_number)
+            # Those are on the requested lines by construction
+            line_number = None
+        else:
+            candidates = self._get_index().candidates(tag, attrs, line_number)
+
         matches = []
-        for elem in self.dom.getElementsByTagName(tag):
+        for elem in candidates:
             # Check line_number filter
             if line_number is not None:
                 parse_pos = getattr(elem, "parse_position", (None,))
@@ -132,53 +504,137 @@ class XMLEditor:
                 ):
                     continue
 
+            # Checked after the cheap filters, as it walks up to the root
+            if not self.is_attached(elem):
+                continue
+
             # Check contains filter
             if contains is not None:
-                elem_text = self._get_element_text(elem)
-                # Normalize the search string: convert HTML entities to Unicode characters
-                # This allows searching for both "&#8220;Rowan" and ""Rowan"
-                normalized_contains = html.unescape(contains)
-                if normalized_contains not in elem_text:
+                if contains not in self._get_element_text(elem):
                     continue
 
             # If all applicable filters passed, this is a match
             matches.append(elem)
 
-        if not matches:
-            # Build descriptive error message
-            filters = []
-            if line_number is not None:
-                line_str = (
-                    f"lines {line_number.start}-{line_number.stop - 1}"
-                    if isinstance(line_number, range)
-                    else f"line {line_number}"
-                )
-                filters.append(f"at {line_str}")
-            if attrs is not None:
-                filters.append(f"with attributes {attrs}")
-            if contains is not None:
-                filters.append(f"containing '{contains}'")
-
-            filter_desc = " ".join(filters) if filters else ""
-            base_msg = f"Node not found: <{tag}> {filter_desc}".strip()
-
-            # Add helpful hint based on filters used
-            if contains:
-                hint = "Text may be split across elements or use different wording."
-            elif line_number:
-                hint = "Line numbers may have changed if document was modified."
-            elif attrs:
-                hint = "Verify attribute values are correct."
-            else:
-                hint = "Try adding filters (attrs, line_number, or contains)."
+        return matches
+
+    def _query_steps(self, steps, parent):
+        """Evaluate a parsed selector (see _parse_selector) under parent."""
+        _, tag, attr_tests = steps[-1]
+        boundary = parent if parent is not None else self._dom
+        values = {name: value for name, value in attr_tests if value is not None}
+
+        if values and tag != "*" and parent is None:
+            candidates = [
+                elem
+                for elem in self._get_index().candidates(tag, values)
+                if self.is_attached(elem)
+            ]
+            ordered = False
+        else:
+            candidates = boundary.getElementsByTagName(tag)
+            ordered = True
+
+        matches = [
+            elem
+            for elem in candidates
+            if _matches_compound(elem, tag, attr_tests)
+            and _matches_ancestors(elem, steps, len(steps) - 1, boundary)
+        ]
+        return matches if ordered else self._in_document_order(matches)
+
+    def _in_document_order(self, elements):
+        """Sort elements into document order."""
+        if all(hasattr(elem, "parse_position") for elem in elements):
+            return sorted(elements, key=lambda elem: elem.parse_position)
+        # Inserted elements have no parse position, so walk the tree instead
+        wanted = set(elements)
+        return [elem for elem in _iter_elements(self._dom) if elem in wanted]
+
+    def _get_index(self):
+        """Return the element index, building it from the DOM on first use."""
+        if self._index is None:
+            self._index = _ElementIndex(self._dom)
+        return self._index
+
+    def _get_line_map(self):
+        """Return the current line map, creating it on first use."""
+        if self._line_map is None:
+            self._line_map = _LineMap(self)
+        return self._line_map
+
+    def _container(self):
+        """Return w:body, or the root in parts without one."""
+        root = self._dom.documentElement
+        return next(
+            (child for child in root.childNodes if child.localName == "body"), root
+        )
+
+    def _line_pieces(self):
+        """
+        Yield the pieces of the serialized part for the line map, in order.
 
-            raise ValueError(f"{base_msg}. {hint}")
-        if len(matches) > 1:
-            raise ValueError(
-                f"Multiple nodes found: <{tag}>. "
-                f"Add more filters (attrs, line_number, or contains) to narrow the search."
-            )
-        return matches[0]
+        Each piece is (kind, node, line breaks). Kinds are "head" (the XML
+        declaration and anything before the root), "start" and "end" (tags of
+        the root and w:body), "block" (a top-level element, whose line breaks
+        the line map counts and caches) and "node" (any other child).
+        """
+        root = self._dom.documentElement
+        container = self._container()
+        position = self._dom.childNodes.index(root)
+        prolog = self._dom.childNodes[:position]
+        # The root follows the declaration on the same line, as in toxml()
+        yield "head", None, sum(_minidom_line_breaks(node) for node in prolog)
+        yield "start", root, _minidom_own_line_breaks(root)
+
+        def children(parent):
+            for child in parent.childNodes:
+                if child is container and container is not root:
+                    yield "start", child, _minidom_own_line_breaks(child)
+                    yield from children(child)
+                    yield "end", child, 0
+                elif child.nodeType == child.ELEMENT_NODE:
+                    yield "block", child, 0
+                else:
+                    yield "node", child, _minidom_line_breaks(child)
+
+        yield from children(root)
+        yield "end", root, 0
+        for node in self._dom.childNodes[position + 1 :]:
+            yield "node", node, _minidom_line_breaks(node)
+
+    def _count_line_breaks(self, block):
+        """Count the line breaks in the serialization of a top-level element."""
+        return _minidom_line_breaks(block)
+
+    def _block_lines(self, block, line):
+        """Yield (element, line) for a top-level element starting on line and its descendants."""
+        stack = [block]
+        while stack:
+            node = stack.pop()
+            if node.nodeType == node.ELEMENT_NODE:
+                yield node, line
+                stack.extend(reversed(node.childNodes))
+            line += _minidom_own_line_breaks(node)
+
+    def _index_nodes(self, nodes):
+        """Record newly inserted (or re-attributed) nodes in the element index."""
+        if self._index is not None:
+            for node in nodes:
+                self._index.add(node)
+
+    def _unindex_node(self, node):
+        """Drop a removed node and its descendants from the element index."""
+        if self._index is not None:
+            self._index.remove(node)
+
+    def _invalidate_text(self, node):
+        """Drop the cached text of an edited element and all of its ancestors."""
+        ancestors = []
+        while node is not None and node is not self._dom:
+            ancestors.append(node)
+            node = node.parentNode
+        self._text_cache.invalidate(ancestors)
 
     def _get_element_text(self, elem):
         """
@@ -186,6 +642,7 @@ class XMLEditor:
 
         Skips text nodes that contain only whitespace (spaces, tabs, newlines),
         which typically represent XML formatting rather than document content.
+        The result is memoized until an edit beneath the element invalidates it.
 
         Args:
             elem: defusedxml.minidom.Element to extract text from
@@ -193,6 +650,13 @@ class XMLEditor:
         Returns:
             str: Concatenated text from all non-whitespace text nodes within the element
         """
+        text = self._text_cache.texts.get(elem)
+        if text is None:
+            text = self._text_cache.texts[elem] = self._collect_text(elem)
+        return text
+
+    def _collect_text(self, elem, use_cache=True):
+        """Build an element's text, reusing cached text of descendants if use_cache."""
         text_parts = []
         for node in elem.childNodes:
             if node.nodeType == node.TEXT_NODE:
@@ -200,16 +664,20 @@ class XMLEditor:
                 if node.data.strip():
                     text_parts.append(node.data)
             elif node.nodeType == node.ELEMENT_NODE:
-                text_parts.append(self._get_element_text(node))
+                text = self._text_cache.texts.get(node) if use_cache else None
+                text_parts.append(
+                    text if text is not None else self._collect_text(node, use_cache)
+                )
         return "".join(text_parts)
 
-    def replace_node(self, elem, new_content):
+    def replace_node(self, elem, new_content, fields=None):
         """
         Replace a DOM element with new XML content.
 
         Args:
             elem: defusedxml.minidom.Element to replace
             new_content: String containing XML to replace the node with
+            fields: Values for {name} placeholders in new_content (see _parse_fragment)
 
         Returns:
             List[defusedxml.minidom.Node]: All inserted nodes
@@ -218,19 +686,25 @@ class XMLEditor:
             new_nodes = editor.replace_node(old_elem, "<w:r><w:t>text</w:t></w:r>")
         """
         parent = elem.parentNode
-        nodes = self._parse_fragment(new_content)
+        nodes = self._parse_fragment(new_content, fields)
+        self.record_change(parent)
         for node in nodes:
             parent.insertBefore(node, elem)
         parent.removeChild(elem)
+        self._unindex_node(elem)
+        self._index_nodes(nodes)
+        self._invalidate_text(parent)
+        self.modified = True
         return nodes
 
-    def insert_after(self, elem, xml_content):
+    def insert_after(self, elem, xml_content, fields=None):
         """
         Insert XML content after a DOM element.
 
         Args:
             elem: defusedxml.minidom.Element to insert after
             xml_content: String containing XML to insert
+            fields: Values for {name} placeholders in xml_content (see _parse_fragment)
 
         Returns:
             List[defusedxml.minidom.Node]: All inserted nodes
@@ -240,21 +714,26 @@ class XMLEditor:
         """
         parent = elem.parentNode
         next_sibling = elem.nextSibling
-        nodes = self._parse_fragment(xml_content)
+        nodes = self._parse_fragment(xml_content, fields)
+        self.record_change(parent)
         for node in nodes:
             if next_sibling:
                 parent.insertBefore(node, next_sibling)
             else:
                 parent.appendChild(node)
+        self._index_nodes(nodes)
+        self._invalidate_text(parent)
+        self.modified = True
         return nodes
 
-    def insert_before(self, elem, xml_content):
+    def insert_before(self, elem, xml_content, fields=None):
         """
         Insert XML content before a DOM element.
 
         Args:
             elem: defusedxml.minidom.Element to insert before
             xml_content: String containing XML to insert
+            fields: Values for {name} placeholders in xml_content (see _parse_fragment)
 
         Returns:
             List[defusedxml.minidom.Node]: All inserted nodes
@@ -263,18 +742,23 @@ class XMLEditor:
             new_nodes = editor.insert_before(elem, "<w:r><w:t>text</w:t></w:r>")
         """
         parent = elem.parentNode
-        nodes = self._parse_fragment(xml_content)
+        nodes = self._parse_fragment(xml_content, fields)
+        self.record_change(parent)
         for node in nodes:
             parent.insertBefore(node, elem)
+        self._index_nodes(nodes)
+        self._invalidate_text(parent)
+        self.modified = True
         return nodes
 
-    def append_to(self, elem, xml_content):
+    def append_to(self, elem, xml_content, fields=None):
         """
         Append XML content as a child of a DOM element.
 
         Args:
             elem: defusedxml.minidom.Element to append to
             xml_content: String containing XML to append
+            fields: Values for {name} placeholders in xml_content (see _parse_fragment)
 
         Returns:
             List[defusedxml.minidom.Node]: All inserted nodes
@@ -282,39 +766,212 @@ class XMLEditor:
         Example:
             new_nodes = editor.append_to(elem, "<w:r><w:t>text</w:t></w:r>")
         """
-        nodes = self._parse_fragment(xml_content)
+        nodes = self._parse_fragment(xml_content, fields)
+        self.record_change(elem)
         for node in nodes:
             elem.appendChild(node)
+        self._index_nodes(nodes)
+        self._invalidate_text(elem)
+        self.modified = True
         return nodes
 
     def get_next_rid(self):
-        """Get the next available rId for relationships files."""
-        max_id = 0
-        for rel_elem in self.dom.getElementsByTagName("Relationship"):
-            rel_id = rel_elem.getAttribute("Id")
-            if rel_id.startswith("rId"):
-                try:
-                    max_id = max(max_id, int(rel_id[3:]))
-                except ValueError:
-                    pass
-        return f"rId{max_id + 1}"
+        """
+        Get the next available rId for relationships files.
+
+        The rId counter is seeded from the existing relationships on first use;
+        after that each call only checks (through the element index) whether
+        the candidate was taken by an insert since the last call.
+        """
+        while True:
+            rel_id = f"rId{self._rids.peek()}"
+            taken = any(
+                self.is_attached(elem)
+                for elem in self._get_index().candidates(
+                    "Relationship", {"Id": rel_id}
+                )
+            )
+            if not taken:
+                return rel_id
+            self._rids.allocate()
+
+    def mark_modified(self, *nodes):
+        """
+        Flag the file as changed after editing nodes directly, so save() writes it.
+
+        Lookups only see attributes set directly once they are reported here.
+
+        Args:
+            *nodes: The edited elements, e.g. those whose attributes were set;
+                only these are re-indexed. Without nodes, the attribute tables
+                are rebuilt on next use.
+        """
+        self.modified = True
+        # Direct edits are not recorded, so recount every line
+        self._line_map = None
+        if nodes:
+            self._index_nodes(nodes)
+            for node in nodes:
+                self._invalidate_text(node)
+        elif self._index is not None:
+            self._index.clear_attributes()
+
+    def checkpoint(self):
+        """
+        Remember the current tree so that rollback() can return to it.
+
+        Nothing is copied up front: only the child lists of the root and of
+        w:body are saved, and a top-level element is copied the first time an
+        editing method changes something below it. A new checkpoint replaces
+        the previous one.
+
+        Direct DOM edits are not recorded; call record_change(node) before
+        changing node directly if rollback() should undo the change.
+        """
+        root = self._dom.documentElement
+        container = self._container()
+        parents = [root] if container is root else [root, container]
+        self._checkpoint = _Checkpoint(
+            root,
+            container,
+            {parent: list(parent.childNodes) for parent in parents},
+            [child for parent in parents for child in parent.childNodes],
+            dict(root.attributes.items()),
+            self._checkpoint_state(),
+        )
+
+    def record_change(self, node):
+        """
+        Note that node is about to be edited.
+
+        Copies the top-level element holding node for rollback() (after
+        checkpoint()) and marks its line breaks for recounting. The editing
+        methods call this; call it before changing a node directly.
+        """
+        if self._checkpoint is not None:
+            self._checkpoint.record(
+                node, lambda node: node.parentNode, _clone_minidom_node
+            )
+        if self._line_map is not None:
+            self._line_map.touch(node)
+
+    def rollback(self):
+        """
+        Undo every edit made since checkpoint().
+
+        The copies of the edited top-level elements replace the edited ones,
+        so nodes obtained from them before the rollback are detached from the
+        tree; look them up again. The checkpoint stays active, so a failed
+        step can be rolled back and retried any number of times.
+
+        Raises:
+            ValueError: If checkpoint() was never called
+        """
+        checkpoint = self._checkpoint
+        if checkpoint is None:
+            raise ValueError("No checkpoint to roll back to")
+
+        for parent, children in checkpoint.children.items():
+            for child in parent.childNodes:
+                child.parentNode = child.previousSibling = child.nextSibling = None
+            del parent.childNodes[:]
+            for child in children:
+                parent.appendChild(checkpoint.copies.get(child, child))
+
+        root = checkpoint.root
+        for name in list(root.attributes.keys()):
+            if name not in checkpoint.attributes:
+                root.removeAttribute(name)
+        for name, value in checkpoint.attributes.items():
+            if root.getAttribute(name) != value:
+                root.setAttribute(name, value)
+
+        for name, value in checkpoint.state.items():
+            setattr(self, name, value)
+        self._index = None
+        self._text_cache.clear()
+        self._ns_decl = None
+        self._line_map = None
+        # If saved since the checkpoint, the file on disk holds the undone edits
+        self.modified = self.modified or checkpoint.changed
+        self.checkpoint()
+
+    def _checkpoint_state(self):
+        """Return copies of the attributes rollback() restores besides the tree."""
+        return {"_rids": copy.copy(self._rids)}
 
     def save(self):
         """
-        Save the edited XML back to the file.
+        Save the edited XML back to the file if it was modified.
 
         Serializes the DOM tree and writes it back to the original file path,
-        preserving the original encoding (ascii or utf-8).
+        preserving the original encoding (ascii or utf-8). The file is replaced
+        atomically. Nothing is written unless an editing method (or
+        mark_modified) changed the tree since it was loaded or last saved.
+        Once nodes were handed out (dom, root, get_node, get_nodes, query),
+        they may have been edited directly, so the tree is serialized and
+        the file only replaced if its bytes differ.
+
+        Returns:
+            bool: True if the file was written
         """
-        content = self.dom.toxml(encoding=self.encoding)
-        self.xml_path.write_bytes(content)
+        if self.modified:
+            _write_atomic(self.xml_path, self.write)
+            written, self._digest = True, None
+        elif self._handed_out:
+            # The nodes may have been edited directly: only the bytes tell
+            written, self._digest = _replace_if_changed(
+                self.xml_path, self.write, self._digest
+            )
+        else:
+            return False
+        self.modified = False
+        return written
 
-    def _parse_fragment(self, xml_content):
+    def write(self, stream):
+        """
+        Serialize the DOM tree to a binary stream, in chunks.
+
+        Writes the same bytes as dom.toxml(encoding=self.encoding), where
+        characters the encoding cannot represent become character references.
+        The whole serialized document is never held in memory. The stream may
+        be a file or a zip entry, and is left open.
+
+        Args:
+            stream: Writable binary file object
+
+        Example:
+            with zipfile.ZipFile("out.docx", "a") as package:
+                with package.open("word/document.xml", "w") as entry:
+                    editor.write(entry)
+        """
+        # The same writer toxml() uses, on the stream instead of a BytesIO
+        writer = io.TextIOWrapper(
+            stream, encoding=self.encoding, errors="xmlcharrefreplace", newline="\n"
+        )
+        try:
+            writer.write(_xml_declaration(self.encoding))
+            for node in self._dom.childNodes:
+                node.writexml(writer, "", "", "")
+            writer.flush()
+        finally:
+            writer.detach()
+
+    def _parse_fragment(self, xml_content, fields=None):
         """
         Parse XML fragment and return list of imported nodes.
 
+        Parsed fragments are cached by their source text, so inserting the same
+        fragment again only clones the cached nodes. To reuse one template for
+        varying content, write {name} placeholders in attribute values and text
+        and pass the values in fields; they are filled in after cloning, as
+        plain (unescaped) strings. A list of dicts inserts one copy of the
+        template per dict, in order, as a single edit.
+
         Args:
-            xml_content: String containing XML fragment
+            xml_content: String containing XML fragment (or template)
+            fields: Optional dict of values for {name} placeholders, or a list
+                of such dicts
 
         Returns:
             List of defusedxml.minidom.Node objects imported into this document
@@ -322,26 +979,1573 @@ class XMLEditor:
         Raises:
             AssertionError: If fragment contains no element nodes
         """
-        # Extract namespace declarations from the root document element
-        root_elem = self.dom.documentElement
-        namespaces = []
-        if root_elem and root_elem.attributes:
-            for i in range(root_elem.attributes.length):
-                attr = root_elem.attributes.item(i)
-                if attr.name.startswith("xmlns"):  # type: ignore
-                    namespaces.append(f'{attr.name}="{attr.value}"')  # type: ignore
-
-        ns_decl = " ".join(namespaces)
-        wrapper = f"<root {ns_decl}>{xml_content}</root>"
-        fragment_doc = defusedxml.minidom.parseString(wrapper)
-        nodes = [
-            self.dom.importNode(child, deep=True)
-            for child in fragment_doc.documentElement.childNodes  # type: ignore
-        ]
-        elements = [n for n in nodes if n.nodeType == n.ELEMENT_NODE]
-        assert elements, "Fragment must contain at least one element"
+        ns_decl = self._namespace_declarations()
+        fragment_doc = self._fragments.get(
+            (ns_decl, xml_content),
+            lambda: _parse_minidom_fragment(ns_decl, xml_content),
+        )
+        nodes = []
+        for copy_fields in fields if isinstance(fields, list) else [fields]:
+            copies = [
+                self._dom.importNode(child, deep=True)
+                for child in fragment_doc.documentElement.childNodes  # type: ignore
+            ]
+            if copy_fields:
+                _fill_minidom_fields(copies, copy_fields)
+            nodes.extend(copies)
         return nodes
 
+    def _namespace_declarations(self):
+        """Return the root element's xmlns declarations as an attribute string (cached)."""
+        if self._ns_decl is None:
+            root_elem = self._dom.documentElement
+            namespaces = []
+            if root_elem and root_elem.attributes:
+                for i in range(root_elem.attributes.length):
+                    attr = root_elem.attributes.item(i)
+                    if attr.name.startswith("xmlns"):  # type: ignore
+                        namespaces.append(f'{attr.name}="{attr.value}"')  # type: ignore
+            self._ns_decl = " ".join(namespaces)
+        return self._ns_decl
+
+
+class LxmlXMLEditor:
+    """
+    Editor with the XMLEditor API, backed by lxml.etree instead of minidom.
+
+    lxml keeps the tree in C structures, so large parts such as word/document.xml
+    parse, serialize and search much faster and use far less memory than the
+    minidom DOM. Line numbers come from lxml's native sourceline, so no parser
+    patching is needed.
+
+    Methods take and return lxml elements. Tags and attributes are still
+    addressed by their prefixed names (e.g., "w:p", "w:id"), resolved against
+    the namespace declarations in the file.
+
+    Attributes:
+        xml_path: Path to the XML file being edited
+        encoding: Detected encoding of the XML file ('ascii' or 'utf-8')
+        tree: Parsed lxml.etree.ElementTree
+        modified: Whether the tree changed since it was loaded or last saved
+    """
+
+    def __init__(self, xml_path):
+        """
+        Initialize with path to XML file and parse it with lxml.
+
+        Args:
+            xml_path: Path to XML file to edit (str or Path)
+
+        Raises:
+            ValueError: If the XML file does not exist
+        """
+        self.xml_path = Path(xml_path)
+        if not self.xml_path.exists():
+            raise ValueError(f"XML file not found: {xml_path}")
+
+        with open(self.xml_path, "rb") as f:
+            header = f.read(200).decode("utf-8", errors="ignore")
+        self.encoding = "ascii" if 'encoding="ascii"' in header else "utf-8"
+
+        self._tree = lxml.etree.parse(str(self.xml_path), _create_lxml_parser())
+        self.modified = False
+        self._handed_out = False
+        self._digest = None
+
+        # Prefix -> namespace URI, extended lazily with declarations below the root
+        self._namespaces = {
+            prefix: uri for prefix, uri in self._root.nsmap.items() if prefix
+        }
+        self._namespaces_complete = False
+        self._xpath_cache = {}
+        self._text_cache = _TextCache()
+        self._fragments = _FragmentCache()
+        self._ns_decl = None
+        self._checkpoint = None
+        self._line_map = None
+        self._rids = IdAllocator(
+            lambda: (
+                elem.get("Id", "") for elem in self._get_nodes("Relationship")
+            ),
+            prefix="rId",
+            start=1,
+        )
+
+    @property
+    def tree(self):
+        """The parsed ElementTree; save() writes the file once it was handed out."""
+        self._handed_out = True
+        return self._tree
+
+    @property
+    def root(self):
+        """The root element; save() writes the file once it was handed out."""
+        self._handed_out = True
+        return self._root
+
+    @property
+    def _root(self):
+        """The root element, without marking the tree as handed out."""
+        return self._tree.getroot()
+
+    # Reads the file, not the tree, so it is the same for both engines
+    scan = staticmethod(XMLEditor.scan)
+
+    def get_node(
+        self,
+        tag: str,
+        attrs: Optional[dict[str, str]] = None,
+        line_number: Optional[Union[int, range]] = None,
+        contains: Optional[str] = None,
+        current_lines: bool = False,
+    ):
+        """
+        Get an element by tag and identifier.
+
+        Takes the same filters as XMLEditor.get_node and raises the same errors.
+        Attribute filtering runs inside a compiled XPath expression; element text
+        for contains= is memoized as in XMLEditor.
+
+        Args:
+            tag: The XML tag name (e.g., "w:del", "w:ins", "w:r")
+            attrs: Dictionary of attribute name-value pairs to match (e.g., {"w:id": "1"})
+            line_number: Line number (int) or line range (range) in original XML file (1-indexed)
+            contains: Text string that must appear in any text node within the element.
+            current_lines: Match line_number against the lines as they are after
+                edits (see render_lines) instead of the original file
+
+        Returns:
+            lxml.etree._Element: The matching element
+
+        Raises:
+            ValueError: If node not found or multiple matches found
+        """
+        self._handed_out = True
+        return self._get_node(tag, attrs, line_number, contains, current_lines)
+
+    def _get_node(
+        self, tag, attrs=None, line_number=None, contains=None, current_lines=False
+    ):
+        """Find the element get_node returns, without marking the tree as handed out."""
+        if contains is not None:
+            contains = html.unescape(contains)
+
+        text_cached = contains is not None and bool(self._text_cache.texts)
+        matches = self._find_matches(tag, attrs, line_number, contains, current_lines)
+        if text_cached and (
+            len(matches) != 1 or contains not in self._collect_text(matches[0])
+        ):
+            # Edits made directly on elements bypass the text cache, so it is
+            # refreshed before reporting an error or returning a stale match
+            self._text_cache.clear()
+            matches = self._find_matches(
+                tag, attrs, line_number, contains, current_lines
+            )
+
+        return _select_single_match(matches, tag, attrs, line_number, contains)
+
+    def _find_matches(self, tag, attrs, line_number, contains, current_lines=False):
+        """Collect all elements that pass the get_node filters, in document order."""
+        if contains is not None and attrs is None and line_number is None:
+            return [
+                elem
+                for elem in self._text_cache.search(
+                    tag, lambda: self._get_nodes(tag), contains, self._get_element_text
+                )
+                if self.is_attached(elem)
+            ]
+
+        if current_lines and line_number is not None:
+            candidates = [
+                elem
+                for elem in self._get_line_map().elements(tag, line_number)
+                if attrs is None
+                or all(
+                    self.get_attribute(elem, name) == value
+                    for name, value in attrs.items()
+                )
+            ]
+            line_number = None
+        else:
+            candidates = self._get_nodes(tag, attrs)
+
+        matches = []
+        for elem in candidates:
+            if line_number is not None:
+                elem_line = elem.sourceline
+                if isinstance(line_number, range):
+                    if elem_line not in line_number:
+                        continue
+                elif elem_line != line_number:
+                    continue
+
+            if contains is not None and contains not in self._get_element_text(elem):
+                continue
+
+            matches.append(elem)
+        return matches
+
+    def get_nodes(self, tag: str, attrs: Optional[dict[str, str]] = None, parent=None):
+        """
+        Get all elements with a tag, in document order.
+
+        Args:
+            tag: The XML tag name (e.g., "w:p"), or "*" for any element
+            attrs: Dictionary of attribute name-value pairs to match
+            parent: Only search descendants of this element (default: whole document)
+
+        Returns:
+            list: Matching elements (empty if none)
+        """
+        self._handed_out = True
+        return self._get_nodes(tag, attrs, parent)
+
+    def _get_nodes(self, tag, attrs=None, parent=None):
+        """Collect what get_nodes returns, without marking the tree as handed out."""
+        attrs = attrs or {}
+        xpath = self._compile_xpath(
+            tag, tuple(attrs), descendants_only=parent is not None
+        )
+        if xpath is None:
+            return []
+        variables = {f"v{i}": value for i, value in enumerate(attrs.values())}
+        return xpath(parent if parent is not None else self._root, **variables)
+
+    def query(self, selector: str, parent=None, **variables):
+        """
+        Get all elements matching a CSS-like selector or XPath, in document order.
+
+        Takes the same CSS-like selectors as XMLEditor.query, which are compiled
+        to XPath. Expressions starting with "/", "." or "(" are evaluated as
+        XPath, with $name variables bound from keyword arguments. Prefixes
+        resolve against the file's namespace declarations, and every expression
+        is compiled once and cached, so matching runs entirely inside lxml.
+
+        Args:
+            selector: CSS-like selector (e.g., "w:tc > w:p") or XPath expression
+            parent: Context element (default: the root element)
+            **variables: Values for $name variables in an XPath expression
+
+        Returns:
+            list: Matching elements (an XPath expression may return other values)
+
+        Raises:
+            ValueError: If the selector or XPath expression is invalid
+
+        Example:
+            paras = editor.query("w:body > w:p")
+            runs = editor.query('w:del[w:author="John Doe"] w:r', parent=para)
+            ids = editor.query("//w:ins[@w:author=$author]/@w:id", author="John Doe")
+        """
+        self._handed_out = True
+        context = parent if parent is not None else self._root
+        if _is_xpath(selector):
+            key = ("xpath", selector)
+            if key not in self._xpath_cache:
+                self._complete_namespaces()
+                try:
+                    self._xpath_cache[key] = lxml.etree.XPath(
+                        selector, namespaces=self._namespaces
+                    )
+                except lxml.etree.XPathSyntaxError as e:
+                    raise ValueError(f"Invalid XPath {selector!r}: {e}") from e
+            try:
+                return self._xpath_cache[key](context, **variables)
+            except lxml.etree.XPathEvalError as e:
+                raise ValueError(f"Cannot evaluate XPath {selector!r}: {e}") from e
+
+        steps = _parse_selector(selector)
+        key = ("css", selector, parent is not None)
+        if key not in self._xpath_cache:
+            self._xpath_cache[key] = self._build_selector_xpath(
+                steps, descendants_only=parent is not None
+            )
+        xpath = self._xpath_cache[key]
+        if xpath is None:
+            return []
+        values = [value for _, _, tests in steps for _, value in tests if value is not None]
+        return xpath(context, **{f"v{i}": value for i, value in enumerate(values)})
+
+    def tag_name(self, elem):
+        """Return the qualified tag name of an element (e.g., "w:p")."""
+        local = lxml.etree.QName(elem).localname
+        return f"{elem.prefix}:{local}" if elem.prefix else local
+
+    def get_parent(self, elem):
+        """Return the parent element of an element."""
+        return elem.getparent()
+
+    def get_attribute(self, elem, name):
+        """Return an attribute value by qualified name, or "" if it is not set."""
+        clark = self._clark(name, attribute=True)
+        return elem.get(clark, "") if clark else ""
+
+    def is_attached(self, elem):
+        """Check whether an element is still part of this editor's document."""
+        # Removed elements keep their owning document, so getroottree() would
+        # still report this tree; walk up to the topmost ancestor instead
+        node = elem
+        parent = node.getparent()
+        while parent is not None:
+            node, parent = parent, parent.getparent()
+        return node is self._root
+
+    def current_line(self, elem):
+        """Return the line an element starts on after edits (see XMLEditor.current_line)."""
+        return self._get_line_map().line_of(elem)
+
+    def render_lines(self, line_number: Optional[Union[int, range]] = None):
+        """
+        Return the current XML with line numbers (see XMLEditor.render_lines).
+
+        lxml serializes the whole part in C faster than the requested elements
+        can be picked out, so this renders everything and keeps the lines asked for.
+        """
+        stream = io.BytesIO()
+        self.write(stream)
+        return _number_lines(
+            stream.getvalue().decode(self.encoding), 1, line_number
+        )
+
+    def replace_node(self, elem, new_content, fields=None):
+        """
+        Replace an element with new XML content.
+
+        Args:
+            elem: lxml element to replace
+            new_content: String containing XML to replace the node with
+            fields: Values for {name} placeholders in new_content (see _parse_fragment)
+
+        Returns:
+            List[lxml.etree._Element]: All inserted elements
+        """
+        parent = elem.getparent()
+        nodes = self._insert(parent, parent.index(elem), new_content, fields)
+        _remove_keeping_tail(elem)
+        return nodes
+
+    def insert_after(self, elem, xml_content, fields=None):
+        """
+        Insert XML content after an element.
+
+        Args:
+            elem: lxml element to insert after
+            xml_content: String containing XML to insert
+            fields: Values for {name} placeholders in xml_content (see _parse_fragment)
+
+        Returns:
+            List[lxml.etree._Element]: All inserted elements
+        """
+        parent = elem.getparent()
+        return self._insert(parent, parent.index(elem) + 1, xml_content, fields)
+
+    def insert_before(self, elem, xml_content, fields=None):
+        """
+        Insert XML content before an element.
+
+        Args:
+            elem: lxml element to insert before
+            xml_content: String containing XML to insert
+            fields: Values for {name} placeholders in xml_content (see _parse_fragment)
+
+        Returns:
+            List[lxml.etree._Element]: All inserted elements
+        """
+        parent = elem.getparent()
+        return self._insert(parent, parent.index(elem), xml_content, fields)
+
+    def append_to(self, elem, xml_content, fields=None):
+        """
+        Append XML content as a child of an element.
+
+        Args:
+            elem: lxml element to append to
+            xml_content: String containing XML to append
+            fields: Values for {name} placeholders in xml_content (see _parse_fragment)
+
+        Returns:
+            List[lxml.etree._Element]: All inserted elements
+        """
+        return self._insert(elem, len(elem), xml_content, fields)
+
+    def get_next_rid(self):
+        """Get the next available rId for relationships files (see XMLEditor.get_next_rid)."""
+        while True:
+            rel_id = f"rId{self._rids.peek()}"
+            if not self._get_nodes("Relationship", attrs={"Id": rel_id}):
+                return rel_id
+            self._rids.allocate()
+
+    def mark_modified(self, *nodes):
+        """Flag the file as changed after editing elements directly (see XMLEditor.mark_modified)."""
+        self.modified = True
+        self._line_map = None
+        for node in nodes:
+            self._invalidate_text(node)
+
+    def checkpoint(self):
+        """Remember the current tree so that rollback() can return to it (see XMLEditor.checkpoint)."""
+        root = self._root
+        container = self._container()
+        parents = [root] if container is root else [root, container]
+        # Tails are saved too: removing or inserting a top-level element
+        # rewrites the tail of the one before it
+        self._checkpoint = _Checkpoint(
+            root,
+            container,
+            {
+                parent: (parent.text, [(child, child.tail) for child in parent])
+                for parent in parents
+            },
+            [child for parent in parents for child in parent],
+            (dict(root.attrib), root.nsmap),
+            self._checkpoint_state(),
+        )
+
+    def record_change(self, elem):
+        """Note that elem is about to be edited (see XMLEditor.record_change)."""
+        if self._checkpoint is not None:
+            self._checkpoint.record(elem, lambda elem: elem.getparent(), copy.deepcopy)
+        if self._line_map is not None:
+            self._line_map.touch(elem)
+
+    def rollback(self):
+        """
+        Undo every edit made since checkpoint() (see XMLEditor.rollback).
+
+        Raises:
+            ValueError: If checkpoint() was never called
+        """
+        checkpoint = self._checkpoint
+        if checkpoint is None:
+            raise ValueError("No checkpoint to roll back to")
+
+        for parent, (text, children) in checkpoint.children.items():
+            restored = [checkpoint.copies.get(child, child) for child, _ in children]
+            # Only move what differs: moving every child of w:body is slow
+            keep = set(restored)
+            for child in list(parent):
+                if child not in keep:
+                    parent.remove(child)
+            current = parent[0] if len(parent) else None
+            for child in restored:
+                if child is current:
+                    current = current.getnext()
+                elif current is not None:
+                    current.addprevious(child)
+                else:
+                    parent.append(child)
+            parent.text = text
+            for child, (_, tail) in zip(restored, children):
+                child.tail = tail
+
+        root = checkpoint.root
+        attributes, nsmap = checkpoint.attributes
+        if dict(root.attrib) != attributes:
+            root.attrib.clear()
+            root.attrib.update(attributes)
+        added = [prefix for prefix in root.nsmap if prefix not in nsmap]
+        if added:
+            # Declared on the root since the checkpoint and no longer used
+            lxml.etree.cleanup_namespaces(
+                self._tree, keep_ns_prefixes=[p for p in nsmap if p]
+            )
+
+        for name, value in checkpoint.state.items():
+            setattr(self, name, value)
+        self._text_cache.clear()
+        self._ns_decl = None
+        self._line_map = None
+        self.modified = self.modified or checkpoint.changed
+        self.checkpoint()
+
+    def _checkpoint_state(self):
+        """Return copies of the attributes rollback() restores besides the tree."""
+        return {"_rids": copy.copy(self._rids)}
+
+    def save(self):
+        """
+        Save the edited XML back to the file if it was modified.
+
+        Serializes the tree and replaces the original file atomically,
+        preserving the original encoding (ascii or utf-8).
+
+        Returns:
+            bool: True if the file was written (see XMLEditor.save)
+        """
+        if self.modified:
+            _write_atomic(self.xml_path, self.write)
+            written, self._digest = True, None
+        elif self._handed_out:
+            # The nodes may have been edited directly: only the bytes tell
+            written, self._digest = _replace_if_changed(
+                self.xml_path, self.write, self._digest
+            )
+        else:
+            return False
+        self.modified = False
+        return written
+
+    def write(self, stream):
+        """
+        Serialize the tree to a binary stream, in chunks (see XMLEditor.write).
+
+        Args:
+            stream: Writable binary file object
+        """
+        standalone = ' standalone="yes"' if self._tree.docinfo.standalone else ""
+        declaration = f'<?xml version="1.0" encoding="{self.encoding}"{standalone}?>\n'
+        stream.write(declaration.encode(self.encoding))
+        self._tree.write(stream, encoding=self.encoding, xml_declaration=False)
+
+    def _invalidate_text(self, elem):
+        """Drop the cached text of an edited element and all of its ancestors."""
+        self._text_cache.invalidate([elem, *elem.iterancestors()])
+
+    def _get_element_text(self, elem):
+        """Concatenate the non-whitespace text nodes within an element (memoized)."""
+        text = self._text_cache.texts.get(elem)
+        if text is None:
+            text = self._text_cache.texts[elem] = self._collect_text(elem)
+        return text
+
+    @staticmethod
+    def _collect_text(elem):
+        """Build an element's text from the tree, bypassing the cache."""
+        return "".join(text for text in elem.itertext() if text.strip())
+
+    def _get_line_map(self):
+        """Return the current line map, creating it on first use."""
+        if self._line_map is None:
+            self._line_map = _LineMap(self)
+        return self._line_map
+
+    def _container(self):
+        """Return w:body, or the root in parts without one."""
+        root = self._root
+        return next(
+            (
+                child
+                for child in root
+                if isinstance(child.tag, str)
+                and lxml.etree.QName(child).localname == "body"
+            ),
+            root,
+        )
+
+    def _line_pieces(self):
+        """
+        Yield the pieces of the serialized part for the line map (see XMLEditor._line_pieces).
+
+        A top-level element's tail is written right after it, so its line
+        breaks are counted with the element; only the element itself is cached.
+        """
+        root = self._root
+        container = self._container()
+        # Nodes around the root are written without separators
+        yield "head", None, 1 + sum(
+            lxml.etree.tostring(node).count(b"\n")
+            for node in root.itersiblings(preceding=True)
+        )
+        yield "start", root, _line_breaks(root.text)
+        for child in root:
+            if child is container:
+                yield "start", child, _line_breaks(child.text)
+                for block in child:
+                    yield "block", block, _line_breaks(block.tail)
+                yield "end", child, _line_breaks(child.tail)
+            else:
+                yield "block", child, _line_breaks(child.tail)
+        yield "end", root, 0
+        for node in root.itersiblings():
+            yield "node", node, lxml.etree.tostring(node).count(b"\n")
+
+    def _count_line_breaks(self, block):
+        """Count the line breaks in the serialization of a top-level element, without its tail."""
+        return lxml.etree.tostring(block, with_tail=False).count(b"\n")
+
+    def _block_lines(self, block, line):
+        """Yield (element, line) for a top-level element starting on line and its descendants."""
+        stack = [(block, True)]
+        while stack:
+            node, entering = stack.pop()
+            if not entering:
+                if node is not block:
+                    line += _line_breaks(node.tail)
+                continue
+            # Comments and processing instructions are counted but not yielded
+            if isinstance(node.tag, str):
+                yield node, line
+            line += _line_breaks(node.text)
+            stack.append((node, False))
+            stack.extend((child, True) for child in reversed(node))
+
+    def _insert(self, parent, index, xml_content, fields=None):
+        """Parse a fragment and insert its nodes into parent at the given index."""
+        wrapper = self._parse_fragment(xml_content, fields)
+        nodes = list(wrapper)
+        self.record_change(parent)
+        if wrapper.text:
+            # Text before the first element belongs to whatever precedes index
+            if index == 0:
+                parent.text = (parent.text or "") + wrapper.text
+            else:
+                previous = parent[index - 1]
+                previous.tail = (previous.tail or "") + wrapper.text
+        for offset, node in enumerate(nodes):
+            parent.insert(index + offset, node)
+        self._invalidate_text(parent)
+        self.modified = True
+        return nodes
+
+    def _parse_fragment(self, xml_content, fields=None):
+        """
+        Parse an XML fragment inside a wrapper carrying the root's namespaces.
+
+        Inserted elements get no sourceline, so (as with XMLEditor) they never
+        match line_number lookups. Parsed fragments are cached and cloned, and
+        {name} placeholders are filled from fields, as in XMLEditor.
+
+        Returns:
+            lxml.etree._Element: The wrapper element holding the parsed nodes
+
+        Raises:
+            AssertionError: If fragment contains no element nodes
+        """
+        ns_decl = self._namespace_declarations()
+        template = self._fragments.get(
+            (ns_decl, xml_content),
+            lambda: _parse_lxml_fragment(ns_decl, xml_content),
+        )
+        if not isinstance(fields, list):
+            return _fill_lxml_fields(copy.deepcopy(template), fields)
+
+        # One copy per dict, joined as if the sources had been concatenated
+        wrapper = copy.deepcopy(template)
+        del wrapper[:]
+        wrapper.text = None
+        for copy_fields in fields:
+            part = _fill_lxml_fields(copy.deepcopy(template), copy_fields)
+            if part.text:
+                if len(wrapper):
+                    wrapper[-1].tail = (wrapper[-1].tail or "") + part.text
+                else:
+                    wrapper.text = (wrapper.text or "") + part.text
+            wrapper.extend(part)
+        return wrapper
+
+    def _namespace_declarations(self):
+        """Return the root element's namespaces as an attribute string (cached)."""
+        if self._ns_decl is None:
+            self._ns_decl = " ".join(
+                f'xmlns:{prefix}="{html.escape(uri)}"'
+                if prefix
+                else f'xmlns="{html.escape(uri)}"'
+                for prefix, uri in self._root.nsmap.items()
+            )
+        return self._ns_decl
+
+    def _compile_xpath(self, tag, attr_names, descendants_only=False):
+        """Build (and cache) an XPath selecting elements by tag and attributes."""
+        key = (tag, attr_names, descendants_only)
+        if key not in self._xpath_cache:
+            self._xpath_cache[key] = self._build_xpath(
+                tag, attr_names, descendants_only
+            )
+        return self._xpath_cache[key]
+
+    def _build_xpath(self, tag, attr_names, descendants_only):
+        namespaces = {}
+        step = self._xpath_name(tag, namespaces, attribute=False)
+        if step is None:
+            return None
+        predicates = []
+        for i, name in enumerate(attr_names):
+            attr_step = self._xpath_name(name, namespaces, attribute=True)
+            if attr_step is None:
+                return None
+            predicates.append(f"@{attr_step}=$v{i}")
+        axis = "descendant" if descendants_only else "descendant-or-self"
+        predicate = f"[{' and '.join(predicates)}]" if predicates else ""
+        return lxml.etree.XPath(f"{axis}::{step}{predicate}", namespaces=namespaces)
+
+    def _build_selector_xpath(self, steps, descendants_only):
+        """Compile a parsed selector to XPath, or None if it uses an unknown prefix."""
+        namespaces = {}
+        parts = []
+        value_count = 0
+        for i, (combinator, tag, attr_tests) in enumerate(steps):
+            if i == 0:
+                axis = "descendant" if descendants_only else "descendant-or-self"
+            else:
+                axis = "child" if combinator == "child" else "descendant"
+            step = self._xpath_name(tag, namespaces, attribute=False)
+            if step is None:
+                return None
+            for name, value in attr_tests:
+                attr_step = self._xpath_name(name, namespaces, attribute=True)
+                if attr_step is None:
+                    return None
+                if value is None:
+                    step += f"[@{attr_step}]"
+                else:
+                    step += f"[@{attr_step}=$v{value_count}]"
+                    value_count += 1
+            parts.append(f"{axis}::{step}")
+        return lxml.etree.XPath("/".join(parts), namespaces=namespaces)
+
+    def _xpath_name(self, name, namespaces, attribute):
+        """Translate a prefixed name into an XPath name test, or None if unknown."""
+        if name == "*":
+            return name
+        clark = self._clark(name, attribute=attribute)
+        if clark is None:
+            return None
+        if not clark.startswith("{"):
+            return clark
+        uri, local = clark[1:].split("}", 1)
+        prefix = f"ns{len(namespaces)}"
+        namespaces[prefix] = uri
+        return f"{prefix}:{local}"
+
+    def _clark(self, name, attribute=False):
+        """
+        Convert a prefixed name to lxml's {uri}local form.
+
+        Unprefixed tags take the default namespace; unprefixed attributes have
+        none. Returns None when the prefix is not declared in the file.
+        """
+        prefix, _, local = name.rpartition(":")
+        if not prefix:
+            default = None if attribute else self._root.nsmap.get(None)
+            return f"{{{default}}}{name}" if default else name
+        if prefix == "xml":
+            return f"{{{_XML_NAMESPACE}}}{local}"
+        uri = self._namespaces.get(prefix)
+        if uri is None and not self._namespaces_complete:
+            self._complete_namespaces()
+            uri = self._namespaces.get(prefix)
+        return f"{{{uri}}}{local}" if uri else None
+
+    def _complete_namespaces(self):
+        """Add prefixes that are only declared on inner elements (e.g., a:, pic:)."""
+        if not self._namespaces_complete:
+            for elem in self._root.iter():
+                for prefix, uri in elem.nsmap.items():
+                    if prefix:
+                        self._namespaces.setdefault(prefix, uri)
+            self._namespaces_complete = True
+
+
+class IdAllocator:
+    """
+    Hands out increasing integer IDs, seeded once from the IDs already in use.
+
+    Replaces rescanning the document for the highest ID on every allocation.
+    IDs assigned by other means can be reported with observe() so they are
+    never handed out again.
+
+    Example:
+        change_ids = IdAllocator(lambda: existing_id_strings, start=0)
+        new_id = change_ids.allocate()
+    """
+
+    def __init__(self, existing_ids, prefix="", start=0):
+        """
+        Args:
+            existing_ids: Callable returning the ID strings currently in use;
+                          called once, on first use
+            prefix: Prefix in front of the number (e.g., "rId"); other values are ignored
+            start: Lowest ID to hand out
+        """
+        self._existing_ids = existing_ids
+        self._prefix = prefix
+        self._start = start
+        self._next = None
+
+    def peek(self):
+        """Return the ID the next allocate() call will hand out."""
+        if self._next is None:
+            self._next = self._start
+            for value in self._existing_ids():
+                self.observe(value)
+        return self._next
+
+    def allocate(self):
+        """Hand out the next ID."""
+        value = self.peek()
+        self._next += 1
+        return value
+
+    def observe(self, value):
+        """Record an ID (number or string) that is in use; non-numeric values are ignored."""
+        if isinstance(value, str):
+            if not value.startswith(self._prefix):
+                return
+            try:
+                value = int(value[len(self._prefix) :])
+            except ValueError:
+                return
+        if value >= self.peek():
+            self._next = value + 1
+
+
+_SCAN_CHUNK_SIZE = 1 << 16
+
+
+class _ScanHandler(xml.sax.handler.ContentHandler):
+    """
+    SAX handler behind XMLEditor.scan.
+
+    Namespace processing is off, so names arrive as written ("w:p").
+    Completed NodeRecords collect in records until the caller drains them.
+    Text runs are only buffered while a matching element is open.
+    """
+
+    def __init__(self, tag, attrs, contains):
+        super().__init__()
+        self.records = []
+        self._tag = tag
+        self._attrs = attrs or {}
+        self._contains = contains
+        # Per open element: [tag, attributes, line, index into _texts] if it
+        # matches, else None
+        self._open = []
+        self._matching = 0
+        self._texts = []
+        self._chars = []
+
+    def startElement(self, name, attrs):
+        self._flush_text()
+        if (self._tag == "*" or name == self._tag) and all(
+            attrs.get(attr_name, "") == value
+            for attr_name, value in self._attrs.items()
+        ):
+            self._open.append(
+                (name, dict(attrs), self._locator.getLineNumber(), len(self._texts))
+            )
+            self._matching += 1
+        else:
+            self._open.append(None)
+
+    def endElement(self, name):
+        self._flush_text()
+        entry = self._open.pop()
+        if entry is None:
+            return
+        tag, attributes, line, start = entry
+        text = "".join(self._texts[start:])
+        self._matching -= 1
+        if not self._matching:
+            self._texts.clear()
+        if self._contains is None or self._contains in text:
+            self.records.append(NodeRecord(tag, attributes, line, text))
+
+    def characters(self, content):
+        if self._matching:
+            self._chars.append(content)
+
+    def _flush_text(self):
+        # A text node ends at the next tag; whitespace-only ones are formatting
+        if self._chars:
+            data = "".join(self._chars)
+            self._chars.clear()
+            if data.strip():
+                self._texts.append(data)
+
+
+class _ElementIndex:
+    """
+    Lookup tables used by XMLEditor.get_node.
+
+    Maps tag -> elements, tag -> attribute -> value -> elements, and tag -> a
+    sorted table of parse-time line numbers. Tag entries are built in a single
+    pass over the DOM; attribute and line tables are built per tag the first
+    time they are queried. Dicts are used as insertion-ordered sets.
+
+    Entries for removed or modified elements may linger until they are
+    cleaned up; callers must re-check every candidate they get back.
+    """
+
+    def __init__(self, dom):
+        self.by_tag = {}
+        self.by_attr = {}
+        self.by_line = {}
+        if dom.documentElement is not None:
+            self.add(dom.documentElement)
+
+    def add(self, node):
+        """Index a node and all of its descendant elements."""
+        for elem in _iter_elements(node):
+            tag = elem.tagName
+            self.by_tag.setdefault(tag, {})[elem] = None
+            for name, values in self.by_attr.get(tag, {}).items():
+                values.setdefault(elem.getAttribute(name), {})[elem] = None
+
+    def remove(self, node):
+        """Remove a node and all of its descendant elements from the index."""
+        for elem in _iter_elements(node):
+            tag = elem.tagName
+            self.by_tag.get(tag, {}).pop(elem, None)
+            for name, values in self.by_attr.get(tag, {}).items():
+                values.get(elem.getAttribute(name), {}).pop(elem, None)
+
+    def candidates(self, tag, attrs=None, line_number=None):
+        """
+        Return elements that may match the given filters.
+
+        Uses the most selective table available: the smallest attribute bucket,
+        then the line table, then every element with the tag.
+        """
+        if attrs:
+            buckets = [
+                self._attr_values(tag, name).get(value, {})
+                for name, value in attrs.items()
+            ]
+            return list(min(buckets, key=len))
+
+        if line_number is not None:
+            if isinstance(line_number, range):
+                if line_number.step != 1:
+                    return list(self.by_tag.get(tag, ()))
+                start, stop = line_number.start, line_number.stop
+            else:
+                start, stop = line_number, line_number + 1
+            lines, elems = self._line_table(tag)
+            lo = bisect.bisect_left(lines, start)
+            hi = bisect.bisect_left(lines, stop)
+            return elems[lo:hi]
+
+        return list(self.by_tag.get(tag, ()))
+
+    def clear_attributes(self):
+        """Drop the attribute tables, e.g. after attributes were set directly."""
+        self.by_attr.clear()
+
+    def _attr_values(self, tag, name):
+        tables = self.by_attr.setdefault(tag, {})
+        if name not in tables:
+            values = {}
+            for elem in self.by_tag.get(tag, ()):
+                values.setdefault(elem.getAttribute(name), {})[elem] = None
+            tables[name] = values
+        return tables[name]
+
+    def _line_table(self, tag):
+        # Only parsed elements carry a position, and those never change, so the
+        # table needs no maintenance beyond the caller's attachment check
+        if tag not in self.by_line:
+            positioned = sorted(
+                (
+                    elem
+                    for elem in self.by_tag.get(tag, ())
+                    if hasattr(elem, "parse_position")
+                ),
+                key=lambda elem: elem.parse_position,
+            )
+            self.by_line[tag] = (
+                [elem.parse_position[0] for elem in positioned],
+                positioned,
+            )
+        return self.by_line[tag]
+
+
+class _TextCache:
+    """
+    Memoized element text for get_node(contains=...), shared by both engines.
+
+    texts maps element -> its text projection. For contains-only lookups the
+    texts of every element with a tag are joined into one flat table with
+    element start offsets, so a search is a few str.find calls plus a bisect
+    per hit instead of a Python-level check per element. Editors invalidate
+    the edited element and its ancestors; tables are rebuilt lazily from the
+    texts that are still cached.
+    """
+
+    # Cannot occur in XML text, so no match can span two elements
+    _SEPARATOR = "\x00"
+
+    def __init__(self):
+        self.texts = {}
+        self._tables = {}
+
+    def search(self, tag, get_elements, needle, get_text):
+        """
+        Return the elements with the given tag whose text contains needle.
+
+        Args:
+            tag: Tag whose table to search (tables are built per tag on first use)
+            get_elements: Callable returning all elements with the tag
+            needle: Text to find (already entity-unescaped)
+            get_text: Callable returning the (memoized) text of an element
+        """
+        if self._SEPARATOR in needle:
+            return []
+        if tag not in self._tables:
+            elements = list(get_elements())
+            texts = [get_text(elem) for elem in elements]
+            starts = []
+            offset = 0
+            for text in texts:
+                starts.append(offset)
+                offset += len(text) + 1
+            self._tables[tag] = (elements, starts, self._SEPARATOR.join(texts))
+        elements, starts, flat = self._tables[tag]
+
+        matches = []
+        pos = flat.find(needle)
+        while pos != -1:
+            index = bisect.bisect_right(starts, pos) - 1
+            matches.append(elements[index])
+            if index + 1 == len(starts):
+                break
+            # Skip the rest of this element's text
+            pos = flat.find(needle, starts[index + 1])
+        return matches
+
+    def invalidate(self, nodes):
+        """Drop the cached text of edited elements (and every flat table)."""
+        for node in nodes:
+            self.texts.pop(node, None)
+        self._tables.clear()
+
+    def clear_tables(self):
+        """Drop the flat tables, e.g. after the element set was rebuilt."""
+        self._tables.clear()
+
+    def clear(self):
+        """Drop everything."""
+        self.texts.clear()
+        self._tables.clear()
+
+
+class _FragmentCache:
+    """
+    Parsed insert fragments, shared by both engines.
+
+    Keys are (namespace declarations, fragment source); values are parsed
+    templates that editors clone on every insert. The cache is cleared when it
+    grows past _MAX_ENTRIES, which only happens when callers insert many
+    distinct fragments instead of reusing templates with fields.
+    """
+
+    _MAX_ENTRIES = 512
+
+    def __init__(self):
+        self._templates = {}
+
+    def get(self, key, parse):
+        """Return the template for key, calling parse() to build it on a miss."""
+        template = self._templates.get(key)
+        if template is None:
+            if len(self._templates) >= self._MAX_ENTRIES:
+                self._templates.clear()
+            template = self._templates[key] = parse()
+        return template
+
+
+class _Checkpoint:
+    """
+    Tree state saved by checkpoint(), shared by both engines.
+
+    Holds the children of the root and of the block container (w:body, or the
+    root itself in parts without one), the root's attributes, and the copies
+    of the top-level elements (children of either) edited since, each taken
+    just before its first edit. Elements added after the checkpoint are never
+    copied: rollback() drops them with the child lists.
+    """
+
+    def __init__(self, root, container, children, top_level, attributes, state):
+        self.root = root
+        self.container = container
+        # Parent -> saved children, in the engine's own form
+        self.children = children
+        self.attributes = attributes
+        # Attribute name -> copy to restore (e.g. ID allocators)
+        self.state = state
+        self.copies = {}
+        self.changed = False
+        self._top_level = set(top_level)
+
+    def record(self, node, get_parent, clone):
+        """Copy the top-level element holding node, unless it was copied already."""
+        self.changed = True
+        block, parent = node, get_parent(node)
+        while (
+            parent is not None
+            and parent is not self.root
+            and parent is not self.container
+        ):
+            block, parent = parent, get_parent(parent)
+        if (
+            parent is None
+            or block is self.container
+            or block in self.copies
+            or block not in self._top_level
+        ):
+            return
+        self.copies[block] = clone(block)
+
+
+class _LineMap:
+    """
+    Current line numbers of a part, shared by both engines.
+
+    The serialized part is split into pieces (see XMLEditor._line_pieces):
+    tags of the root and w:body, their text, and one piece per top-level
+    element. The line breaks in each top-level element are counted once and
+    cached; record_change() drops the count of the element being edited, so
+    after a batch of edits the line table is rebuilt from cached counts plus
+    a recount of the edited elements only. Lines inside a top-level element
+    are counted when they are asked for.
+    """
+
+    def __init__(self, editor):
+        self._editor = editor
+        # Top-level element -> line breaks in its serialization
+        self._counts = {}
+        self._table = None
+
+    def touch(self, node):
+        """Forget the line breaks of the top-level element holding node."""
+        self._table = None
+        get_parent = self._editor.get_parent
+        while node is not None:
+            self._counts.pop(node, None)
+            node = get_parent(node)
+
+    def line_of(self, elem):
+        """Return the current line of an element."""
+        starts, kinds, nodes, positions = self._get_table()
+        block = elem
+        while block not in positions:
+            block = self._editor.get_parent(block)
+            if block is None:
+                raise ValueError("Element is not part of this document")
+        index = positions[block]
+        if kinds[index] == "start":
+            return starts[index]
+        for node, line in self._editor._block_lines(block, starts[index]):
+            if node is elem:
+                return line
+        raise ValueError("Element is not part of this document")
+
+    def elements(self, tag, line_number):
+        """Return the elements with a tag (or "*") starting on the given lines, in order."""
+        lines = (
+            line_number
+            if isinstance(line_number, range)
+            else range(line_number, line_number + 1)
+        )
+        if not lines:
+            return []
+        stop = max(lines) + 1
+        starts, kinds, nodes, _ = self._get_table()
+        tag_name = self._editor.tag_name
+
+        matches = []
+        for index in range(self._first_piece(min(lines)), len(starts)):
+            if starts[index] >= stop:
+                break
+            if kinds[index] == "block":
+                found = self._editor._block_lines(nodes[index], starts[index])
+            elif kinds[index] == "start":
+                found = [(nodes[index], starts[index])]
+            else:
+                continue
+            for elem, line in found:
+                if line >= stop:
+                    break
+                if line in lines and (tag == "*" or tag_name(elem) == tag):
+                    matches.append(elem)
+        return matches
+
+    def pieces(self, line_number=None):
+        """
+        Return the pieces covering the given lines (default: all).
+
+        Returns:
+            tuple: (line the first piece starts on, [(kind, node), ...])
+        """
+        starts, kinds, nodes, _ = self._get_table()
+        first, stop = 0, len(starts)
+        if line_number is not None:
+            lines = (
+                line_number
+                if isinstance(line_number, range)
+                else range(line_number, line_number + 1)
+            )
+            if not lines:
+                return 1, []
+            first = self._first_piece(min(lines))
+            stop = bisect.bisect_left(starts, max(lines) + 1)
+        return starts[first], list(zip(kinds[first:stop], nodes[first:stop]))
+
+    def _first_piece(self, line):
+        # A piece may continue on the line the next one starts on, so begin
+        # with the last piece starting before line
+        starts = self._get_table()[0]
+        return max(bisect.bisect_left(starts, line) - 1, 0)
+
+    def _get_table(self):
+        """Return (start lines, kinds, nodes, node -> index of its piece)."""
+        if self._table is None:
+            starts, kinds, nodes, positions = [], [], [], {}
+            counts = {}
+            line = 1
+            for kind, node, breaks in self._editor._line_pieces():
+                if kind == "block":
+                    count = self._counts.get(node)
+                    if count is None:
+                        count = self._editor._count_line_breaks(node)
+                    counts[node] = count
+                    breaks += count
+                if kind in ("block", "start"):
+                    positions[node] = len(starts)
+                starts.append(line)
+                kinds.append(kind)
+                nodes.append(node)
+                line += breaks
+            # Elements removed from the tree are dropped here
+            self._counts = counts
+            self._table = (starts, kinds, nodes, positions)
+        return self._table
+
+
+def _clone_minidom_node(node):
+    """Deep-copy a minidom node, keeping the parse positions used by line lookups."""
+    clone = node.cloneNode(True)
+    for original, copied in zip(_iter_elements(node), _iter_elements(clone)):
+        position = getattr(original, "parse_position", None)
+        if position is not None:
+            copied.parse_position = position
+    return clone
+
+
+_FIELD = re.compile(r"\{(\w+)\}")
+
+
+def _fill_fields(value, fields):
+    """Replace {name} placeholders in a string with values from fields."""
+    return _FIELD.sub(
+        lambda match: str(fields[match.group(1)])
+        if match.group(1) in fields
+        else match.group(),
+        value,
+    )
+
+
+def _parse_minidom_fragment(ns_decl, xml_content):
+    """Parse a fragment inside a wrapper element declaring ns_decl."""
+    fragment_doc = defusedxml.minidom.parseString(
+        f"<root {ns_decl}>{xml_content}</root>"
+    )
+    assert any(
+        child.nodeType == child.ELEMENT_NODE
+        for child in fragment_doc.documentElement.childNodes  # type: ignore
+    ), "Fragment must contain at least one element"
+    return fragment_doc
+
+
+def _fill_minidom_fields(nodes, fields):
+    """Fill {name} placeholders in the attribute values and text of minidom nodes."""
+    stack = list(nodes)
+    while stack:
+        node = stack.pop()
+        if node.nodeType == node.TEXT_NODE:
+            if "{" in node.data:
+                node.data = _fill_fields(node.data, fields)
+        elif node.nodeType == node.ELEMENT_NODE:
+            for i in range(node.attributes.length):
+                attr = node.attributes.item(i)
+                if "{" in attr.value:
+                    attr.value = _fill_fields(attr.value, fields)
+            stack.extend(node.childNodes)
+
+
+def _parse_lxml_fragment(ns_decl, xml_content):
+    """Parse a fragment into a wrapper element declaring ns_decl, without line numbers."""
+    wrapper = lxml.etree.fromstring(
+        f"<root {ns_decl}>{xml_content}</root>", _create_lxml_parser()
+    )
+    assert any(isinstance(node.tag, str) for node in wrapper), (
+        "Fragment must contain at least one element"
+    )
+    for node in wrapper.iter():
+        node.sourceline = 0
+    return wrapper
+
+
+def _fill_lxml_fields(wrapper, fields):
+    """Fill {name} placeholders in a cloned lxml fragment in place and return it."""
+    if fields:
+        for node in wrapper.iter():
+            for name, value in node.attrib.items():
+                if "{" in value:
+                    node.set(name, _fill_fields(value, fields))
+            if node.text and "{" in node.text:
+                node.text = _fill_fields(node.text, fields)
+            if node.tail and "{" in node.tail:
+                node.tail = _fill_fields(node.tail, fields)
+    return wrapper
+
+
+def _select_single_match(matches, tag, attrs, line_number, contains):
+    """
+    Return the only element in matches, or raise a descriptive error.
+
+    Shared by every editor engine so that zero and multiple matches are
+    reported identically.
+
+    Raises:
+        ValueError: If matches is empty or has more than one element
+    """
+    if not matches:
+        # Build descriptive error message
+        filters = []
+        if line_number is not None:
+            line_str = (
+                f"lines {line_number.start}-{line_number.stop - 1}"
+                if isinstance(line_number, range)
+                else f"line {line_number}"
+            )
+            filters.append(f"at {line_str}")
+        if attrs is not None:
+            filters.append(f"with attributes {attrs}")
+        if contains is not None:
+            filters.append(f"containing '{contains}'")
+
+        filter_desc = " ".join(filters) if filters else ""
+        base_msg = f"Node not found: <{tag}> {filter_desc}".strip()
+
+        # Add helpful hint based on filters used
+        if contains:
+            hint = "Text may be split across elements or use different wording."
+        elif line_number:
+            hint = (
+                "Line numbers may have changed if document was modified; "
+                "render_lines() shows the current ones, which "
+                "current_lines=True matches."
+            )
+        elif attrs:
+            hint = "Verify attribute values are correct."
+        else:
+            hint = "Try adding filters (attrs, line_number, or contains)."
+
+        raise ValueError(f"{base_msg}. {hint}")
+    if len(matches) > 1:
+        raise ValueError(
+            f"Multiple nodes found: <{tag}>. "
+            f"Add more filters (attrs, line_number, or contains) to narrow the search."
+        )
+    return matches[0]
+
+
+_SELECTOR_NAME = r"[A-Za-z_][\w.-]*(?::[A-Za-z_][\w.-]*)?"
+_SELECTOR_TAG = re.compile(rf"\*|{_SELECTOR_NAME}")
+_SELECTOR_ATTR = re.compile(
+    rf"""\[\s*({_SELECTOR_NAME})\s*(?:=\s*(?:"([^"]*)"|'([^']*)'))?\s*\]"""
+)
+_SELECTOR_COMBINATOR = re.compile(r"\s*>\s*|\s+")
+
+
+def _is_xpath(selector):
+    """Check whether a query selector is an XPath expression rather than CSS-like."""
+    return selector.lstrip().startswith(("/", ".", "("))
+
+
+@functools.lru_cache(maxsize=256)
+def _parse_selector(selector):
+    """
+    Parse a CSS-like selector into steps.
+
+    Each step is (combinator, tag, attr_tests): combinator is None for the
+    first step, otherwise "child" (>) or "descendant" (whitespace); attr_tests
+    is a tuple of (name, value) pairs, where value None only requires the
+    attribute to be present.
+
+    Raises:
+        ValueError: If the selector cannot be parsed
+    """
+    text = selector.strip()
+    steps = []
+    combinator = None
+    pos = 0
+    while True:
+        match = _SELECTOR_TAG.match(text, pos)
+        if match is None:
+            raise ValueError(
+                f"Invalid selector {selector!r}: expected a tag at position {pos}"
+            )
+        tag = match.group()
+        pos = match.end()
+
+        attr_tests = []
+        while (match := _SELECTOR_ATTR.match(text, pos)) is not None:
+            name, double_quoted, single_quoted = match.groups()
+            value = double_quoted if double_quoted is not None else single_quoted
+            attr_tests.append((name, value))
+            pos = match.end()
+        steps.append((combinator, tag, tuple(attr_tests)))
+
+        if pos == len(text):
+            return tuple(steps)
+        match = _SELECTOR_COMBINATOR.match(text, pos)
+        if match is None:
+            raise ValueError(
+                f"Invalid selector {selector!r}: unexpected {text[pos]!r} at position {pos}"
+            )
+        combinator = "child" if ">" in match.group() else "descendant"
+        pos = match.end()
+
+
+def _matches_compound(elem, tag, attr_tests):
+    """Check a minidom element against one selector step's tag and attribute tests."""
+    if tag != "*" and elem.tagName != tag:
+        return False
+    return all(
+        elem.hasAttribute(name) if value is None else elem.getAttribute(name) == value
+        for name, value in attr_tests
+    )
+
+
+def _matches_ancestors(elem, steps, i, boundary):
+    """Check that the ancestors of elem (below boundary) satisfy steps[:i]."""
+    if i == 0:
+        return True
+    combinator = steps[i][0]
+    _, tag, attr_tests = steps[i - 1]
+    node = elem.parentNode
+    while node is not None and node is not boundary:
+        if (
+            node.nodeType == node.ELEMENT_NODE
+            and _matches_compound(node, tag, attr_tests)
+            and _matches_ancestors(node, steps, i - 1, boundary)
+        ):
+            return True
+        if combinator == "child":
+            return False
+        node = node.parentNode
+    return False
+
+
+def _iter_elements(node):
+    """Yield a node (if it is an element) and its descendant elements in document order."""
+    stack = [node]
+    while stack:
+        current = stack.pop()
+        if current.nodeType == current.ELEMENT_NODE:
+            yield current
+        stack.extend(reversed(current.childNodes))
+
+
+def _xml_declaration(encoding):
+    """Return the XML declaration XMLEditor writes, as Document.toxml() does."""
+    return f'<?xml version="1.0" encoding="{encoding}"?>'
+
+
+def _line_breaks(text):
+    """Count the line breaks in an optional string (lxml text or tail)."""
+    return text.count("\n") if text else 0
+
+
+def _minidom_own_line_breaks(node):
+    """Count the line breaks minidom writes for a node itself (attributes or data)."""
+    if node.nodeType == node.ELEMENT_NODE:
+        if not node.hasAttributes():
+            return 0
+        return sum(attr.value.count("\n") for attr in node.attributes.values())
+    return getattr(node, "data", "").count("\n")
+
+
+def _minidom_line_breaks(node):
+    """Count the line breaks minidom writes for a node and its descendants."""
+    count = 0
+    stack = [node]
+    while stack:
+        current = stack.pop()
+        count += _minidom_own_line_breaks(current)
+        stack.extend(current.childNodes)
+    return count
+
+
+def _number_lines(text, first_line, line_number=None):
+    """Number the lines of text from first_line, keeping only line_number if given."""
+    if isinstance(line_number, int):
+        line_number = range(line_number, line_number + 1)
+    return "\n".join(
+        f"{number:6}\t{line}"
+        for number, line in enumerate(text.split("\n"), first_line)
+        if line_number is None or number in line_number
+    )
+
+
+def _write_atomic(path, write):
+    """Fill path through write(file) on a temporary file in the same directory and a rename."""
+    with tempfile.NamedTemporaryFile(
+        dir=path.parent, prefix=f".{path.name}.", suffix=".tmp", delete=False
+    ) as f:
+        temp_path = Path(f.name)
+    try:
+        with open(temp_path, "wb") as f:
+            write(f)
+        if path.exists():
+            # NamedTemporaryFile creates the file private to the user
+            shutil.copymode(path, temp_path)
+        os.replace(temp_path, path)
+    except BaseException:
+        temp_path.unlink(missing_ok=True)
+        raise
+
+
+def _replace_if_changed(path, write, digest):
+    """
+    Serialize through write(file) and replace path only if the bytes differ.
+
+    Args:
+        path: File to replace
+        write: Callable writing the new content to a binary file object
+        digest: SHA-256 digest of the file's content, or None to read it
+
+    Returns:
+        tuple: (whether the file was written, digest of its content now)
+    """
+    buffer = io.BytesIO()
+    write(buffer)
+    new_digest = hashlib.sha256(buffer.getbuffer()).digest()
+    if digest is None:
+        digest = _file_digest(path)
+    if new_digest == digest:
+        return False, digest
+    _write_atomic(path, lambda f: f.write(buffer.getbuffer()))
+    return True, new_digest
+
+
+def _file_digest(path):
+    """Return the SHA-256 digest of a file, read in chunks."""
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(_SCAN_CHUNK_SIZE):
+            sha.update(chunk)
+    return sha.digest()
+
+
+def _create_lxml_parser():
+    """Create an lxml parser that never resolves entities or touches the network."""
+    return lxml.etree.XMLParser(resolve_entities=False, no_network=True)
+
+
+def _remove_keeping_tail(elem):
+    """Remove an lxml element, leaving its tail text in place."""
+    parent = elem.getparent()
+    if elem.tail:
+        previous = elem.getprevious()
+        if previous is not None:
+            previous.tail = (previous.tail or "") + elem.tail
+        else:
+            parent.text = (parent.text or "") + elem.tail
+    parent.remove(elem)
+
 
 def _create_line_tracking_parser():
     """
@@ -0,0 +1,579 @@
+import html
+import io
+import os
+import tempfile
+import unittest
+import zipfile
+from pathlib import Path
+
+from .utilities import IdAllocator, LxmlXMLEditor, XMLEditor
+
+NAMESPACES = (
+    'xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main" '
+    'xmlns:w14="http://schemas.microsoft.com/office/word/2010/wordml"'
+)
+
+
+def make_part(directory, paragraphs=5, name="document.xml"):
+    """Write a small document part with the given number of paragraphs and return its path"""
+    body = "\n".join(
+        f'    <w:p w14:paraId="{i + 1:08X}">\n'
+        f"      <w:r>\n        <w:t>Paragraph {i} says hello</w:t>\n      </w:r>\n"
+        "    </w:p>"
+        for i in range(paragraphs)
+    )
+    path = Path(directory) / name
+    path.write_text(
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        f"<w:document {NAMESPACES}>\n  <w:body>\n{body}\n    <w:sectPr/>\n"
+        "  </w:body>\n</w:document>",
+        encoding="utf-8",
+    )
+    return path
+
+
+def baseline_text(elem):
+    """Return an element's text the way get_node(contains=...) read it before indexing"""
+    parts = []
+    for node in elem.childNodes:
+        if node.nodeType == node.TEXT_NODE:
+            if node.data.strip():
+                parts.append(node.data)
+        elif node.nodeType == node.ELEMENT_NODE:
+            parts.append(baseline_text(node))
+    return "".join(parts)
+
+
+def baseline_matches(editor, tag, attrs=None, line_number=None, contains=None):
+    """Find elements by scanning every element with the tag, as get_node did before indexing"""
+    matches = []
+    for elem in editor.dom.getElementsByTagName(tag):
+        line = getattr(elem, "parse_position", (None,))[0]
+        if isinstance(line_number, range) and line not in line_number:
+            continue
+        if isinstance(line_number, int) and line != line_number:
+            continue
+        if attrs is not None and not all(
+            elem.getAttribute(name) == value for name, value in attrs.items()
+        ):
+            continue
+        if contains is not None and contains not in baseline_text(elem):
+            continue
+        matches.append(elem)
+    return matches
+
+
+class TestElementIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.editor = XMLEditor(make_part(self.tmp.name, paragraphs=30))
+
+    def assertFindsBaseline(self, tag, **filters):
+        expected = baseline_matches(self.editor, tag, **filters)
+        if len(expected) == 1:
+            self.assertIs(self.editor.get_node(tag, **filters), expected[0])
+        else:
+            with self.assertRaises(ValueError):
+                self.editor.get_node(tag, **filters)
+
+    def test_lookups_match_a_full_scan(self):
+        """Test attribute and line lookups against a scan of every element"""
+        for number in range(0, 32):
+            self.assertFindsBaseline("w:p", attrs={"w14:paraId": f"{number:08X}"})
+        for line in range(1, 130, 7):
+            self.assertFindsBaseline("w:p", line_number=line)
+            self.assertFindsBaseline("w:t", line_number=line)
+        self.assertFindsBaseline("w:p", line_number=range(5, 12))
+        self.assertFindsBaseline(
+            "w:p", line_number=range(5, 8), attrs={"w14:paraId": "00000001"}
+        )
+
+    def test_edits_keep_the_index_current(self):
+        """Test that inserted, replaced and removed elements are found as a scan finds them"""
+        editor = self.editor
+        first = editor.get_node("w:p", attrs={"w14:paraId": "00000001"})
+        editor.insert_after(first, '<w:p w14:paraId="0000AAAA"/>')
+        editor.insert_before(first, '<w:p w14:paraId="0000BBBB"/>')
+        editor.append_to(first, '<w:r><w:t xml:space="preserve" w:id="9">x</w:t></w:r>')
+        second = editor.get_node("w:p", attrs={"w14:paraId": "00000002"})
+        editor.replace_node(second, '<w:p w14:paraId="00000003"/>')
+        for paragraph_id in ("0000AAAA", "0000BBBB", "00000002", "00000003"):
+            self.assertFindsBaseline("w:p", attrs={"w14:paraId": paragraph_id})
+        self.assertFindsBaseline("w:t", attrs={"w:id": "9"})
+
+    def test_direct_attribute_edits_after_mark_modified(self):
+        """Test that attributes set on the DOM are found once reported, with or without nodes"""
+        for report_nodes in (True, False):
+            with self.subTest(report_nodes=report_nodes):
+                editor = self.editor = XMLEditor(make_part(self.tmp.name, paragraphs=30))
+                paragraphs = editor.get_nodes("w:p")
+                editor.get_node("w:p", attrs={"w14:paraId": "00000001"})
+                paragraphs[1].setAttribute("w14:paraId", "00000001")
+                paragraphs[2].setAttribute("w14:paraId", "0000CCCC")
+                if report_nodes:
+                    editor.mark_modified(paragraphs[1], paragraphs[2])
+                else:
+                    editor.mark_modified()
+                with self.assertRaisesRegex(ValueError, "Multiple nodes found"):
+                    editor.get_node("w:p", attrs={"w14:paraId": "00000001"})
+                for paragraph_id in ("00000002", "00000003", "0000CCCC"):
+                    self.assertFindsBaseline("w:p", attrs={"w14:paraId": paragraph_id})
+
+
+class TestTextCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.editor = XMLEditor(make_part(self.tmp.name, paragraphs=12))
+
+    def assertFindsBaseline(self, tag, contains):
+        expected = baseline_matches(self.editor, tag, contains=html.unescape(contains))
+        if len(expected) == 1:
+            self.assertIs(self.editor.get_node(tag, contains=contains), expected[0])
+        else:
+            with self.assertRaises(ValueError):
+                self.editor.get_node(tag, contains=contains)
+
+    def test_contains_matches_a_full_scan(self):
+        """Test contains= lookups on every level against the uncached text"""
+        for tag in ("w:t", "w:r", "w:p", "w:body"):
+            for needle in ("Paragraph 1 ", "Paragraph 11", "says", "&#80;aragraph 4", "x"):
+                self.assertFindsBaseline(tag, needle)
+
+    def test_edits_update_cached_text(self):
+        """Test that text inserted, replaced or removed by the editing methods is seen"""
+        editor = self.editor
+        self.assertFindsBaseline("w:p", "Paragraph 5 says")
+        run = editor.get_node(tag="w:r", contains="Paragraph 5 says")
+        editor.replace_node(run, "<w:r><w:t>Rewritten \u201cfive\u201d</w:t></w:r>")
+        paragraph = editor.get_node(tag="w:p", contains="Paragraph 6 says")
+        editor.append_to(paragraph, "<w:r><w:t> and more</w:t></w:r>")
+        for needle in ("Paragraph 5 says", "&#8220;five", "hello and more", "Rewritten"):
+            self.assertFindsBaseline("w:p", needle)
+            self.assertFindsBaseline("w:body", needle)
+
+    def test_direct_text_edits(self):
+        """Test that text changed on the DOM is found without a stale match"""
+        editor = self.editor
+        text = editor.get_node(tag="w:t", contains="Paragraph 7 says")
+        self.assertFindsBaseline("w:p", "Paragraph 7 says")
+        text.firstChild.data = "Edited directly"
+        self.assertFindsBaseline("w:p", "Edited directly")
+        self.assertFindsBaseline("w:p", "Paragraph 7 says")
+
+
+class TestQuery(unittest.TestCase):
+
+    BODY = """<w:body>
+  <w:p w14:paraId="00000001"><w:r><w:t>one</w:t></w:r></w:p>
+  <w:tbl>
+    <w:tr>
+      <w:tc><w:p><w:ins w:author="Jane"><w:r><w:t>two</w:t></w:r></w:ins></w:p></w:tc>
+      <w:tc><w:p w14:paraId="00000003"><w:r><w:t>three</w:t></w:r></w:p></w:tc>
+    </w:tr>
+  </w:tbl>
+  <w:p><w:ins w:author="John"><w:r><w:t>four</w:t></w:r></w:ins><w:r/></w:p>
+</w:body>"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = Path(self.tmp.name) / "document.xml"
+        self.path.write_text(
+            f'<?xml version="1.0" encoding="UTF-8"?>\n<w:document {NAMESPACES}>\n'
+            f"{self.BODY}\n</w:document>",
+            encoding="utf-8",
+        )
+        self.editor = XMLEditor(self.path)
+        self.dom = self.editor.dom
+
+    def elements(self, tag, parent=None):
+        return list((parent or self.dom).getElementsByTagName(tag))
+
+    def test_get_nodes_matches_a_scan(self):
+        """Test get_nodes against getElementsByTagName with the attributes filtered"""
+        self.assertEqual(self.editor.get_nodes("w:p"), self.elements("w:p"))
+        self.assertEqual(
+            self.editor.get_nodes("w:ins", attrs={"w:author": "John"}),
+            [e for e in self.elements("w:ins") if e.getAttribute("w:author") == "John"],
+        )
+        table = self.elements("w:tbl")[0]
+        self.assertEqual(self.editor.get_nodes("w:r", parent=table), self.elements("w:r", table))
+        self.assertEqual(self.editor.get_nodes("w:nothing"), [])
+
+    def test_selectors_match_a_scan(self):
+        """Test each combinator and attribute test against the same walk done by hand"""
+        body = self.elements("w:body")[0]
+        table = self.elements("w:tbl")[0]
+        expected = {
+            "w:body > w:p": [n for n in body.childNodes if getattr(n, "tagName", "") == "w:p"],
+            "w:tbl w:p": self.elements("w:p", table),
+            "w:tc > w:p[w14:paraId]": [
+                p for p in self.elements("w:p", table) if p.hasAttribute("w14:paraId")
+            ],
+            'w:ins[w:author="Jane"] w:r': self.elements("w:r", self.elements("w:ins")[0]),
+            "w:p > w:r": [
+                r for r in self.elements("w:r") if r.parentNode.tagName == "w:p"
+            ],
+            "*": self.elements("*"),
+        }
+        for selector, elements in expected.items():
+            with self.subTest(selector=selector):
+                self.assertEqual(self.editor.query(selector), elements)
+        self.assertEqual(self.editor.query("w:p", parent=table), self.elements("w:p", table))
+
+    def test_lxml_engine_matches(self):
+        """Test that LxmlXMLEditor returns the same elements, and evaluates XPath"""
+        lxml_editor = LxmlXMLEditor(self.path)
+        for selector in ("w:body > w:p", "w:tbl w:p", 'w:ins[w:author="Jane"] w:r', "*"):
+            with self.subTest(selector=selector):
+                self.assertEqual(
+                    [(lxml_editor.tag_name(e), e.sourceline) for e in lxml_editor.query(selector)],
+                    [(e.tagName, e.parse_position[0]) for e in self.editor.query(selector)],
+                )
+        authors = lxml_editor.query("//w:ins[@w:author=$author]/@w:author", author="John")
+        self.assertEqual(authors, ["John"])
+        with self.assertRaises(ValueError):
+            self.editor.query("//w:ins")
+
+
+class TestFragments(unittest.TestCase):
+
+    TEMPLATE = '<w:p w14:paraId="{id}"><w:r><w:t>{text}</w:t></w:r></w:p>'
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def edited(self, engine, name, *inserts):
+        """Insert each (content, fields) after the first paragraph and return the output"""
+        editor = engine(make_part(self.tmp.name, name=name))
+        paragraph = editor.get_node(tag="w:p", contains="Paragraph 0")
+        for content, fields in inserts:
+            editor.insert_after(paragraph, content, fields)
+        stream = io.BytesIO()
+        editor.write(stream)
+        return stream.getvalue()
+
+    def test_cached_fragments_match_fresh_parses(self):
+        """Test that reusing a fragment and filling fields gives the literal XML's output"""
+        for engine in (XMLEditor, LxmlXMLEditor):
+            with self.subTest(engine=engine.__name__):
+                literal = (
+                    '<w:p w14:paraId="0000000A"><w:r><w:t>a &lt; b &amp; c</w:t></w:r></w:p>'
+                )
+                other = '<w:p w14:paraId="0000000B"><w:r><w:t>{text}</w:t></w:r></w:p>'
+                fields = {"id": "0000000A", "text": "a < b & c"}
+                self.assertEqual(
+                    self.edited(
+                        engine, "cached.xml", (self.TEMPLATE, fields), (self.TEMPLATE, fields)
+                    ),
+                    self.edited(engine, "literal.xml", (literal, None), (literal, None)),
+                )
+                self.assertEqual(
+                    self.edited(
+                        engine,
+                        "list.xml",
+                        (self.TEMPLATE, [fields, {"id": "0000000B", "text": "{text}"}]),
+                    ),
+                    self.edited(engine, "joined.xml", (literal + other, None)),
+                )
+
+    def test_inserted_copies_are_independent(self):
+        """Test that each insertion of a cached fragment gets its own nodes"""
+        editor = XMLEditor(make_part(self.tmp.name))
+        paragraph = editor.get_node(tag="w:p", contains="Paragraph 0")
+        (first,) = editor.insert_after(paragraph, "<w:p><w:r/></w:p>")
+        first.setAttribute("w14:paraId", "0000000C")
+        (second,) = editor.insert_after(paragraph, "<w:p><w:r/></w:p>")
+        self.assertIsNot(first, second)
+        self.assertEqual(second.toxml(), "<w:p><w:r/></w:p>")
+
+
+class TestIdAllocator(unittest.TestCase):
+
+    def test_seeds_from_the_highest_id(self):
+        """Test that allocation starts after the highest existing ID, read only once"""
+        calls = []
+
+        def existing_ids():
+            calls.append(None)
+            return ["3", "11", "x", "", "7"]
+
+        ids = IdAllocator(existing_ids)
+        self.assertEqual(ids.peek(), 12)
+        self.assertEqual([ids.allocate(), ids.allocate()], [12, 13])
+        ids.observe("20")
+        ids.observe(5)
+        self.assertEqual(ids.allocate(), 21)
+        self.assertEqual(len(calls), 1)
+
+    def test_prefix_and_start(self):
+        """Test that only prefixed values count and that start is the lowest ID"""
+        ids = IdAllocator(lambda: ["rId2", "rIdx", "9"], prefix="rId", start=1)
+        self.assertEqual(ids.allocate(), 3)
+        self.assertEqual(IdAllocator(tuple, start=4).allocate(), 4)
+
+    def test_next_rid_matches_a_rescan(self):
+        """Test get_next_rid against the highest rId in the file after each insert"""
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / "document.xml.rels"
+            path.write_text(
+                '<?xml version="1.0" encoding="UTF-8"?>\n<Relationships xmlns="http://'
+                'schemas.openxmlformats.org/package/2006/relationships">'
+                '<Relationship Id="rId1" Target="a.xml"/>'
+                '<Relationship Id="rId4" Target="b.xml"/>'
+                "</Relationships>",
+                encoding="utf-8",
+            )
+            editor = XMLEditor(path)
+            for _ in range(3):
+                highest = max(
+                    int(elem.getAttribute("Id")[3:])
+                    for elem in editor.dom.getElementsByTagName("Relationship")
+                )
+                rel_id = editor.get_next_rid()
+                self.assertEqual(rel_id, f"rId{highest + 1}")
+                self.assertEqual(editor.get_next_rid(), rel_id)
+                editor.append_to(editor.root, f'<Relationship Id="{rel_id}" Target="c.xml"/>')
+
+
+class TestSave(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def make_saved_part(self, engine):
+        """Write a part as the engine saves it, so that an unchanged tree has the same bytes"""
+        self.path = make_part(self.tmp.name, name=f"{engine.__name__}.xml")
+        self.path.chmod(0o640)
+        editor = engine(self.path)
+        editor.mark_modified()
+        editor.save()
+
+    def file_state(self):
+        stat = self.path.stat()
+        return stat.st_ino, stat.st_mtime_ns, self.path.read_bytes()
+
+    def test_unchanged_parts_are_not_written(self):
+        """Test that saving untouched, or handed out but unchanged, parts leaves the file alone"""
+        for engine in (XMLEditor, LxmlXMLEditor):
+            with self.subTest(engine=engine.__name__):
+                self.make_saved_part(engine)
+                before = self.file_state()
+                editor = engine(self.path)
+                self.assertFalse(editor.save())
+                editor.get_node(tag="w:p", contains="Paragraph 1")
+                editor.get_nodes("w:r")
+                self.assertFalse(editor.save())
+                self.assertFalse(editor.save())
+                self.assertEqual(self.file_state(), before)
+
+    def test_edits_are_written_once(self):
+        """Test that editing-method and direct edits are written, and only once"""
+        for engine in (XMLEditor, LxmlXMLEditor):
+            with self.subTest(engine=engine.__name__):
+                self.make_saved_part(engine)
+                editor = engine(self.path)
+                paragraph = editor.get_node(tag="w:p", contains="Paragraph 1")
+                editor.insert_after(paragraph, "<w:p/>")
+                self.assertTrue(editor.save())
+                self.assertFalse(editor.save())
+
+                text = editor.get_nodes("w:t")[0]
+                if engine is XMLEditor:
+                    text.firstChild.data = "Edited directly"
+                else:
+                    text.text = "Edited directly"
+                self.assertTrue(editor.save())
+                self.assertFalse(editor.save())
+                self.assertIn(b"Edited directly", self.path.read_bytes())
+                self.assertEqual(self.path.stat().st_mode & 0o777, 0o640)
+                self.assertEqual(len(engine(self.path).get_nodes("w:p")), 6)
+
+    def test_failed_write_keeps_the_file(self):
+        """Test that an error while serializing leaves the file and no temporary file"""
+        self.make_saved_part(XMLEditor)
+        editor = XMLEditor(self.path)
+        before = self.file_state()
+        editor.insert_after(editor.get_node(tag="w:p", contains="Paragraph 1"), "<w:p/>")
+
+        def fail(stream):
+            stream.write(b"<partial")
+            raise RuntimeError("serialization failed")
+
+        editor.write = fail
+        with self.assertRaisesRegex(RuntimeError, "serialization failed"):
+            editor.save()
+        self.assertEqual(self.file_state(), before)
+        self.assertEqual(os.listdir(self.tmp.name), [self.path.name])
+
+
+class TestRollback(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def written(self, editor):
+        stream = io.BytesIO()
+        editor.write(stream)
+        return stream.getvalue()
+
+    def test_rollback_restores_the_tree(self):
+        """Test that rollback() gives back the bytes, lookups and lines of the checkpoint"""
+        for engine in (XMLEditor, LxmlXMLEditor):
+            with self.subTest(engine=engine.__name__):
+                editor = engine(make_part(self.tmp.name, name=f"{engine.__name__}.xml"))
+                editor.get_node(tag="w:p", contains="Paragraph 0")
+                before = self.written(editor)
+                lines = editor.render_lines()
+                editor.checkpoint()
+
+                first = editor.get_node(tag="w:p", attrs={"w14:paraId": "00000001"})
+                editor.insert_after(first, '<w:p w14:paraId="0000AAAA"/>')
+                editor.replace_node(
+                    editor.get_node(tag="w:r", contains="Paragraph 2"),
+                    "<w:r><w:t>replaced</w:t></w:r>",
+                )
+                editor.append_to(editor.get_node(tag="w:p", contains="Paragraph 4"), "<w:r/>")
+                editor.rollback()
+
+                self.assertEqual(self.written(editor), before)
+                self.assertEqual(editor.render_lines(), lines)
+                paragraph = editor.get_node(tag="w:p", contains="Paragraph 2 says")
+                self.assertEqual(editor.get_attribute(paragraph, "w14:paraId"), "00000003")
+                with self.assertRaises(ValueError):
+                    editor.get_node(tag="w:p", attrs={"w14:paraId": "0000AAAA"})
+                with self.assertRaises(ValueError):
+                    editor.get_node(tag="w:r", contains="replaced")
+
+
+class TestWrite(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = make_part(self.tmp.name)
+
+    def written(self, editor):
+        stream = io.BytesIO()
+        editor.write(stream)
+        return stream.getvalue()
+
+    def test_write_matches_toxml(self):
+        """Test that the streamed output is byte for byte what toxml() returns"""
+        editor = XMLEditor(self.path)
+        self.assertEqual(self.written(editor), editor.dom.toxml(encoding=editor.encoding))
+
+    def test_write_matches_toxml_after_edits(self):
+        """Test the same after inserting text the encoding cannot represent"""
+        editor = XMLEditor(self.path)
+        editor.encoding = "ascii"
+        paragraph = editor.get_node(tag="w:p", contains="Paragraph 2")
+        editor.insert_after(paragraph, "<w:p><w:r><w:t>café “quoted”</w:t></w:r></w:p>")
+        data = self.written(editor)
+        self.assertEqual(data, editor.dom.toxml(encoding="ascii"))
+        self.assertIn(b"caf&#233;", data)
+
+    def test_save_writes_toxml(self):
+        """Test that save() leaves the toxml() bytes on disk"""
+        editor = XMLEditor(self.path)
+        editor.insert_after(editor.get_node(tag="w:p", contains="Paragraph 0"), "<w:p/>")
+        editor.save()
+        self.assertEqual(self.path.read_bytes(), editor.dom.toxml(encoding=editor.encoding))
+
+    def test_write_into_a_zip_entry(self):
+        """Test that writing straight into a zip entry stores the toxml() bytes"""
+        editor = XMLEditor(self.path)
+        package_path = Path(self.tmp.name) / "package.zip"
+        with zipfile.ZipFile(package_path, "w", zipfile.ZIP_DEFLATED) as package:
+            with package.open("word/document.xml", "w") as entry:
+                editor.write(entry)
+        with zipfile.ZipFile(package_path) as package:
+            self.assertIsNone(package.testzip())
+            stored = package.read("word/document.xml")
+        self.assertEqual(stored, editor.dom.toxml(encoding=editor.encoding))
+
+    def test_render_lines_matches_write(self):
+        """Test that render_lines() numbers the lines write() produces"""
+        editor = XMLEditor(self.path)
+        paragraph = editor.get_node(tag="w:p", contains="Paragraph 3")
+        editor.insert_before(paragraph, "<w:p>\n<w:r/>\n</w:p>")
+        lines = self.written(editor).decode(editor.encoding).split("\n")
+        rendered = editor.render_lines().split("\n")
+        self.assertEqual([line.split("\t", 1)[1] for line in rendered], lines)
+
+
+def baseline_records(editor, tag, attrs=None, contains=None):
+    """Describe the baseline get_node matches the way scan reports them"""
+    return [
+        (
+            elem.tagName,
+            dict(elem.attributes.items()),
+            elem.parse_position[0],
+            baseline_text(elem),
+        )
+        for elem in baseline_matches(editor, tag, attrs, contains=contains)
+    ]
+
+
+class TestScan(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        # Large enough to span several read chunks
+        self.path = make_part(self.tmp.name, paragraphs=1000)
+        self.editor = XMLEditor(self.path)
+
+    def assertScanMatches(self, editor, records, tag, attrs=None, contains=None):
+        # scan reports elements as they end; compare in document order
+        records = sorted(records, key=lambda record: record.line)
+        expected = sorted(
+            baseline_records(editor, tag, attrs, contains), key=lambda r: r[2]
+        )
+        self.assertEqual([tuple(record) for record in records], expected)
+
+    def test_matches_get_node(self):
+        """Test scan against the elements a full DOM scan finds"""
+        cases = [
+            ("w:p", None, None),
+            ("w:t", None, "Paragraph 99"),
+            ("w:p", {"w14:paraId": "0000002A"}, None),
+            ("w:p", {"w14:paraId": "0000002A"}, "Paragraph 41"),
+            ("w:sectPr", None, None),
+            ("w:body", None, None),
+        ]
+        for tag, attrs, contains in cases:
+            with self.subTest(tag=tag, attrs=attrs, contains=contains):
+                records = list(XMLEditor.scan(self.path, tag, attrs, contains))
+                self.assertTrue(records)
+                self.assertScanMatches(self.editor, records, tag, attrs, contains)
+
+    def test_any_tag(self):
+        """Test scanning every element against get_nodes("*")"""
+        editor = XMLEditor(make_part(self.tmp.name, paragraphs=3, name="small.xml"))
+        records = list(XMLEditor.scan(editor.xml_path, "*"))
+        self.assertEqual(len(records), len(editor.get_nodes("*")))
+        self.assertScanMatches(editor, records, "*")
+
+    def test_zip_entry(self):
+        """Test scanning a zip entry against scanning the file"""
+        package = Path(self.tmp.name) / "package.zip"
+        with zipfile.ZipFile(package, "w", zipfile.ZIP_DEFLATED) as archive:
+            archive.write(self.path, "word/document.xml")
+        with zipfile.ZipFile(package) as archive:
+            with archive.open("word/document.xml") as part:
+                records = list(XMLEditor.scan(part, "w:p", contains="Paragraph 7"))
+        from_file = XMLEditor.scan(self.path, "w:p", contains="Paragraph 7")
+        self.assertEqual(records, list(from_file))
+        self.assertScanMatches(self.editor, records, "w:p", contains="Paragraph 7")
+
+
+if __name__ == "__main__":
+    unittest.main()